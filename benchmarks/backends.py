@@ -0,0 +1,160 @@
+import math
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import ExitStack
+
+from storage_tool.local import LocalStorage
+
+AZURITE_CONNECTION_STRING = (
+    'DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;'
+    'AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;'
+    'BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;'
+)
+
+
+class BackendUnavailable(Exception):
+    pass
+
+
+def _repository_name():
+    return f'storage-tool-bench-{uuid.uuid4().hex[:12]}'
+
+
+def local_backend(stack):
+    """
+    LocalStorage on a temporary directory
+    """
+    directory = tempfile.mkdtemp(prefix='storage-tool-bench-')
+    stack.callback(shutil.rmtree, directory, ignore_errors=True)
+
+    storage = LocalStorage()
+    storage.set_or_create_repository(os.path.join(directory, 'repository'))
+    return storage
+
+
+def s3_backend(stack):
+    """
+    S3Storage against moto's in-process S3 mock
+    """
+    try:
+        from moto import mock_aws
+    except ImportError:
+        try:
+            from moto import mock_s3 as mock_aws
+        except ImportError:
+            raise BackendUnavailable('moto is not installed')
+
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    stack.enter_context(mock_aws())
+    auth = S3Authorization()
+    auth.set_credentials('testing', 'testing', 'us-east-1')
+    storage = S3Storage(auth)
+    storage.set_or_create_repository(_repository_name())
+    return storage
+
+
+def azure_backend(stack):
+    """
+    AzureStorage against Azurite, AZURE_STORAGE_CONNECTION_STRING overrides the default endpoint
+    """
+    from azure.storage.blob import BlobServiceClient
+    from storage_tool.azure import AzureAuthorization, AzureStorage
+
+    connection_string = os.getenv('AZURE_STORAGE_CONNECTION_STRING', AZURITE_CONNECTION_STRING)
+    try:
+        # list_containers is lazy, fetch one page to check the endpoint is up
+        probe = BlobServiceClient.from_connection_string(connection_string, retry_total=0)
+        next(iter(probe.list_containers()), None)
+    except Exception as e:
+        raise BackendUnavailable(f'Azurite is not reachable: {e}')
+
+    auth = AzureAuthorization()
+    auth.set_credentials(connection_string)
+
+    storage = AzureStorage(auth)
+    repository = _repository_name()
+    storage.set_or_create_repository(repository)
+    stack.callback(lambda: storage.client.delete_container(repository))
+    return storage
+
+
+def gcs_backend(stack):
+    """
+    GCSStorage against a local emulator (fake-gcs-server) defined by STORAGE_EMULATOR_HOST
+    """
+    emulator_host = os.getenv('STORAGE_EMULATOR_HOST')
+    if not emulator_host:
+        raise BackendUnavailable('STORAGE_EMULATOR_HOST is not set')
+
+    import httplib2
+    from gcloud import storage as gcloud_storage
+    from gcloud.storage.connection import Connection
+    from storage_tool.gcs import GCSAuthorization, GCSStorage
+
+    class EmulatorAuthorization(GCSAuthorization):
+        @property
+        def client(self):
+            return gcloud_storage.Client(project=self.project_id, http=httplib2.Http())
+
+        def test_credentials(self):
+            try:
+                list(self.client.list_buckets())
+            except Exception:
+                return False
+            return True
+
+    previous_base_url = Connection.API_BASE_URL
+    Connection.API_BASE_URL = emulator_host.rstrip('/')
+    stack.callback(setattr, Connection, 'API_BASE_URL', previous_base_url)
+
+    auth = EmulatorAuthorization()
+    auth.project_id = os.getenv('GCS_EMULATOR_PROJECT', 'storage-tool-bench')
+    if not auth.test_credentials():
+        raise BackendUnavailable('GCS emulator is not reachable')
+
+    storage = GCSStorage(auth)
+    storage.set_or_create_repository(_repository_name())
+    return storage
+
+
+def simulated_backend(stack):
+    """
+    LocalStorage behind SimulatedStorage with an object store like profile:
+    lognormal latency around 20ms and 100MB/s of bandwidth, seeded
+    """
+    from storage_tool.simulated import SimulatedStorage
+
+    return SimulatedStorage(
+        local_backend(stack),
+        latency=('lognormal', math.log(0.02), 0.5),
+        bandwidth=100 * 1024 ** 2,
+        seed=int(os.getenv('SIMULATED_STORAGE_SEED', '0')),
+    )
+
+
+BACKENDS = {
+    'local': local_backend,
+    'simulated': simulated_backend,
+    's3': s3_backend,
+    'azure': azure_backend,
+    'gcs': gcs_backend,
+}
+
+
+def open_backend(name):
+    """
+    Create the storage of a benchmark backend
+    return: (storage, ExitStack releasing the backend resources)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f'backend must be one of {", ".join(BACKENDS)}')
+
+    stack = ExitStack()
+    try:
+        return BACKENDS[name](stack), stack
+    except BaseException:
+        stack.close()
+        raise
@@ -0,0 +1,93 @@
+"""
+Compare two benchmark result files
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.10
+
+Exits with status 1 when a latency, throughput or memory metric regressed more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+# Metric path, and True when a higher value is better
+METRICS = (
+    (('latency', 'p50'), False),
+    (('latency', 'p99'), False),
+    (('throughput_bytes_per_s',), True),
+    (('peak_tracemalloc_bytes',), False),
+)
+
+
+def _key(result):
+    return (result['backend'], result['format'], result['size'], result['operation'], result['concurrency'])
+
+
+def _value(result, path):
+    for part in path:
+        if result is None:
+            return None
+        result = result.get(part)
+    return result
+
+
+def compare(baseline, candidate, threshold=0.10):
+    """
+    Compare the results present in both reports
+    :param baseline: Report produced by benchmarks.harness.run
+    :param candidate: Report produced by benchmarks.harness.run
+    :param threshold: Relative change tolerated before flagging a regression
+    return: List of dicts with key, metric, baseline, candidate, change and regression
+    """
+    baseline_results = {_key(result): result for result in baseline['results'] if not result.get('error')}
+    rows = []
+    for result in candidate['results']:
+        reference = baseline_results.get(_key(result))
+        if reference is None or result.get('error'):
+            continue
+
+        for path, higher_is_better in METRICS:
+            before = _value(reference, path)
+            after = _value(result, path)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            regression = -change > threshold if higher_is_better else change > threshold
+            rows.append({
+                "key": _key(result),
+                "metric": '.'.join(path),
+                "baseline": before,
+                "candidate": after,
+                "change": change,
+                "regression": regression,
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare storage-tool benchmark results')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else ''
+        print('{key} {metric:<24} {baseline:>14.6g} -> {candidate:>14.6g} {change:+8.1%} {flag}'.format(
+            key='/'.join(str(part) for part in row['key']),
+            flag=flag,
+            **{k: v for k, v in row.items() if k != 'key'},
+        ))
+
+    if any(row['regression'] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""
+Benchmark harness for the storage backends
+
+Usage:
+    python -m benchmarks.harness --backends local s3 --formats csv parquet \\
+        --sizes 1KB 1MB 100MB --operations put read list copy \\
+        --concurrency 1 8 --repeats 5 --output results.json
+
+Compare two result files with `python -m benchmarks.compare baseline.json results.json`.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.backends import BackendUnavailable, open_backend
+
+FORMATS = ('csv', 'parquet', 'json', 'xlsx', 'txt')
+# sync is left out, LocalStorage does not implement it
+OPERATIONS = ('put', 'read', 'list', 'copy')
+DEFAULT_SIZES = ('1KB', '1MB', '10MB')
+SIZE_UNITS = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'B': 1}
+
+
+def parse_size(size):
+    """
+    Convert '1KB', '100MB' or '5GB' to bytes
+    """
+    value = size.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def make_frame(size_bytes, seed=0):
+    """
+    Build a DataFrame whose CSV representation is close to size_bytes
+    :param size_bytes: Target size in bytes
+    :param seed: Seed of the random generator, the same seed gives the same frame
+    """
+    def build(rows):
+        rng = np.random.default_rng(seed)
+        return pd.DataFrame({
+            'id': np.arange(rows, dtype='int64'),
+            'value': rng.random(rows),
+            'amount': rng.integers(0, 1_000_000, rows),
+            'category': rng.choice(np.array(['alpha', 'beta', 'gamma', 'delta']), rows),
+            'text': np.char.add('item-', rng.integers(0, 10 ** 9, rows).astype(str)),
+        })
+
+    sample_rows = 1000
+    bytes_per_row = len(build(sample_rows).to_csv(index=False).encode('utf-8')) / sample_rows
+    return build(max(1, int(size_bytes / bytes_per_row)))
+
+
+class RSSSampler:
+    def __init__(self, interval=0.005):
+        """
+        Sample the resident set size of the process in a background thread
+        :param interval: Seconds between samples
+        """
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self.current()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Scenario:
+    def __init__(self, storage, file_format, size_label, frame, prefix):
+        """
+        Objects used by the operations of one backend/format/size combination
+        """
+        self.storage = storage
+        self.file_format = file_format
+        self.size_label = size_label
+        self.frame = frame
+        self.prefix = prefix
+        self.source = f'{prefix}source/object.{file_format}'
+        self.read_type = dict if file_format == 'json' else pd.DataFrame
+        self.prepared = False
+
+    def prepare(self):
+        if not self.prepared:
+            self.storage.put(file_path=self.source, content=self.frame)
+            self.prepared = True
+
+    def task(self, operation, worker, iteration):
+        """
+        Return the callable executing one operation
+        """
+        target = f'{self.prefix}{operation}/{iteration}-{worker}.{self.file_format}'
+        if operation == 'put':
+            return lambda: self.storage.put(file_path=target, content=self.frame)
+        if operation == 'read':
+            return lambda: self.storage.read(file_path=self.source, return_type=self.read_type)
+        if operation == 'list':
+            return lambda: self.storage.list(path=f'{self.prefix}source/')
+        if operation == 'copy':
+            return lambda: self.storage.copy(self.source, target)
+        raise ValueError(f'operation must be one of {", ".join(OPERATIONS)}')
+
+
+def run_batch(scenario, operation, concurrency, iteration):
+    """
+    Run `concurrency` operations at once
+    return: (latencies, wall time)
+    """
+    tasks = [scenario.task(operation, worker, iteration) for worker in range(concurrency)]
+
+    def timed(task):
+        start = time.perf_counter()
+        task()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(tasks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, tasks))
+    return latencies, time.perf_counter() - start
+
+
+def measure(scenario, operation, concurrency, repeats, warmup=1, trace_memory=True):
+    """
+    Measure latency, throughput and peak memory of one operation
+    """
+    if operation != 'put':
+        scenario.prepare()
+
+    for iteration in range(warmup):
+        run_batch(scenario, operation, concurrency, f'warmup{iteration}')
+
+    latencies = []
+    wall = 0.0
+    with RSSSampler() as rss:
+        for iteration in range(repeats):
+            batch, elapsed = run_batch(scenario, operation, concurrency, iteration)
+            latencies.extend(batch)
+            wall += elapsed
+
+    peak_traced = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            run_batch(scenario, operation, concurrency, 'memory')
+            peak_traced = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    ops = len(latencies)
+    transferred = scenario.object_bytes * ops if operation in ('put', 'read', 'copy') else 0
+    return {
+        "ops": ops,
+        "latency": {
+            "mean": statistics.fmean(latencies),
+            "min": min(latencies),
+            "max": max(latencies),
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+        },
+        "ops_per_s": ops / wall if wall else None,
+        "throughput_bytes_per_s": transferred / wall if wall and transferred else None,
+        "peak_tracemalloc_bytes": peak_traced,
+        "peak_rss_bytes": rss.peak,
+    }
+
+
+def run(backends, formats, sizes, operations, concurrency, repeats, warmup=1, seed=0, trace_memory=True, log=print):
+    """
+    Run the benchmark matrix
+    return: Dict with the run metadata and one result per backend/format/size/operation/concurrency
+    """
+    results = []
+    skipped = {}
+    skipped_scenarios = {}
+    frames = {}
+
+    for backend in backends:
+        try:
+            storage, stack = open_backend(backend)
+        except BackendUnavailable as e:
+            skipped[backend] = str(e)
+            log(f'skip {backend}: {e}')
+            continue
+
+        with stack:
+            for file_format in formats:
+                for size_label in sizes:
+                    size_bytes = parse_size(size_label)
+                    if size_bytes not in frames:
+                        frames[size_bytes] = make_frame(size_bytes, seed)
+
+                    scenario = Scenario(storage, file_format, size_label, frames[size_bytes], f'bench/{file_format}/{size_label}/')
+                    try:
+                        scenario.object_bytes = len(storage.convert_to_bytes(scenario.frame, file_format))
+                    except Exception as e:
+                        # The throughput of the operations needs the object size
+                        name = f'{backend}/{file_format}/{size_label}'
+                        skipped_scenarios[name] = f'{type(e).__name__}: {e}'
+                        log(f'skip {name}: {skipped_scenarios[name]}')
+                        continue
+
+                    for operation in operations:
+                        for level in concurrency:
+                            result = {
+                                "backend": backend,
+                                "format": file_format,
+                                "size": size_label,
+                                "size_bytes": size_bytes,
+                                "rows": len(scenario.frame),
+                                "object_bytes": scenario.object_bytes,
+                                "operation": operation,
+                                "concurrency": level,
+                                "repeats": repeats,
+                            }
+                            try:
+                                result.update(measure(scenario, operation, level, repeats, warmup, trace_memory))
+                                result["error"] = None
+                            except Exception as e:
+                                result["error"] = f'{type(e).__name__}: {e}'
+                            results.append(result)
+                            log(_summary(result))
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "warmup": warmup,
+            "skipped_backends": skipped,
+            "skipped_scenarios": skipped_scenarios,
+        },
+        "results": results,
+    }
+
+
+def _summary(result):
+    name = '{backend:<6} {format:<8} {size:>6} {operation:<5} c={concurrency:<3}'.format(**result)
+    if result["error"]:
+        return f'{name} error: {result["error"]}'
+    return '{name} p50={p50:.4f}s p99={p99:.4f}s ops/s={ops:.1f}'.format(
+        name=name,
+        p50=result["latency"]["p50"],
+        p99=result["latency"]["p99"],
+        ops=result["ops_per_s"] or 0,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark storage-tool backends')
+    parser.add_argument('--backends', nargs='+', default=['local'], choices=['local', 'simulated', 's3', 'azure', 'gcs'])
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=FORMATS)
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), help='Object sizes, from 1KB up to 5GB')
+    parser.add_argument('--operations', nargs='+', default=list(OPERATIONS), choices=OPERATIONS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--output', default='bench_output.json')
+    args = parser.parse_args(argv)
+
+    report = run(
+        backends=args.backends,
+        formats=args.formats,
+        sizes=args.sizes,
+        operations=args.operations,
+        concurrency=args.concurrency,
+        repeats=args.repeats,
+        warmup=args.warmup,
+        seed=args.seed,
+        trace_memory=not args.no_memory,
+    )
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
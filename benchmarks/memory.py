@@ -0,0 +1,138 @@
+"""
+Peak memory profiling of the read/put hot paths
+
+Peak memory is reported as a multiple of the stored object size, so the
+numbers are comparable across formats and sizes.
+
+Usage:
+    python -m benchmarks.memory --backends local s3 --size 4MB --output memory.json
+
+Exits with status 1 when a ratio is above its entry in memory_thresholds.json.
+"""
+import argparse
+import gc
+import json
+import os
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.backends import BackendUnavailable, open_backend
+from benchmarks.harness import RSSSampler, make_frame, parse_size
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), 'memory_thresholds.json')
+
+
+def load_thresholds(path=THRESHOLDS_PATH):
+    """
+    Thresholds as {backend: {format: {operation: max ratio}}}
+    """
+    with open(path) as f:
+        return {
+            backend: formats
+            for backend, formats in json.load(f).items()
+            if not backend.startswith('_')
+        }
+
+
+def peak_memory(func):
+    """
+    Run func and return (result, peak traced bytes, peak RSS growth in bytes)
+    """
+    gc.collect()
+    rss_before = RSSSampler.current()
+    tracemalloc.start()
+    try:
+        with RSSSampler() as rss:
+            result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    rss_growth = rss.peak - rss_before if rss.peak is not None and rss_before is not None else None
+    return result, peak, rss_growth
+
+
+def profile(storage, frame, file_format, path=None):
+    """
+    Measure the peak memory of put() and read() of one object
+    return: Dict with the object size, peaks and peak/object size ratios
+    """
+    path = path or f'memory-profile/object.{file_format}'
+    object_bytes = len(storage.convert_to_bytes(frame, file_format))
+    return_type = dict if file_format == 'json' else pd.DataFrame
+
+    _, put_peak, put_rss = peak_memory(lambda: storage.put(file_path=path, content=frame))
+    data, read_peak, read_rss = peak_memory(lambda: storage.read(file_path=path, return_type=return_type))
+    del data
+
+    return {
+        "format": file_format,
+        "object_bytes": object_bytes,
+        "put_peak_bytes": put_peak,
+        "read_peak_bytes": read_peak,
+        "put_rss_growth_bytes": put_rss,
+        "read_rss_growth_bytes": read_rss,
+        "put": put_peak / object_bytes,
+        "read": read_peak / object_bytes,
+    }
+
+
+def check(backend, result, thresholds):
+    """
+    Compare a profile against the thresholds
+    return: List of violation messages
+    """
+    limits = thresholds.get(backend, {}).get(result["format"], {})
+    return [
+        f'{backend}/{result["format"]} {operation}: peak {result[operation]:.2f}x object size > {limit:.2f}x'
+        for operation, limit in limits.items()
+        if result[operation] > limit
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile peak memory of storage-tool read/put')
+    parser.add_argument('--backends', nargs='+', default=['local'], choices=['local', 'simulated', 's3', 'azure', 'gcs'])
+    parser.add_argument('--formats', nargs='+', default=['csv', 'parquet', 'json', 'xlsx', 'txt'])
+    parser.add_argument('--size', default='4MB')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    thresholds = load_thresholds(args.thresholds)
+    frame = make_frame(parse_size(args.size), args.seed)
+    report = {"size": args.size, "results": {}}
+    violations = []
+
+    for backend in args.backends:
+        try:
+            storage, stack = open_backend(backend)
+        except BackendUnavailable as e:
+            print(f'skip {backend}: {e}')
+            continue
+
+        with stack:
+            for file_format in args.formats:
+                try:
+                    result = profile(storage, frame, file_format)
+                except Exception as e:
+                    print(f'{backend:<6} {file_format:<8} error: {e}')
+                    continue
+                report["results"].setdefault(backend, []).append(result)
+                violations.extend(check(backend, result, thresholds))
+                print('{backend:<6} {format:<8} put={put:.2f}x read={read:.2f}x'.format(backend=backend, **result))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for violation in violations:
+        print(violation)
+    if violations:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
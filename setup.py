@@ -14,12 +14,14 @@ setup(
         'botocore==1.32.6',
         'jmespath==1.0.1',
         'numpy>=1.19.5,<1.26.2',
-        'pandas>=1.1.5,<2.1.3',
+        # dtype_backend and ArrowDtype columns need pandas 2
+        'pandas>=2.0,<2.1.3',
         'python-dateutil==2.8.2',
         'pytz==2023.3.post1',
         'tzdata==2023.3',
         's3transfer==0.7.0',
-        'pyarrow==14.0.1',
+        # concat_tables(promote_options=...) of read_dataset needs pyarrow 14
+        'pyarrow>=14.0.1',
         'urllib3==1.26.18',
         'azure-core==1.29.5',
         'azure-identity==1.15.0',
@@ -32,6 +34,11 @@ setup(
         'google-cloud-storage==2.16.0',
         'gcloud==0.18.3'
     ],
+    extras_require={
+        'compression': ['zstandard', 'lz4'],
+        'json': ['orjson'],
+        'excel': ['openpyxl', 'xlsxwriter'],
+    },
     long_description=long_description,
     long_description_content_type='text/markdown',
 )
\ No newline at end of file
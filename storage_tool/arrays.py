@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+
+# Modes of the memory maps of local .npy files, see np.memmap
+MMAP_MODES = ('r', 'r+', 'c')
+
+
+def read_header(source):
+    """
+    Header of a .npy file, the source is left at the start of the data
+    return: shape, fortran_order, dtype
+    """
+    version = np.lib.format.read_magic(source)
+    if version == (1, 0):
+        return np.lib.format.read_array_header_1_0(source)
+    return np.lib.format.read_array_header_2_0(source)
+
+
+def read_npy(source, rows=None, mmap_mode=None):
+    """
+    Read a .npy array, only the bytes of the selected rows are read when the layout allows it
+    :param source: Readable binary file-like object, seekable to read a part of the rows
+    :param rows: slice of the first axis to read, all the rows by default
+    :param mmap_mode: r, r+ or c, memory-map the array instead of reading it, source must be a pa.MemoryMappedFile
+        (r+ needs it opened for writing)
+    return: np.ndarray, np.memmap with mmap_mode
+    """
+    if rows is not None and not isinstance(rows, slice):
+        raise ValueError('rows must be a slice')
+    shape, fortran_order, dtype = read_header(source)
+    if dtype.hasobject:
+        raise ValueError('object arrays are not supported, they are stored with pickle')
+    if rows is not None and not shape:
+        raise ValueError('rows needs an array with at least one dimension')
+    offset = source.tell()
+    order = 'F' if fortran_order else 'C'
+
+    if mmap_mode is not None:
+        if mmap_mode not in MMAP_MODES:
+            raise ValueError('mmap_mode must be r, r+ or c')
+        if not isinstance(source, pa.MemoryMappedFile):
+            raise ValueError('mmap_mode needs an uncompressed local file')
+        # np.memmap maps its own duplicate of the descriptor, the array outlives the pyarrow mapping
+        with os.fdopen(os.dup(source.fileno()), 'r+b' if mmap_mode == 'r+' else 'rb') as f:
+            array = np.memmap(f, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape, order=order)
+        # Slicing a memmap is a view, only the pages of the selected rows are touched
+        return array if rows is None else array[rows]
+
+    if rows is not None and not fortran_order:
+        # The rows of a C-order array are contiguous, read the span from the first to the last selected one
+        indexes = range(*rows.indices(shape[0]))
+        if not indexes:
+            return np.empty((0,) + tuple(shape[1:]), dtype)
+        first, last = min(indexes), max(indexes)
+        row_size = dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+        source.seek(offset + first * row_size)
+        array = _read_data(source, dtype, (last - first + 1,) + tuple(shape[1:]), order)
+        return array if indexes.step == 1 else array[np.asarray(indexes) - first]
+
+    array = _read_data(source, dtype, shape, order)
+    return array if rows is None else array[rows].copy()
+
+
+def _read_data(source, dtype, shape, order):
+    array = np.empty(shape, dtype, order=order)
+    if not array.nbytes:
+        return array
+    if isinstance(source, pa.NativeFile):
+        # Memory-mapped files hand out their pages without a copy, the only copy is into the array
+        data = source.read_buffer(array.nbytes)
+    else:
+        data = source.read(array.nbytes)
+    if len(data) != array.nbytes:
+        raise ValueError('the file is shorter than its header says')
+    array.reshape(-1, order='A').view(np.uint8)[:] = np.frombuffer(data, np.uint8)
+    return array
+
+
+def write_npy(array, stream):
+    """
+    Write an array as .npy, without pickle
+    """
+    np.lib.format.write_array(stream, np.asanyarray(array), allow_pickle=False)
+
+
+def read_npz(source, arrays=None):
+    """
+    Read the arrays of a .npz archive
+    :param source: Seekable readable binary file-like object, only the directory and the selected members are read
+    :param arrays: Names of the arrays to read, all of them by default
+    return: dict of np.ndarray
+    """
+    with np.load(source, allow_pickle=False) as archive:
+        names = archive.files if arrays is None else list(arrays)
+        missing = set(names) - set(archive.files)
+        if missing:
+            raise ValueError(f'arrays not in the archive: {", ".join(sorted(missing))}')
+        return {name: archive[name] for name in names}
+
+
+def write_npz(arrays, stream, compression=None):
+    """
+    Write a dict of arrays as .npz
+    :param compression: deflate compresses the members, stored uncompressed by default
+    """
+    if compression == 'deflate':
+        np.savez_compressed(stream, **arrays)
+    elif compression is None:
+        np.savez(stream, **arrays)
+    else:
+        raise ValueError('compression must be deflate or None for npz')
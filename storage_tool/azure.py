@@ -1,11 +1,29 @@
-import os, uuid
+import io, os, uuid
 import pandas as pd
 
 from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 from azure.identity import DefaultAzureCredential
-from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient, ContentSettings
+from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient, ContentSettings, ExponentialRetry
+from storage_tool import metrics, tracing
+from storage_tool.compression import get_file_extension
 from storage_tool.base import BaseStorage
 from storage_tool.data_processor import DataProcessor
+from storage_tool.streams import DEFAULT_BLOCK_SIZE, DEFAULT_PART_SIZE, AzureBlockUpload, RangeReader, write_all
+from storage_tool.dataset import DatasetReader
+from storage_tool.transfer import DirectoryTransfer
+from storage_tool.writers import DataFrameWriter
+
+
+class RetryCounter(ExponentialRetry):
+    """
+    Retry policy of the Blob clients, the default exponential retry recording each retry it decides
+    """
+
+    def increment(self, settings, request, response=None, error=None):
+        retry = super().increment(settings, request, response=response, error=error)
+        if retry:
+            metrics.record_retry()
+        return retry
 
 
 def erase_after_pattern(original_string, pattern):
@@ -55,13 +73,20 @@ class AzureAuthorization:
         Create BlobServiceClient
         """
         try:
-            return BlobServiceClient.from_connection_string(self.connection_string)
+            return self.create_client()
         except Exception as e:
             print(e)
             return None
 
+    def create_client(self, **options):
+        """
+        Create a BlobServiceClient recording the retries of its requests
+        :param options: Extra BlobServiceClient options, e.g. transport
+        """
+        return BlobServiceClient.from_connection_string(self.connection_string, retry_policy=RetryCounter(), **options)
+
 
-class AzureStorage(BaseStorage, DataProcessor):
+class AzureStorage(BaseStorage, DataProcessor, DirectoryTransfer, DatasetReader):
     # Define permitted return types
     return_types = [dict, pd.DataFrame, list]
 
@@ -174,11 +199,13 @@ class AzureStorage(BaseStorage, DataProcessor):
         return list_files
 
 
-    def read(self, file_path, return_type=pd.DataFrame):
+    def read(self, file_path, return_type=None, **options):
         """
         Read file from Azure
         :param file_path: File path
-        :param return_type: Return type (dict, pd.DataFrame, list)
+        :param return_type: Return type (dict, pd.DataFrame, pa.Table or pa.RecordBatchReader), the default of the
+            format when None, see DataProcessor.process_data
+        :param options: Parsing options, see DataProcessor.process_data
         return: File content
         """
         if not self.repository:
@@ -189,22 +216,62 @@ class AzureStorage(BaseStorage, DataProcessor):
                 container=self.repository,
                 blob=file_path
             )
-            bytes = blob_client.download_blob().readall()
-
-            file_extension = file_path.split('.')[-1].lower()
+            file_extension = get_file_extension(file_path)
+            if self.random_access(file_extension):
+                # Arrow IPC blobs are read through range requests, only the footer and the needed columns are downloaded
+                bytes = self._range_reader(blob_client)
+            else:
+                with tracing.span('fetch'):
+                    downloader = blob_client.download_blob()
+                    # Compressed and JSON Lines blobs are parsed while they are downloaded
+                    bytes = downloader if self.streams_from(file_extension) else downloader.readall()
 
-            data = self.process_data(bytes, file_extension, return_type)
+            data = self.process_data(bytes, file_extension, return_type, file_path=file_path, **options)
             return data
 
         except Exception as e:
             raise Exception(f'Error while reading file: {e}')
 
 
-    def put(self, file_path, content):
+    @staticmethod
+    def _range_reader(blob_client):
+        # Seekable view of the blob, each read is a ranged download
+        size = blob_client.get_blob_properties().size
+
+        def fetch(start, end):
+            return blob_client.download_blob(offset=start, length=end - start).readall()
+        return RangeReader(size, fetch)
+
+    def _iter_objects(self, prefix):
+        container_client = self.client.get_container_client(container=self.repository)
+        for blob in container_client.list_blobs(name_starts_with=prefix):
+            content_md5 = blob.content_settings.content_md5
+            yield {
+                "object": blob.name,
+                "size": blob.size,
+                "modified_at": blob.last_modified,
+                "checksum": bytes(content_md5).hex() if content_md5 else None
+            }
+
+    def _upload_file(self, path, key, checksum=None):
+        blob_client = self.client.get_blob_client(container=self.repository, blob=key)
+        # Blobs uploaded in blocks get no Content-MD5 from the service, store the one of the file
+        content_settings = ContentSettings(content_md5=bytearray.fromhex(checksum)) if checksum else None
+        with open(path, 'rb') as f:
+            # Large files are staged in blocks by the SDK
+            blob_client.upload_blob(f, blob_type="BlockBlob", overwrite=True, content_settings=content_settings)
+
+    def _download_file(self, key, path):
+        blob_client = self.client.get_blob_client(container=self.repository, blob=key)
+        with open(path, 'wb') as f:
+            blob_client.download_blob().readinto(f)
+
+    def put(self, file_path, content, **options):
         """
         Write file to Azure
-        :param file_path: File path
+        :param file_path: File path, a .gz, .bz2, .zst or .lz4 suffix compresses the content
         :param content: File content
+        :param options: Serialization options, see DataProcessor.write_to_stream
 
         """
         if not self.repository:
@@ -216,15 +283,88 @@ class AzureStorage(BaseStorage, DataProcessor):
                 blob=file_path
             )
 
-            data = self.convert_to_bytes(content, file_path.split('.')[-1].lower())
-
-            blob_client.upload_blob(data, blob_type="BlockBlob", overwrite=True)
+            # Serialized into staged blocks, blobs smaller than one block are sent with a single upload_blob
+            with AzureBlockUpload(blob_client) as stream:
+                self.write_to_stream(content, get_file_extension(file_path), stream, **options)
 
             return "Success, file written"
         except Exception as e:
             raise Exception(f'Error while writing file: {file_path}')
 
 
+    def open_writer(self, file_path, part_size=DEFAULT_PART_SIZE):
+        """
+        Open a writer streaming DataFrame batches to Azure as staged blocks
+        :param file_path: File path
+        :param part_size: Size of the staged blocks
+        return: DataFrameWriter
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        blob_client = self.client.get_blob_client(
+            container=self.repository,
+            blob=file_path
+        )
+        stream = AzureBlockUpload(blob_client, part_size=part_size)
+        return DataFrameWriter(stream, get_file_extension(file_path))
+
+    def read_bytes(self, file_path):
+        """
+        Read the content of a file as it is stored, without parsing it
+        :param file_path: File path
+        return: bytes
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+
+        try:
+            blob_client = self.client.get_blob_client(
+                container=self.repository,
+                blob=file_path
+            )
+            with tracing.span('fetch'):
+                data = blob_client.download_blob().readall()
+            metrics.record_bytes_in(len(data))
+            return data
+        except Exception as e:
+            raise Exception(f'Error while reading file: {e}')
+
+    def put_bytes(self, file_path, data):
+        """
+        Write content as it is, any extension, without serializing it
+        :param file_path: File path
+        :param data: bytes or a readable binary file object, staged in blocks when large
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        try:
+            with self.open(file_path, 'wb') as stream:
+                write_all(data, stream)
+            return "Success, file written"
+        except Exception as e:
+            raise Exception(f'Error while writing file: {e}')
+
+    def open(self, file_path, mode='rb', part_size=DEFAULT_PART_SIZE):
+        """
+        Open a file as a binary file object
+        :param file_path: File path
+        :param mode: 'rb' reads through a buffer with ranged downloads, seek() moves without downloading.
+            'wb' stages blocks, the blob appears on close() and an exception inside a with block discards it
+        :param part_size: Size of the staged blocks
+        return: io.BufferedReader or AzureBlockUpload
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        blob_client = self.client.get_blob_client(
+            container=self.repository,
+            blob=file_path
+        )
+        if mode == 'rb':
+            return io.BufferedReader(self._range_reader(blob_client), buffer_size=DEFAULT_BLOCK_SIZE)
+        if mode == 'wb':
+            return AzureBlockUpload(blob_client, part_size=part_size)
+        raise ValueError("mode must be 'rb' or 'wb'")
+
     def delete(self, file_path):
         """
         Delete file from Azure
@@ -1,6 +1,22 @@
+import io
 from abc import ABC, abstractmethod
+from storage_tool.compression import get_file_extension
+from storage_tool.metrics import INSTRUMENTED_OPERATIONS, instrument
+from storage_tool.streams import BufferedUpload
+from storage_tool.tracing import traced
+from storage_tool.writers import DataFrameWriter
 
 class BaseStorage(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Wrap the operations of each backend with tracing and the metrics instrumentation, including the ones
+        # inherited from the DirectoryTransfer and DatasetReader mixins
+        for operation in INSTRUMENTED_OPERATIONS:
+            method = getattr(cls, operation, None)
+            if (callable(method) and not getattr(method, '__instrumented__', False)
+                    and not getattr(method, '__isabstractmethod__', False)):
+                setattr(cls, operation, instrument(operation, traced(operation, method)))
+
     @abstractmethod
     def create_repository(self, repository):
         pass
@@ -29,6 +45,41 @@ class BaseStorage(ABC):
     def put(self, repository, file_path, content):
         pass
 
+    # The raw byte operations below are optional, a backend implementing read_bytes and put_bytes gets open and
+    # open_writer built on them. read and put parse and serialize, the raw bytes cannot be built on them
+
+    def open_writer(self, file_path):
+        """
+        Open a writer of DataFrame batches, by default written with open(file_path, 'wb')
+        return: DataFrameWriter
+        """
+        return DataFrameWriter(self.open(file_path, 'wb'), get_file_extension(file_path))
+
+    def read_bytes(self, file_path):
+        """
+        Read the content of a file as it is stored, without parsing it
+        return: bytes
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not implement read_bytes')
+
+    def put_bytes(self, file_path, data):
+        """
+        Write content as it is, without serializing it
+        :param data: bytes
+        """
+        raise NotImplementedError(f'{type(self).__name__} does not implement put_bytes')
+
+    def open(self, file_path, mode='rb'):
+        """
+        Open a file as a binary file object, by default the whole file is kept in memory
+        :param mode: 'rb' reads it with read_bytes, 'wb' writes it with put_bytes on close()
+        """
+        if mode == 'rb':
+            return io.BytesIO(self.read_bytes(file_path))
+        if mode == 'wb':
+            return BufferedUpload(lambda content: self.put_bytes(file_path, content))
+        raise ValueError("mode must be 'rb' or 'wb'")
+
     @abstractmethod
     def delete(self, repository, file_path):
         pass
@@ -0,0 +1,62 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class DelimitedBatches:
+    def __init__(self, stream, sep=','):
+        """
+        Append DataFrame batches to a CSV/TSV stream, the header is written with the first batch
+        :param stream: Writable binary stream
+        :param sep: Field delimiter
+        """
+        self.stream = stream
+        self.sep = sep
+        self._header_written = False
+
+    def write(self, data):
+        data.to_csv(self.stream, index=False, header=not self._header_written, sep=self.sep, encoding='utf-8')
+        # Empty batches write the header too, it must not be repeated by the next ones
+        self._header_written = True
+
+    def close(self):
+        pass
+
+
+class JsonLinesBatches:
+    def __init__(self, stream):
+        """
+        Append DataFrame batches to a JSON Lines stream, every batch is appended as is
+        """
+        self.stream = stream
+
+    def write(self, data):
+        lines = data.to_json(orient='records', lines=True).rstrip('\n')
+        if lines:
+            self.stream.write(lines.encode('utf-8') + b'\n')
+
+    def close(self):
+        pass
+
+
+class ParquetBatches:
+    def __init__(self, stream):
+        """
+        Append DataFrame batches to a Parquet stream as row groups, the schema is the one of the first batch
+        """
+        self.stream = stream
+        self._writer = None
+
+    def write(self, data):
+        if self._writer is None:
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.stream, table.schema)
+        else:
+            table = pa.Table.from_pandas(data, schema=self._writer.schema, preserve_index=False)
+        # One row group per batch
+        self._writer.write_table(table, row_group_size=max(1, len(table)))
+
+    def close(self):
+        # Writes the footer, pyarrow leaves Python file objects open
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
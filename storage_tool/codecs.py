@@ -0,0 +1,258 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from storage_tool.batches import DelimitedBatches, JsonLinesBatches, ParquetBatches
+
+# Return types of read, every built-in table format supports them
+RETURN_TYPES = (dict, pd.DataFrame, pa.Table, pa.RecordBatchReader)
+# Data written by the built-in table formats, record batches are written as tables
+DATA_TYPES = (dict, list, pd.DataFrame, pa.Table)
+
+_codecs = {}
+
+
+class Codec:
+    """
+    File format read and written by DataProcessor, registered with register_codec.
+    decode parses a readable binary source and encode serializes into a writable binary stream, the compression
+    suffixes, streamed downloads and uploads, and the instrumentation of the backends apply to every codec
+    """
+    # Extensions of the format, without the compression suffix
+    extensions = ()
+    # Return types accepted by decode
+    return_types = RETURN_TYPES
+    # Return type of the reads that do not give one, the first of return_types when it is not one of them
+    default_return_type = pd.DataFrame
+    # Data accepted by encode
+    data_types = DATA_TYPES
+    # Options accepted besides DataProcessor's READ_OPTIONS and WRITE_OPTIONS
+    read_options = ()
+    write_options = ()
+    # decode reads the source once from start to end, the backends hand it the open download instead of its bytes
+    streaming = False
+    # decode seeks in the source, a compressed file is decompressed into memory first
+    seekable = False
+    # decode reads parts of the file only, the backends hand it a memory map or a RangeReader
+    random_access = False
+    # encode seeks in the stream, the output is buffered before it is compressed
+    seekable_output = False
+
+    def decode(self, processor, source, return_type, **options):
+        """
+        Parse a file
+        :param processor: DataProcessor, for its helpers and schema cache
+        :param source: Readable binary file object
+        :param return_type: One of return_types
+        """
+        raise NotImplementedError
+
+    def encode(self, processor, data, stream, **options):
+        """
+        Serialize data into a file
+        :param processor: DataProcessor, for its helpers
+        :param data: One of data_types
+        :param stream: Writable binary file object
+        """
+        raise NotImplementedError
+
+    def open_batches(self, stream):
+        """
+        Writer appending DataFrame batches to a stream, used by open_writer
+        :param stream: Writable binary file object
+        return: Object with write(pd.DataFrame) and close(), closing it leaves stream open.
+            None when the format is not written in batches
+        """
+        return None
+
+
+def register_codec(codec):
+    """
+    Register a codec for its extensions, replacing the one registered for the same extension
+    :param codec: Codec instance
+    return: codec
+    """
+    if not codec.extensions:
+        raise ValueError('codec must declare its extensions')
+    for extension in codec.extensions:
+        _codecs[extension.lower()] = codec
+    return codec
+
+
+def find_codec(file_format):
+    """
+    Codec registered for an extension, None when there is none
+    """
+    return _codecs.get(file_format)
+
+
+def get_codec(file_format):
+    """
+    Codec registered for an extension
+    """
+    codec = _codecs.get(file_format)
+    if codec is None:
+        raise ValueError(format_error())
+    return codec
+
+
+def formats():
+    """
+    Registered extensions
+    """
+    return tuple(_codecs)
+
+
+def batch_formats():
+    """
+    Registered extensions written in batches by open_writer
+    """
+    return tuple(extension for extension, codec in _codecs.items() if type(codec).open_batches is not Codec.open_batches)
+
+
+def format_error():
+    names = list(_codecs)
+    return f'file_extension must be {", ".join(names[:-1])} or {names[-1]}'
+
+
+class JsonCodec(Codec):
+    extensions = ('json',)
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_json(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_json(data, stream, **options)
+
+
+class JsonLinesCodec(Codec):
+    extensions = ('jsonl', 'ndjson')
+    streaming = True
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_jsonl(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_jsonl(data, stream, **options)
+
+    def open_batches(self, stream):
+        return JsonLinesBatches(stream)
+
+
+class CsvCodec(Codec):
+    extensions = ('csv',)
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_csv(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_delimited(data, stream, ',', **options)
+
+    def open_batches(self, stream):
+        return DelimitedBatches(stream, ',')
+
+
+class TxtCodec(Codec):
+    extensions = ('txt',)
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_txt(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_delimited(data, stream, '\t', **options)
+
+    def open_batches(self, stream):
+        return DelimitedBatches(stream, '\t')
+
+
+class ExcelCodec(Codec):
+    extensions = ('xlsx',)
+    seekable = True
+    # The zip container of xlsx seeks back while writing
+    seekable_output = True
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_excel(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_excel(data, stream, **options)
+
+
+class ParquetCodec(Codec):
+    extensions = ('parquet',)
+    seekable = True
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_parquet(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_parquet(data, stream, **options)
+
+    def open_batches(self, stream):
+        return ParquetBatches(stream)
+
+
+class ArrowIpcCodec(Codec):
+    extensions = ('feather', 'arrow')
+    seekable = True
+    random_access = True
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_ipc(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_ipc(data, stream, **options)
+
+
+class OrcCodec(Codec):
+    extensions = ('orc',)
+    read_options = ('stripes',)
+    write_options = ('stripe_size',)
+    seekable = True
+    # The footer locates the streams of each column in each stripe, only the selected ones are read
+    random_access = True
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_orc(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_orc(data, stream, **options)
+
+
+class NpyCodec(Codec):
+    extensions = ('npy',)
+    return_types = (np.ndarray, pd.DataFrame)
+    default_return_type = np.ndarray
+    read_options = ('rows', 'mmap_mode')
+    data_types = (np.ndarray, pd.DataFrame)
+    seekable = True
+    # The rows of the array are located from the size of the header
+    random_access = True
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_npy(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_npy(data, stream, **options)
+
+
+class NpzCodec(Codec):
+    extensions = ('npz',)
+    return_types = (dict,)
+    default_return_type = dict
+    read_options = ('arrays',)
+    data_types = (dict,)
+    seekable = True
+    # Zip archive, the directory at its end locates the members
+    random_access = True
+
+    def decode(self, processor, source, return_type, **options):
+        return processor._process_npz(source, return_type, **options)
+
+    def encode(self, processor, data, stream, **options):
+        return processor._encode_npz(data, stream, **options)
+
+
+for _codec in (JsonCodec(), JsonLinesCodec(), CsvCodec(), ExcelCodec(), ParquetCodec(), TxtCodec(), ArrowIpcCodec(),
+               OrcCodec(), NpyCodec(), NpzCodec()):
+    register_codec(_codec)
@@ -0,0 +1,96 @@
+import bz2
+import gzip
+import io
+
+# Compression suffixes handled transparently by read and put, e.g. data.csv.gz
+COMPRESSIONS = ('gz', 'bz2', 'zst', 'lz4')
+
+
+def get_file_extension(file_path):
+    """
+    Extension of a file path including the compression suffix
+    :param file_path: File path, e.g. folder/data.csv.gz
+    return: Lowercase extension, e.g. csv.gz, or csv when not compressed
+    """
+    parts = file_path.split('/')[-1].lower().split('.')
+    if len(parts) > 2 and parts[-1] in COMPRESSIONS:
+        return '.'.join(parts[-2:])
+    return parts[-1]
+
+
+def split_extension(file_extension):
+    """
+    Split an extension returned by get_file_extension
+    return: (format, compression or None)
+    """
+    file_format, _, compression = file_extension.partition('.')
+    if not compression:
+        return file_format, None
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'compression must be {", ".join(COMPRESSIONS)}')
+    return file_format, compression
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstandard must be installed to use .zst files, pip install storage-tool[compression]')
+    return zstandard
+
+
+def _lz4_frame():
+    try:
+        import lz4.frame
+    except ImportError:
+        raise ImportError('lz4 must be installed to use .lz4 files, pip install storage-tool[compression]')
+    return lz4.frame
+
+
+def open_decompressor(stream, compression):
+    """
+    Readable binary file decompressing stream incrementally
+    :param stream: Readable binary file-like object with the compressed data
+    :param compression: gz, bz2, zst or lz4
+    """
+    if compression == 'gz':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(stream, mode='rb')
+    if compression == 'zst':
+        # read_across_frames keeps reading files written as several frames
+        return io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(stream, read_across_frames=True))
+    if compression == 'lz4':
+        return _lz4_frame().LZ4FrameFile(stream, mode='rb')
+    raise ValueError(f'compression must be {", ".join(COMPRESSIONS)}')
+
+
+def rewindable(stream):
+    """
+    Whether a readable stream can seek back to a position it already read.
+    GzipFile reports seekable whatever the stream it decompresses
+    """
+    if isinstance(stream, gzip.GzipFile):
+        return stream.fileobj.seekable()
+    return stream.seekable()
+
+
+def open_compressor(stream, compression, level=None):
+    """
+    Writable binary file compressing into stream, closing it leaves stream open
+    :param stream: Writable binary file-like object
+    :param compression: gz, bz2, zst or lz4
+    :param level: Compression level, the codec default when None
+    """
+    if compression == 'gz':
+        # Level 6 is the zlib default, 9 costs far more CPU for a few percent. mtime=0 keeps the output reproducible
+        return gzip.GzipFile(fileobj=stream, mode='wb', compresslevel=6 if level is None else level, mtime=0)
+    if compression == 'bz2':
+        return bz2.BZ2File(stream, mode='wb', compresslevel=9 if level is None else level)
+    if compression == 'zst':
+        compressor = _zstandard().ZstdCompressor(level=3 if level is None else level)
+        # The zstandard writer is not an io class, BufferedWriter makes pandas treat it as a binary file
+        return io.BufferedWriter(compressor.stream_writer(stream, closefd=False))
+    if compression == 'lz4':
+        return _lz4_frame().LZ4FrameFile(stream, mode='wb', compression_level=level or 0)
+    raise ValueError(f'compression must be {", ".join(COMPRESSIONS)}')
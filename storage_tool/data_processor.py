@@ -1,101 +1,642 @@
+import numpy as np
 import pandas as pd
-import json
+import pyarrow as pa
+import pyarrow.ipc as pa_ipc
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+import pyarrow.orc as pa_orc
+import pyarrow.parquet as pq
+import csv
 import io
+import os
+from storage_tool import json_codec, metrics, tracing
+from storage_tool.arrays import read_npy, read_npz, write_npy, write_npz
+from storage_tool.codecs import DATA_TYPES, RETURN_TYPES, find_codec, get_codec
+from storage_tool.compression import open_compressor, open_decompressor, rewindable, split_extension
+from storage_tool.dtypes import apply_dtype_policy
+from storage_tool.excel import read_xlsx, write_xlsx
+from storage_tool.schema_cache import arrow_types, infer_schema
+from storage_tool.streams import CountingReader, RangeReader, UploadStream
+
+# Arrow return types of read, parsed without going through pandas where the format allows it
+ARROW_RETURN_TYPES = (pa.Table, pa.RecordBatchReader)
+RETURN_TYPE_ERROR = 'return_type must be dict, pd.DataFrame, pa.Table or pa.RecordBatchReader'
+
+# Options accepted by process_data and read
+READ_OPTIONS = ('engine', 'block_size', 'threads', 'dtype_backend', 'usecols', 'dtype', 'dtype_policy', 'chunksize',
+                'normalize', 'max_level', 'orient', 'sheet_name', 'nrows')
+
+# Options accepted by convert_to_bytes, convert_to_buffer, write_to_stream and put
+WRITE_OPTIONS = ('compression', 'compression_level', 'orient', 'engine', 'sheet_name')
 
 class DataProcessor:
-    def process_data(self, data_bytes, file_extension, return_type=None):
-        if file_extension == 'json':
-            return self._process_json(data_bytes, return_type)
-        elif file_extension == 'csv':
-            return self._process_csv(data_bytes, return_type)
-        elif file_extension == 'xlsx':
-            return self._process_excel(data_bytes, return_type)
-        elif file_extension == 'parquet':
-            return self._process_parquet(data_bytes, return_type)
-        elif file_extension == 'txt':
-            return self._process_txt(data_bytes, return_type)
+    # Schema cache of the csv/txt reads, see set_schema_cache
+    schema_cache = None
+
+    def set_schema_cache(self, schema_cache):
+        """
+        Remember the dtypes inferred on the first read of a csv/txt path and give them to the parser on the next reads
+        :param schema_cache: SchemaCache, LocalSchemaCache or SidecarSchemaCache, None to disable
+        """
+        self.schema_cache = schema_cache
+
+    def process_data(self, data_bytes, file_extension, return_type=None, file_path=None, **options):
+        """
+        Parse the content of a file
+        :param data_bytes: File content, bytes, a readable binary stream, a pa.MemoryMappedFile read in place,
+            or for the formats of random_access a RangeReader
+        :param file_extension: Extension of a registered codec with the optional compression suffix, e.g. csv or csv.gz
+        :param return_type: Return type (dict, pd.DataFrame, pa.Table or pa.RecordBatchReader), np.ndarray for npy.
+            None gives the default of the format, pd.DataFrame, np.ndarray for npy and dict for npz
+        :param file_path: Path of the file, key of the schema cache
+        :param engine: CSV/txt parser, 'pyarrow' parses blocks of the file on all cores, pandas' C parser by default.
+            For xlsx the pandas engine, e.g. calamine
+        :param sheet_name: xlsx sheet name or position, a list or None returns a dict of DataFrames
+        :param nrows: xlsx rows to read, the rest of the sheet is not parsed
+        :param block_size: Bytes per block of the pyarrow parser
+        :param threads: 1 parses on the calling thread, other values parse on the pyarrow CPU pool, which is shared
+            by the process and sized with pyarrow.set_cpu_count
+        :param dtype_backend: 'pyarrow' or 'numpy_nullable' dtypes for the returned DataFrame
+        :param usecols: Columns to read, the others are skipped by the parser where the format allows it
+        :param dtype: Dtype or dict of column dtypes of the returned DataFrame, inference is skipped for them
+        :param dtype_policy: 'lean', 'compact' or a dict of settings, see storage_tool.dtypes.DTYPE_POLICIES
+        :param normalize: JSON/JSON Lines, flatten nested records into columns like meta.page with pd.json_normalize
+        :param max_level: Depth of the flattening, all levels by default
+        :param orient: JSON layout written with the same orient, e.g. split or records
+        :param stripes: ORC only, indexes of the stripes to read, the others are not read
+        :param rows: npy only, slice of the rows (first axis) to read, the others are not read
+        :param mmap_mode: npy in LocalStorage only, r, r+ or c to memory-map the array instead of reading it, see np.memmap
+        :param arrays: npz only, names of the arrays to read
+        :param chunksize: JSON Lines only, return a generator of chunks of this many records
+            (lists of dicts for dict, DataFrames for pd.DataFrame) instead of the whole file
+        """
+        file_format, compression = split_extension(file_extension)
+        codec = get_codec(file_format)
+        unexpected = set(options) - set(READ_OPTIONS + tuple(codec.read_options))
+        if unexpected:
+            raise ValueError(f'unexpected options: {", ".join(sorted(unexpected))}')
+        if return_type is None:
+            return_type = codec.default_return_type if codec.default_return_type in codec.return_types else codec.return_types[0]
+        if return_type not in codec.return_types:
+            raise ValueError(RETURN_TYPE_ERROR if codec.return_types == RETURN_TYPES
+                             else f'return_type must be one of {", ".join(t.__name__ for t in codec.return_types)}')
+        if self.schema_cache is not None and file_path is not None:
+            options['schema_key'] = self.schema_cache.key(file_path)
+        random_access = isinstance(data_bytes, (pa.NativeFile, RangeReader))
+        if return_type == pa.RecordBatchReader and not random_access and not isinstance(data_bytes, (bytes, bytearray, memoryview)):
+            # The reader outlives the download, keep the (compressed) content in memory
+            data_bytes = data_bytes.read()
+        if isinstance(data_bytes, (bytes, bytearray, memoryview)):
+            size = len(data_bytes)
+            metrics.record_bytes_in(size)
+            source = io.BytesIO(data_bytes)
+        elif isinstance(data_bytes, pa.NativeFile):
+            # Memory-mapped file, the pages are read by the parser as it touches them
+            size = data_bytes.size()
+            metrics.record_bytes_in(size)
+            source = data_bytes
+        elif isinstance(data_bytes, RangeReader):
+            # The reader records the bytes of each ranged download
+            size = data_bytes.size
+            source = data_bytes
         else:
-            raise ValueError('file_extension must be json, csv, xlsx, parquet or txt')
+            size = None
+            source = CountingReader(data_bytes)
+
+        with tracing.span('parse', format=file_extension, size=size):
+            if compression:
+                source = open_decompressor(source, compression)
+                if codec.seekable or codec.random_access:
+                    # The codec needs random access to the decompressed file
+                    with tracing.span('decompress', compression=compression):
+                        source = io.BytesIO(source.read())
+                elif return_type != pa.RecordBatchReader and not options.get('chunksize'):
+                    # Decompressed as the parser reads, readers and chunks returned to the caller are read after the call
+                    source = tracing.timed_reads(source, 'decompress', compression=compression)
+
+            return codec.decode(self, source, return_type, **options)
+
+    def streams_from(self, file_extension):
+        """
+        Whether the backends should hand process_data the open download instead of its bytes
+        """
+        file_format, compression = split_extension(file_extension)
+        codec = find_codec(file_format)
+        return compression is not None or (codec is not None and codec.streaming)
+
+    def random_access(self, file_extension):
+        """
+        Whether the backends should hand process_data a seekable source read in place,
+        a memory map for local files and a RangeReader for remote objects, instead of the whole content
+        """
+        file_format, compression = split_extension(file_extension)
+        codec = find_codec(file_format)
+        return compression is None and codec is not None and codec.random_access
 
-    def _process_json(self, data_bytes, return_type=dict):
-        data = json.loads(data_bytes)
+    def _process_json(self, source, return_type=dict, dtype_backend=None, usecols=None, dtype=None, dtype_policy=None,
+                      normalize=False, max_level=None, orient=None, **options):
+        content = source.read()
+        if return_type == pd.DataFrame and orient is not None:
+            # Layouts written with an explicit orient are rebuilt by pandas
+            data = pd.read_json(io.BytesIO(content), orient=orient)
+        else:
+            data = json_codec.loads(content)
+        del content
         if return_type == dict:
             return data
         elif return_type == pd.DataFrame:
-            return pd.DataFrame(data)
+            if not isinstance(data, pd.DataFrame):
+                data = self._json_to_frame(data, normalize, max_level)
+            if usecols is not None:
+                data = data[list(usecols)]
+            data = data.convert_dtypes(dtype_backend=dtype_backend) if dtype_backend else data
+            return self._apply_dtypes(data, dtype, dtype_policy)
+        elif return_type in ARROW_RETURN_TYPES:
+            if self._is_records(data):
+                table = pa.Table.from_pylist(data)
+            else:
+                table = pa.Table.from_pandas(pd.DataFrame(data), preserve_index=False)
+            if usecols is not None:
+                table = table.select(list(usecols))
+            return self._arrow_result(table, return_type)
         else:
-            raise ValueError('return_type must be dict or pd.DataFrame')
+            raise ValueError(RETURN_TYPE_ERROR)
 
-    def _process_csv(self, data_bytes, return_type=pd.DataFrame):
-        data = pd.read_csv(io.BytesIO(data_bytes))
-        if return_type == pd.DataFrame:
+    def _process_jsonl(self, source, return_type=dict, chunksize=None, dtype_backend=None, usecols=None, dtype=None, dtype_policy=None,
+                       normalize=False, max_level=None, **options):
+        if return_type in ARROW_RETURN_TYPES:
+            # pyarrow reads JSON Lines natively, on all cores
+            table = pa_json.read_json(source)
+            if usecols is not None:
+                table = table.select(list(usecols))
+            return self._arrow_result(table, return_type)
+        if return_type not in (dict, pd.DataFrame):
+            raise ValueError(RETURN_TYPE_ERROR)
+
+        def to_frame(records):
+            data = self._json_to_frame(records, normalize, max_level)
+            if usecols is not None:
+                data = data.reindex(columns=list(usecols))
+            data = data.convert_dtypes(dtype_backend=dtype_backend) if dtype_backend else data
+            return self._apply_dtypes(data, dtype, dtype_policy)
+
+        records = self._iter_lines(source)
+        if chunksize is None:
+            return list(records) if return_type == dict else to_frame(list(records))
+
+        def chunks():
+            chunk = []
+            for record in records:
+                chunk.append(record)
+                if len(chunk) == chunksize:
+                    yield chunk if return_type == dict else to_frame(chunk)
+                    chunk = []
+            if chunk:
+                yield chunk if return_type == dict else to_frame(chunk)
+        return chunks()
+
+    @staticmethod
+    def _iter_lines(source):
+        # Records are decoded one line at a time, the file is never held as a whole
+        if not isinstance(source, io.BufferedIOBase):
+            source = io.BufferedReader(source)
+        for line in source:
+            if line.strip():
+                yield json_codec.loads(line)
+
+    def _json_to_frame(self, data, normalize=False, max_level=None):
+        if normalize and self._is_records(data):
+            # Nested objects become columns like meta.page, flattened in one vectorized pass
+            return pd.json_normalize(data, max_level=max_level)
+        return pd.DataFrame(data)
+
+    def _process_csv(self, source, return_type=pd.DataFrame, **options):
+        data = self._read_delimited(source, return_type, ',', **options)
+        if return_type in ARROW_RETURN_TYPES:
+            return data
+        elif return_type == pd.DataFrame:
             return data
         elif return_type == dict:
             return data.to_dict()
         else:
-            raise ValueError('return_type must be dict or pd.DataFrame')
+            raise ValueError(RETURN_TYPE_ERROR)
 
-    def _process_excel(self, data_bytes, return_type=pd.DataFrame):
-        data = pd.read_excel(io.BytesIO(data_bytes))
+    def _process_excel(self, source, return_type=pd.DataFrame, dtype_backend=None, usecols=None, dtype=None, dtype_policy=None,
+                       engine=None, sheet_name=0, nrows=None, **options):
+        data = read_xlsx(source, engine, sheet_name, usecols, nrows, dtype, dtype_backend)
+        if isinstance(data, dict):
+            # Several sheets, one DataFrame per sheet
+            if return_type != pd.DataFrame:
+                raise ValueError('return_type must be pd.DataFrame when several sheets are read')
+            return {name: self._apply_dtypes(sheet, None, dtype_policy) for name, sheet in data.items()}
+        data = self._apply_dtypes(data, None, dtype_policy)
         if return_type == pd.DataFrame:
             return data
         elif return_type == dict:
             return data.to_dict()
+        elif return_type in ARROW_RETURN_TYPES:
+            return self._arrow_result(pa.Table.from_pandas(data, preserve_index=False), return_type)
         else:
-            raise ValueError('return_type must be dict or pd.DataFrame')
+            raise ValueError(RETURN_TYPE_ERROR)
         
-    def _process_parquet(self, data_bytes, return_type=pd.DataFrame):
-        data = pd.read_parquet(io.BytesIO(data_bytes))
+    def _process_parquet(self, source, return_type=pd.DataFrame, dtype_backend=None, usecols=None, dtype=None, dtype_policy=None, **options):
+        columns = list(usecols) if usecols is not None else None
+        if return_type == pa.Table:
+            return pq.read_table(source, columns=columns)
+        elif return_type == pa.RecordBatchReader:
+            # Row groups are decoded one at a time as the reader is consumed
+            parquet_file = pq.ParquetFile(source)
+            batches = (
+                batch
+                for index in range(parquet_file.num_row_groups)
+                for batch in parquet_file.read_row_group(index, columns=columns).to_batches()
+            )
+            schema = parquet_file.schema_arrow
+            if columns is not None:
+                schema = pa.schema([schema.field(column) for column in columns])
+            return pa.RecordBatchReader.from_batches(schema, batches)
+        data = pd.read_parquet(source, **self._pandas_options(dtype_backend=dtype_backend, columns=columns))
+        data = self._apply_dtypes(data, dtype, dtype_policy)
         if return_type == pd.DataFrame:
             return data
         elif return_type == dict:
             return data.to_dict()
         else:
-            raise ValueError('return_type must be dict or pd.DataFrame')
+            raise ValueError(RETURN_TYPE_ERROR)
     
-    def _process_txt(self, data_bytes, return_type=pd.DataFrame):
-        data = pd.read_csv(io.BytesIO(data_bytes), sep='\t')
+    def _process_ipc(self, source, return_type=pd.DataFrame, dtype_backend=None, usecols=None, dtype=None, dtype_policy=None, **options):
+        reader = pa_ipc.open_file(source)
+        if usecols is not None:
+            # Only the buffers of the selected columns are read
+            names = reader.schema.names
+            included_fields = [names.index(column) for column in usecols]
+            reader = pa_ipc.open_file(source, options=pa_ipc.IpcReadOptions(included_fields=included_fields))
+        if return_type == pa.RecordBatchReader:
+            # Record batches are read one at a time as the reader is consumed
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+            schema = reader.schema
+            if usecols is not None:
+                # The reader keeps the order of the file, return the columns in the requested order
+                columns = list(usecols)
+                batches = (batch.select(columns) for batch in batches)
+                schema = pa.schema([schema.field(column) for column in columns])
+            return pa.RecordBatchReader.from_batches(schema, batches)
+        # Uncompressed columns of a memory-mapped file are not copied, they point into the mapping
+        table = reader.read_all()
+        if usecols is not None:
+            table = table.select(list(usecols))
+        return self._table_result(table, return_type, dtype_backend, dtype, dtype_policy)
+
+    def _process_orc(self, source, return_type=pd.DataFrame, dtype_backend=None, usecols=None, dtype=None, dtype_policy=None,
+                     stripes=None, **options):
+        orc_file = pa_orc.ORCFile(source)
+        columns = list(usecols) if usecols is not None else None
+        indexes = range(orc_file.nstripes) if stripes is None else list(stripes)
+        schema = orc_file.schema
+        if columns is not None:
+            schema = pa.schema([schema.field(column) for column in columns])
+        # Stripes are read one at a time with the streams of the selected columns only,
+        # the reader keeps the order of the file so the columns are put in the requested order
+        batches = (
+            orc_file.read_stripe(index, columns=columns).select(schema.names)
+            for index in indexes
+        )
+        if return_type == pa.RecordBatchReader:
+            return pa.RecordBatchReader.from_batches(schema, batches)
+        table = pa.Table.from_batches(list(batches), schema)
+        return self._table_result(table, return_type, dtype_backend, dtype, dtype_policy)
+
+    def _process_npy(self, source, return_type=np.ndarray, rows=None, mmap_mode=None, **options):
+        array = read_npy(source, rows, mmap_mode)
         if return_type == pd.DataFrame:
+            return pd.DataFrame(array)
+        return array
+
+    def _process_npz(self, source, return_type=dict, arrays=None, **options):
+        return read_npz(source, arrays)
+
+    def _table_result(self, table, return_type, dtype_backend=None, dtype=None, dtype_policy=None):
+        if return_type == pa.Table:
+            return table
+        data = self._arrow_to_pandas(table, dtype_backend)
+        data = self._apply_dtypes(data, dtype, dtype_policy)
+        if return_type == pd.DataFrame:
+            return data
+        elif return_type == dict:
+            return data.to_dict()
+        else:
+            raise ValueError(RETURN_TYPE_ERROR)
+
+    def _process_txt(self, source, return_type=pd.DataFrame, **options):
+        data = self._read_delimited(source, return_type, '\t', **options)
+        if return_type in ARROW_RETURN_TYPES:
+            return data
+        elif return_type == pd.DataFrame:
             return data
         elif return_type == dict:
             return data.to_dict()
         else:
-            raise ValueError('return_type must be dict or pd.DataFrame')
+            raise ValueError(RETURN_TYPE_ERROR)
+
+    def _read_delimited(self, source, return_type, delimiter, engine=None, block_size=None, threads=None,
+                        dtype_backend=None, usecols=None, dtype=None, dtype_policy=None, schema_key=None):
+        options = dict(engine=engine, block_size=block_size, threads=threads, dtype_backend=dtype_backend, usecols=usecols)
+        # Only complete reads give the schema of the whole file
+        record_schema = False
+        if schema_key is not None and dtype is None and return_type not in ARROW_RETURN_TYPES:
+            cached = self.schema_cache.get(schema_key)
+            record_schema = usecols is None
+            if cached is not None:
+                if not rewindable(source):
+                    # Decompressed streams are read once, kept to parse the file again if the schema does not fit
+                    source = io.BytesIO(source.read())
+                start = source.tell()
+                try:
+                    return self._apply_dtypes(self._parse_delimited(source, return_type, delimiter, dtype=cached, **options),
+                                              None, dtype_policy)
+                except (ValueError, TypeError):
+                    # A file the cached schema does not fit, e.g. text in a column of integers, is inferred again
+                    source.seek(start)
+                    if not record_schema:
+                        self.schema_cache.invalidate(schema_key)
+
+        data = self._parse_delimited(source, return_type, delimiter, dtype=dtype, **options)
+        if return_type in ARROW_RETURN_TYPES:
+            return data
+        if record_schema:
+            schema = infer_schema(data)
+            self.schema_cache.set(schema_key, schema)
+            # The first read returns the same dtypes as the reads using the cached schema
+            data = data.astype(schema)
+        return self._apply_dtypes(data, None, dtype_policy)
+
+    def _parse_delimited(self, source, return_type, delimiter, engine=None, block_size=None, threads=None,
+                         dtype_backend=None, usecols=None, dtype=None):
+        if return_type in ARROW_RETURN_TYPES or engine == 'pyarrow':
+            # The dtypes the parser can convert to directly skip its inference
+            column_types = arrow_types(dtype) if isinstance(dtype, dict) and return_type not in ARROW_RETURN_TYPES else None
+            table = self._read_arrow_csv(source, return_type, delimiter, block_size, threads, usecols, column_types)
+            if return_type in ARROW_RETURN_TYPES:
+                return table
+            data = self._arrow_to_pandas(table, dtype_backend)
+            if isinstance(dtype, dict):
+                # As with pandas' parser, the dtypes of the columns left out by usecols are ignored
+                dtype = {column: value for column, value in dtype.items() if column in data.columns}
+            return self._apply_dtypes(data, dtype)
+        return pd.read_csv(
+            source,
+            sep=delimiter,
+            **self._pandas_options(engine=engine, dtype_backend=dtype_backend, usecols=usecols, dtype=dtype)
+        )
+
+    def _read_arrow_csv(self, source, return_type, delimiter, block_size=None, threads=None, usecols=None, column_types=None):
+        # pyarrow parses blocks of the file on all cores
+        read_options = pa_csv.ReadOptions(use_threads=threads != 1)
+        if block_size:
+            read_options.block_size = block_size
+        parse_options = pa_csv.ParseOptions(delimiter=delimiter)
+        # Empty fields are nulls, as with pandas
+        convert_options = pa_csv.ConvertOptions(strings_can_be_null=True)
+        if usecols is not None:
+            convert_options.include_columns = list(usecols)
+        if column_types:
+            convert_options.column_types = column_types
+        if return_type == pa.RecordBatchReader:
+            return pa_csv.open_csv(source, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+        return pa_csv.read_csv(source, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+
+    @staticmethod
+    def _apply_dtypes(data, dtype=None, dtype_policy=None):
+        # Callers pass dtype=None when the parser already applied it
+        if dtype is not None:
+            data = data.astype(dtype)
+        if dtype_policy is not None:
+            skip = data.columns if dtype is not None and not isinstance(dtype, dict) else (dtype or {})
+            data = apply_dtype_policy(data, dtype_policy, skip=set(skip))
+        return data
+
+    @staticmethod
+    def _arrow_to_pandas(table, dtype_backend=None):
+        if dtype_backend == 'pyarrow':
+            # Columns stay in the Arrow buffers instead of being converted to numpy/object arrays
+            return table.to_pandas(types_mapper=pd.ArrowDtype)
+        data = table.to_pandas()
+        return data.convert_dtypes(dtype_backend=dtype_backend) if dtype_backend else data
+
+    @staticmethod
+    def _pandas_options(**options):
+        # Leave out the options that were not given so pandas applies its own defaults
+        return {key: value for key, value in options.items() if value is not None}
+
+    @staticmethod
+    def _arrow_result(table, return_type):
+        if return_type == pa.RecordBatchReader:
+            return pa.RecordBatchReader.from_batches(table.schema, table.to_batches())
+        return table
     
-    def convert_to_bytes(self, data, file_extension):
+    def convert_to_bytes(self, data, file_extension, **options):
+        # getvalue() hands over the BytesIO internal buffer, the output is not copied
+        return self.convert_to_buffer(data, file_extension, **options).getvalue()
 
-        if isinstance(data, pd.DataFrame):
-            if file_extension == 'csv':
-                return data.to_csv(index=False).encode('utf-8')
-            elif file_extension == 'xlsx':
-                return data.to_excel(index=False)
-            elif file_extension == 'parquet':
-                return data.to_parquet(index=False)
-            elif file_extension == 'json':
-                return data.to_json(index=False).encode('utf-8')
-            elif file_extension == 'txt':
-                return data.to_csv(index=False, sep='\t').encode('utf-8')
-            else:
-                raise ValueError('file_extension must be json, csv, xlsx, parquet or txt')
-        
-        elif isinstance(data , dict) or isinstance(data, list):
-            if file_extension == 'json':
-                return json.dumps(data).encode('utf-8')
-            elif file_extension == 'txt':
-                return pd.DataFrame(data).to_csv(index=False, sep='\t').encode('utf-8')
-            elif file_extension == 'csv':
-                return pd.DataFrame(data).to_csv(index=False).encode('utf-8')
-            elif file_extension == 'xlsx':
-                return pd.DataFrame(data).to_excel(index=False)
-            elif file_extension == 'parquet':
-                return pd.DataFrame(data).to_parquet(index=False)
+    def convert_to_buffer(self, data, file_extension, **options):
+        """
+        Serialize data into a BytesIO positioned at the start
+        """
+        buffer = io.BytesIO()
+        self.write_to_stream(data, file_extension, buffer, **options)
+        buffer.seek(0)
+        return buffer
+
+    def write_to_stream(self, data, file_extension, stream, **options):
+        """
+        Serialize data straight into a binary stream, without intermediate strings or buffers. Formats written with
+        seeks, e.g. xlsx, go through a buffer when the stream only writes forward
+        :param data: pd.DataFrame, dict or list, np.ndarray for npy and a dict of arrays for npz
+        :param file_extension: Extension of a registered codec with the optional compression suffix, e.g. csv or csv.gz
+        :param stream: Binary file-like object open for writing
+        :param compression: Parquet codec (snappy, gzip, brotli, lz4, zstd or none), snappy by default.
+            Arrow IPC buffer codec (lz4 or zstd), uncompressed by default so that memory-mapped reads are zero-copy.
+            ORC codec (snappy, zlib, lz4, zstd or uncompressed), snappy by default.
+            npz members deflate or stored (None) by default
+        :param compression_level: Level of the Parquet codec or of the compression suffix
+        :param orient: Layout of DataFrames written as JSON (columns, records, split, index, values or table)
+        :param engine: xlsx writer, xlsxwriter when installed or openpyxl, both in constant-memory mode
+        :param sheet_name: xlsx sheet name
+        :param stripe_size: ORC stripe size in bytes, the unit of the reads by stripe
+        return: Number of bytes written
+        """
+        file_format, compression = split_extension(file_extension)
+        codec = get_codec(file_format)
+        unexpected = set(options) - set(WRITE_OPTIONS + tuple(codec.write_options))
+        if unexpected:
+            raise ValueError(f'unexpected options: {", ".join(sorted(unexpected))}')
+
+        start = stream.tell()
+        with tracing.span('serialize', format=file_extension):
+            if compression:
+                with open_compressor(stream, compression, options.get('compression_level')) as target:
+                    if codec.seekable_output:
+                        # Compressors only write forward, the codec writes into a buffer first
+                        buffer = io.BytesIO()
+                        self._encode(codec, data, buffer, **options)
+                        target.write(buffer.getbuffer())
+                    else:
+                        self._encode(codec, data, target, **options)
+            elif codec.seekable_output and not stream.seekable():
+                # Upload streams only write forward too
+                buffer = io.BytesIO()
+                self._encode(codec, data, buffer, **options)
+                stream.write(buffer.getbuffer())
             else:
-                raise ValueError('file_extension must be json, csv, xlsx, parquet or txt')
-            
-        
-        else:
-            raise ValueError('data must be dict or pd.DataFrame')
-        
-        
+                self._encode(codec, data, stream, **options)
+        size = stream.tell() - start
+        if not isinstance(stream, UploadStream):
+            # Upload streams record the parts as they send them
+            metrics.record_bytes_out(size)
+        return size
+
+    def _encode(self, codec, data, stream, **options):
+        if isinstance(data, pa.RecordBatch):
+            data = pa.Table.from_batches([data])
+        if not isinstance(data, codec.data_types):
+            raise ValueError('data must be dict, pd.DataFrame or pa.Table' if codec.data_types == DATA_TYPES
+                             else f'data must be {" or ".join(t.__name__ for t in codec.data_types)}')
+        return codec.encode(self, data, stream, **options)
+
+    def _encode_json(self, data, stream, orient=None, **options):
+        if isinstance(data, (dict, list)):
+            return self._write_json(data, stream)
+        if isinstance(data, pa.Table):
+            return self._write_json(data.to_pylist(), stream)
+        # The 'columns' and 'index' layouts are keyed by the index, it cannot be left out
+        index = {} if orient in ('columns', 'index') else {'index': False}
+        data.to_json(stream, orient=orient, **index)
+
+    def _encode_jsonl(self, data, stream, **options):
+        if isinstance(data, (dict, list)):
+            return self._write_jsonl([data] if isinstance(data, dict) else data, stream)
+        if isinstance(data, pa.Table):
+            return self._write_jsonl((record for batch in data.to_batches() for record in batch.to_pylist()), stream)
+        self._write_jsonl_frame(data, stream)
+
+    def _encode_delimited(self, data, stream, sep, **options):
+        if self._is_records(data):
+            return self._write_records(data, stream, sep=sep)
+        if isinstance(data, (dict, list)):
+            data = pd.DataFrame(data)
+        if isinstance(data, pa.Table):
+            # Arrow tables are written by pyarrow itself, without a pandas round trip
+            write_options = pa_csv.WriteOptions(delimiter=sep, quoting_style='needed')
+            return pa_csv.write_csv(data, stream, write_options=write_options)
+        data.to_csv(stream, index=False, sep=sep, encoding='utf-8')
+
+    def _encode_excel(self, data, stream, engine=None, sheet_name='Sheet1', **options):
+        if isinstance(data, (dict, list)):
+            data = pd.DataFrame(data)
+        elif isinstance(data, pa.Table):
+            data = data.to_pandas()
+        write_xlsx(data, stream, engine, sheet_name)
+
+    def _encode_parquet(self, data, stream, **options):
+        if isinstance(data, (dict, list)):
+            data = pd.DataFrame(data)
+        if isinstance(data, pa.Table):
+            return pq.write_table(
+                data,
+                stream,
+                compression=options.get('compression', 'snappy'),
+                compression_level=options.get('compression_level')
+            )
+        data.to_parquet(stream, index=False, **self._parquet_options(options))
+
+    def _encode_ipc(self, data, stream, compression=None, compression_level=None, **options):
+        if isinstance(data, (dict, list)):
+            data = pd.DataFrame(data)
+        if isinstance(data, pd.DataFrame):
+            data = pa.Table.from_pandas(data, preserve_index=False)
+        self._write_ipc(data, stream, compression, compression_level)
+
+    def _encode_orc(self, data, stream, compression=None, stripe_size=None, **options):
+        if isinstance(data, (dict, list)):
+            data = pd.DataFrame(data)
+        if isinstance(data, pd.DataFrame):
+            data = pa.Table.from_pandas(data, preserve_index=False)
+        pa_orc.write_table(data, stream, **self._pandas_options(compression=compression or 'snappy', stripe_size=stripe_size))
+
+    def _encode_npy(self, data, stream, **options):
+        write_npy(data.to_numpy() if isinstance(data, pd.DataFrame) else data, stream)
+
+    def _encode_npz(self, data, stream, compression=None, **options):
+        write_npz(data, stream, compression)
+
+    @staticmethod
+    def _parquet_options(options):
+        return {key: options[key] for key in ('compression', 'compression_level') if key in options}
+
+    @staticmethod
+    def _write_ipc(table, stream, compression=None, compression_level=None):
+        # Arrow IPC file format (Feather V2), the layout of the buffers is the in-memory layout
+        if compression is not None:
+            compression = pa.Codec(compression, compression_level)
+        with pa_ipc.new_file(stream, table.schema, options=pa_ipc.IpcWriteOptions(compression=compression)) as writer:
+            writer.write_table(table)
+
+    @staticmethod
+    def _is_records(data):
+        return isinstance(data, list) and bool(data) and all(isinstance(item, dict) for item in data)
+
+    def _write_json(self, data, stream):
+        json_codec.dump(data, stream)
+
+    def _write_jsonl(self, records, stream):
+        # One line per record, so files can be appended to and read back line by line
+        for record in records:
+            stream.write(json_codec.dumps(record) + b'\n')
+
+    def _write_jsonl_frame(self, data, stream, chunksize=10000):
+        # to_json builds its whole output in memory, serialize the frame a slice at a time
+        for start in range(0, len(data), chunksize):
+            lines = data.iloc[start:start + chunksize].to_json(orient='records', lines=True)
+            stream.write(lines.rstrip('\n').encode('utf-8') + b'\n')
+
+    def _write_records(self, records, stream, sep=','):
+        # Same layout as pd.DataFrame(records).to_csv(index=False), without building the DataFrame: missing keys,
+        # None and NaN are empty fields, and the integers of numeric columns with floats or missing values are
+        # written as floats, as pandas casts those columns to float64
+        fieldnames = list(dict.fromkeys(key for record in records for key in record))
+        float_columns = {column for column in fieldnames if self._float_column(record.get(column) for record in records)}
+
+        def rows():
+            for record in records:
+                row = {}
+                for column, value in record.items():
+                    if _missing(value):
+                        value = ''
+                    elif column in float_columns:
+                        value = float(value)
+                    row[column] = value
+                yield row
+
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        try:
+            writer = csv.DictWriter(text, fieldnames=fieldnames, delimiter=sep, lineterminator=os.linesep)
+            writer.writeheader()
+            writer.writerows(rows())
+            text.flush()
+        finally:
+            text.detach()
+
+    @staticmethod
+    def _float_column(values):
+        # Numbers only, booleans aside, with at least one float or missing value
+        has_float = False
+        for value in values:
+            if _missing(value) or isinstance(value, (float, np.floating)):
+                has_float = True
+            elif isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, np.integer)):
+                return False
+        return has_float
 
 
+def _missing(value):
+    return value is None or (isinstance(value, (float, np.floating)) and np.isnan(value))
@@ -0,0 +1,315 @@
+import re
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from storage_tool import metrics
+from storage_tool.codecs import find_codec
+from storage_tool.compression import get_file_extension, split_extension
+
+# Files fetched and parsed concurrently by read_dataset
+DEFAULT_WORKERS = 8
+# Partition value Hive writes for nulls
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+DATASET_RETURN_TYPES = (pd.DataFrame, pa.Table, pa.RecordBatchReader)
+FILTER_OPERATORS = ('=', '==', '!=', '<', '<=', '>', '>=', 'in', 'not in')
+
+_INTEGER = re.compile(r'-?\d+')
+
+
+def parse_partitions(relative_path):
+    """
+    Hive partitions of a path, e.g. date=2024-05-01/country=BR/part-0.parquet
+    return: {key: value} of the folders written as key=value, the values are strings
+    """
+    partitions = {}
+    for folder in relative_path.split('/')[:-1]:
+        key, separator, value = folder.partition('=')
+        if separator and key:
+            value = unquote(value)
+            partitions[unquote(key)] = None if value == NULL_PARTITION else value
+    return partitions
+
+
+def partition_types(files):
+    """
+    Type every partition key, int64 when all its values are integers, string otherwise
+    :param files: List of dicts with the partitions of each file
+    return: {key: pa.DataType}
+    """
+    values = {}
+    for item in files:
+        for key, value in item['partitions'].items():
+            values.setdefault(key, []).append(value)
+    return {
+        key: pa.int64() if all(value is None or _INTEGER.fullmatch(value) for value in found) else pa.string()
+        for key, found in values.items()
+    }
+
+
+def normalize_filters(filters):
+    """
+    Filters in disjunctive normal form, a list of (column, operator, value) is one conjunction,
+    a list of such lists is the union of the conjunctions
+    return: List of lists of tuples
+    """
+    if not filters:
+        return []
+    if all(isinstance(predicate, tuple) for predicate in filters):
+        filters = [filters]
+    for conjunction in filters:
+        for predicate in conjunction:
+            if not isinstance(predicate, tuple) or len(predicate) != 3:
+                raise ValueError('filters must be (column, operator, value) tuples or lists of them')
+            if predicate[1] not in FILTER_OPERATORS:
+                raise ValueError(f'filter operator must be {", ".join(FILTER_OPERATORS[:-1])} or {FILTER_OPERATORS[-1]}')
+    return [list(conjunction) for conjunction in filters]
+
+
+def typed_filters(filters, types):
+    """
+    Give the filter values on partition keys the type of the partition, e.g. ('hour', '=', '12') on the int64
+    partition hour becomes ('hour', '=', 12), as the files are pruned and filtered with the typed values
+    :param filters: Normalized filters, see normalize_filters
+    :param types: Partition types, see partition_types
+    """
+    def cast(column, value):
+        if pa.types.is_integer(types[column]) and isinstance(value, str):
+            if not _INTEGER.fullmatch(value.strip()):
+                raise ValueError(f'filter value {value!r} of the integer partition {column} is not an integer')
+            return int(value)
+        if pa.types.is_string(types[column]) and isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value)
+        return value
+
+    return [
+        [
+            (column, operator, [cast(column, item) for item in value] if operator in ('in', 'not in') else cast(column, value))
+            if column in types else (column, operator, value)
+            for column, operator, value in conjunction
+        ]
+        for conjunction in filters
+    ]
+
+
+def _matches(value, operator, expected):
+    # Null partitions match no predicate, as in SQL
+    if value is None:
+        return False
+    try:
+        return _compare(value, operator, expected)
+    except TypeError:
+        raise ValueError(f'filter value {expected!r} cannot be compared with the partition value {value!r}') from None
+
+
+def _compare(value, operator, expected):
+    if operator in ('=', '=='):
+        return value == expected
+    if operator == '!=':
+        return value != expected
+    if operator == '<':
+        return value < expected
+    if operator == '<=':
+        return value <= expected
+    if operator == '>':
+        return value > expected
+    if operator == '>=':
+        return value >= expected
+    if operator == 'in':
+        return value in expected
+    return value not in expected
+
+
+def keep_partition(partitions, filters):
+    """
+    Whether a file can hold rows matching the filters, only the predicates on its partition keys are checked
+    :param partitions: Typed partition values of the file
+    :param filters: Normalized filters, see normalize_filters
+    """
+    if not filters:
+        return True
+    return any(
+        all(
+            _matches(partitions[column], operator, value)
+            for column, operator, value in conjunction
+            if column in partitions
+        )
+        for conjunction in filters
+    )
+
+
+def filter_expression(filters):
+    """
+    pyarrow.compute expression of normalized filters, applied to the rows of each file
+    """
+    expression = None
+    for conjunction in filters:
+        clause = None
+        for column, operator, value in conjunction:
+            field = pc.field(column)
+            if operator in ('=', '=='):
+                predicate = field == value
+            elif operator == '!=':
+                predicate = field != value
+            elif operator == '<':
+                predicate = field < value
+            elif operator == '<=':
+                predicate = field <= value
+            elif operator == '>':
+                predicate = field > value
+            elif operator == '>=':
+                predicate = field >= value
+            elif operator == 'in':
+                predicate = field.isin(list(value))
+            else:
+                predicate = ~field.isin(list(value))
+            clause = predicate if clause is None else clause & predicate
+        expression = clause if expression is None else expression | clause
+    return expression
+
+
+def map_ordered(function, items, workers=DEFAULT_WORKERS):
+    """
+    Yield function(item) for every item in order, computed on a thread pool with at most two items per worker
+    in flight, the results are held until the ones before them are consumed
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for item in items:
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+            pending.append(executor.submit(function, item))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # A failed file, or a reader closed early, cancels the files that did not start
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class DatasetReader:
+    """
+    Reads of Hive-partitioned folders shared by the backends, built on their _iter_objects and read
+    """
+
+    def read_dataset(self, prefix, filters=None, columns=None, return_type=pd.DataFrame, workers=DEFAULT_WORKERS,
+                     file_format=None, **options):
+        """
+        Read the files under a prefix as one table, e.g. events/date=2024-05-01/part-0.parquet
+        The key=value folders become columns, int64 when all their values are integers and string otherwise.
+        The files of the partitions excluded by the filters are not downloaded
+        :param prefix: Folder of the dataset
+        :param filters: (column, operator, value) tuples that must all hold, or a list of such lists of which one
+            must hold. Operators =, ==, !=, <, <=, >, >=, in and not in. The predicates on partition keys prune
+            the files, their values are converted to the partition type. The others filter the rows of each file
+        :param columns: Columns to return, file and partition columns, all of them by default
+        :param return_type: pd.DataFrame, pa.Table or pa.RecordBatchReader streaming the files in order as they are
+            parsed, the files must then share the schema of the first one
+        :param workers: Files fetched and parsed concurrently
+        :param file_format: Format of the files of the dataset, e.g. parquet, with or without a compression suffix.
+            The format of most files by default, the files of other formats are left out
+        :param options: Parsing options of each file, see DataProcessor.process_data
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        if return_type not in DATASET_RETURN_TYPES:
+            raise ValueError('return_type must be pd.DataFrame, pa.Table or pa.RecordBatchReader')
+        filters = normalize_filters(filters)
+
+        # Key order on every backend, object stores list keys sorted, local folders in directory order
+        files = sorted(self._dataset_files(prefix), key=lambda item: item['object'])
+        if file_format is None and files:
+            # most_common keeps the key order between formats with as many files
+            file_format = Counter(item['format'] for item in files).most_common(1)[0][0]
+        files = [item for item in files if item['format'] == split_extension(file_format)[0]]
+        types = partition_types(files)
+        for item in files:
+            item['partitions'] = {
+                key: value if value is None or types[key] == pa.string() else int(value)
+                for key, value in item['partitions'].items()
+            }
+        filters = typed_filters(filters, types)
+        files = [item for item in files if keep_partition(item['partitions'], filters)]
+
+        # The parsers read the columns of the files needed for the result and for the row filters
+        usecols = None
+        if columns is not None:
+            needed = list(columns) + [column for conjunction in filters for column, _, _ in conjunction]
+            usecols = list(dict.fromkeys(column for column in needed if column not in types))
+        expression = filter_expression(filters)
+
+        def load(item):
+            # The byte counters are per call context, the pool threads report theirs with the table and the
+            # totals are recorded in the read_dataset call. A RecordBatchReader fetches its files as it is consumed,
+            # after read_dataset returned, those bytes are not in its event, only in the track_bytes blocks and
+            # the instrumented call, if any, around the consumption
+            with metrics.track_bytes() as transferred:
+                table = self._read_part(item['object'], usecols=usecols, **options)
+            for key, type_ in types.items():
+                if key in table.column_names:
+                    # Written both as a folder and as a column
+                    continue
+                value = item['partitions'].get(key)
+                table = table.append_column(pa.field(key, type_), pa.repeat(pa.scalar(value, type_), len(table)))
+            if expression is not None:
+                table = table.filter(expression)
+            if columns is not None:
+                table = table.select(list(columns))
+            return table, transferred.bytes_in
+
+        def tables():
+            for table, bytes_in in map_ordered(load, files, workers):
+                metrics.record_bytes_in(bytes_in)
+                yield table
+
+        if return_type == pa.RecordBatchReader:
+            return self._dataset_reader(tables())
+
+        parts = list(tables())
+        if not parts:
+            return pd.DataFrame() if return_type == pd.DataFrame else pa.table({})
+        # Files with missing columns or different inferred types are unified, e.g. int64 and double
+        table = pa.concat_tables(parts, promote_options='permissive')
+        if return_type == pa.Table:
+            return table
+        return self._arrow_to_pandas(table, options.get('dtype_backend'))
+
+    def _dataset_files(self, prefix):
+        folder = prefix.strip('/')
+        folder = f'{folder}/' if folder else ''
+        for item in self._iter_objects(folder):
+            relative = item['object'][len(folder):]
+            name = relative.split('/')[-1]
+            # Folder placeholders, the _SUCCESS, _metadata and hidden files of Hive and Spark jobs, and the schemas
+            # of SidecarSchemaCache (_schema.json and <file>.schema.json)
+            if not name or name.startswith(('_', '.')) or name.endswith('.schema.json'):
+                continue
+            file_format = split_extension(get_file_extension(name))[0]
+            if find_codec(file_format) is None:
+                continue
+            yield {"object": item['object'], "size": item['size'], "format": file_format,
+                   "partitions": parse_partitions(relative)}
+
+    def _read_part(self, key, **options):
+        """
+        Read one file of a dataset as a pa.Table, called from the pool threads
+        """
+        return self.read(key, return_type=pa.Table, **options)
+
+    @staticmethod
+    def _dataset_reader(tables):
+        first = next(tables, None)
+        if first is None:
+            return pa.RecordBatchReader.from_batches(pa.schema([]), iter(()))
+        schema = first.schema
+
+        def batches():
+            yield from first.to_batches()
+            for table in tables:
+                yield from table.select(schema.names).cast(schema).to_batches()
+
+        return pa.RecordBatchReader.from_batches(schema, batches())
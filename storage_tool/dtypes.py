@@ -0,0 +1,73 @@
+import pandas as pd
+
+# Named dtype policies for read(dtype_policy=...)
+# downcast: smallest integer dtype holding the column, floats: also downcast floats to float32 (lossy)
+# category_threshold: strings with at most this ratio of distinct values become categoricals
+# string_dtype: dtype of the other string columns
+DTYPE_POLICIES = {
+    'lean': {
+        'downcast': True,
+        'floats': False,
+        'category_threshold': 0.5,
+        'string_dtype': 'string[pyarrow]',
+    },
+    'compact': {
+        'downcast': True,
+        'floats': True,
+        'category_threshold': 0.5,
+        'string_dtype': 'string[pyarrow]',
+    },
+}
+
+
+def resolve_policy(dtype_policy):
+    """
+    Settings of a dtype policy
+    :param dtype_policy: Name in DTYPE_POLICIES or a dict overriding the settings of 'lean'
+    """
+    if isinstance(dtype_policy, str):
+        if dtype_policy not in DTYPE_POLICIES:
+            raise ValueError(f'dtype_policy must be one of {", ".join(DTYPE_POLICIES)} or a dict')
+        return DTYPE_POLICIES[dtype_policy]
+    if isinstance(dtype_policy, dict):
+        unexpected = set(dtype_policy) - set(DTYPE_POLICIES['lean'])
+        if unexpected:
+            raise ValueError(f'unexpected dtype_policy settings: {", ".join(sorted(unexpected))}')
+        return {**DTYPE_POLICIES['lean'], **dtype_policy}
+    raise ValueError(f'dtype_policy must be one of {", ".join(DTYPE_POLICIES)} or a dict')
+
+
+def apply_dtype_policy(data, dtype_policy, skip=()):
+    """
+    Convert the columns of a DataFrame to memory-lean dtypes, in place
+    :param data: pd.DataFrame
+    :param dtype_policy: Name in DTYPE_POLICIES or a dict of settings
+    :param skip: Columns left untouched, e.g. the ones with an explicit dtype
+    return: The DataFrame
+    """
+    policy = resolve_policy(dtype_policy)
+    rows = len(data)
+
+    for column in data.columns:
+        if column in skip:
+            continue
+        series = data[column]
+
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            if policy['downcast']:
+                data[column] = pd.to_numeric(series, downcast='unsigned' if series.min() >= 0 else 'integer')
+        elif pd.api.types.is_float_dtype(series):
+            if policy['floats']:
+                data[column] = pd.to_numeric(series, downcast='float')
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+                continue
+            threshold = policy['category_threshold']
+            if threshold and rows and series.nunique(dropna=True) <= threshold * rows:
+                data[column] = series.astype('category')
+            elif policy['string_dtype']:
+                data[column] = series.astype(policy['string_dtype'])
+
+    return data
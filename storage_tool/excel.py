@@ -0,0 +1,88 @@
+import datetime
+
+import pandas as pd
+
+# Number format of the dates and datetimes written by xlsxwriter, as pandas' ExcelWriter
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+# Rows converted to Python values at a time while a sheet is written
+ROW_CHUNK = 10000
+
+
+def default_engine():
+    """
+    xlsxwriter when it is installed, openpyxl otherwise
+    """
+    try:
+        import xlsxwriter
+        return 'xlsxwriter'
+    except ImportError:
+        return 'openpyxl'
+
+
+def iter_rows(data, chunksize=ROW_CHUNK):
+    """
+    Header and rows of a DataFrame as tuples of Python values, missing values as None
+    Only one chunk of rows is converted at a time
+    """
+    yield tuple(data.columns)
+    for start in range(0, len(data), chunksize):
+        chunk = data.iloc[start:start + chunksize].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def write_xlsx(data, stream, engine=None, sheet_name='Sheet1'):
+    """
+    Write a DataFrame as a single sheet workbook row by row, in constant memory
+    :param data: pd.DataFrame
+    :param stream: Writable binary file-like object
+    :param engine: xlsxwriter (constant_memory mode) or openpyxl (write-only mode), see default_engine
+    :param sheet_name: Name of the sheet
+    """
+    engine = engine or default_engine()
+    if engine == 'xlsxwriter':
+        import xlsxwriter
+        # constant_memory flushes each row to a temporary file once the next one starts. Datetimes are written as
+        # numbers, they need a date format to show as dates, and Excel has no time zones, the local time is kept
+        workbook = xlsxwriter.Workbook(stream, {
+            'constant_memory': True,
+            'default_date_format': DATETIME_FORMAT,
+            'remove_timezone': True,
+        })
+        worksheet = workbook.add_worksheet(sheet_name)
+        for index, row in enumerate(iter_rows(data)):
+            worksheet.write_row(index, 0, row)
+        workbook.close()
+    elif engine == 'openpyxl':
+        from openpyxl import Workbook
+        # Write-only workbooks stream the rows to a temporary file instead of keeping a cell object per value
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in iter_rows(data):
+            worksheet.append(tuple(_remove_timezone(value) for value in row))
+        workbook.save(stream)
+    else:
+        raise ValueError('engine must be xlsxwriter or openpyxl')
+
+
+def read_xlsx(source, engine=None, sheet_name=0, usecols=None, nrows=None, dtype=None, dtype_backend=None):
+    """
+    Read a workbook with pandas, only the requested sheet, columns and rows are parsed
+    :param engine: openpyxl (read-only mode) by default, calamine when python-calamine is installed is much faster
+    :param sheet_name: Sheet name or position, a list or None returns a dict of DataFrames
+    """
+    options = {
+        'engine': engine,
+        'usecols': usecols,
+        'nrows': nrows,
+        'dtype': dtype,
+        'dtype_backend': dtype_backend,
+    }
+    return pd.read_excel(source, sheet_name=sheet_name, **{key: value for key, value in options.items() if value is not None})
+
+
+def _remove_timezone(value):
+    # openpyxl rejects aware datetimes, the local time is kept as xlsxwriter's remove_timezone does
+    if isinstance(value, (datetime.datetime, datetime.time)) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
@@ -0,0 +1,162 @@
+import errno
+import os
+import shutil
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+# ioctl cloning the extents of a file into another (Btrfs, XFS, bcachefs, OCFS2), see ioctl_ficlone(2)
+FICLONE = 0x40049409
+# Bytes moved per copy_file_range/sendfile call, Linux caps a call at about 2GB
+COPY_CHUNK = 1024 * 1024 * 1024
+# Buffer of the streamed fallback
+STREAM_CHUNK = 1024 * 1024
+
+# Errors meaning the kernel path is not available for these files, the next method is tried
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM, errno.ENOTSOCK}
+if hasattr(errno, 'ENOTSUP'):
+    _UNSUPPORTED.add(errno.ENOTSUP)
+
+
+def copy_file(src, dst):
+    """
+    Copy a file without reading it into memory, the destination is replaced once it is complete
+    Tried in order: a reflink clone (copy-on-write, no data is copied), copy_file_range and sendfile (the data
+    stays in the kernel), then a streamed copy through a fixed-size buffer
+    :param src: Source path
+    :param dst: Destination path, its folder must exist
+    return: Name of the method used, clone, copy_file_range, sendfile or stream
+    """
+    temporary = f'{dst}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(src, 'rb') as source, open(temporary, 'wb') as target:
+            method = _copy(source, target, os.fstat(source.fileno()).st_size)
+        os.replace(temporary, dst)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return method
+
+
+def move_file(src, dst):
+    """
+    Move a file, renamed in place when both paths are on the same filesystem, copied and removed otherwise
+    :param src: Source path
+    :param dst: Destination path, its folder must exist
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_file(src, dst)
+        os.remove(src)
+
+
+def iter_files(root, path='', recursive=True, workers=1):
+    """
+    Iterate over the files of a folder with their size and modification time, without building the whole listing
+    :param root: Folder the paths are relative to
+    :param path: Folder to list, relative to root
+    :param recursive: Descend into the subfolders, symlinked folders are not followed
+    :param workers: Folders scanned concurrently, on network filesystems each scan waits on the server
+    return: Generator of {"object": path from root, "type": "file", "size": bytes, "modified_at": datetime}
+    """
+    if workers <= 1 or not recursive:
+        pending = [path]
+        while pending:
+            folders = []
+            yield from _scan(root, pending.pop(), folders)
+            if recursive:
+                pending.extend(reversed(folders))
+        return
+
+    def scan(folder):
+        folders = []
+        return list(_scan(root, folder, folders)), folders
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        running = {executor.submit(scan, path)}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, folders = future.result()
+                running |= {executor.submit(scan, folder) for folder in folders}
+                yield from files
+    finally:
+        # A generator closed early does not wait for the queued scans
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _scan(root, path, folders):
+    # Files of one folder, its subfolders are appended to folders. DirEntry keeps the type read with the
+    # listing, only the files are stat'ed, once, for their size and time (free on Windows)
+    with os.scandir(os.path.join(root, path)) as entries:
+        for entry in entries:
+            relative = f'{path.rstrip("/")}/{entry.name}' if path else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                folders.append(relative)
+            elif entry.is_file():
+                stat = entry.stat()
+                yield {
+                    "object": relative,
+                    "type": "file",
+                    "size": stat.st_size,
+                    "modified_at": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+                }
+
+
+def _copy(source, target, size):
+    if size and _clone(source, target):
+        return 'clone'
+    for method, copy_range in (('copy_file_range', _copy_file_range), ('sendfile', _sendfile)):
+        try:
+            if copy_range(source, target, size):
+                return method
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+            # Nothing was written by the failed call, restart from the beginning
+            source.seek(0)
+            target.seek(0)
+            target.truncate()
+    shutil.copyfileobj(source, target, STREAM_CHUNK)
+    return 'stream'
+
+
+def _clone(source, target):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(source, target, size):
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(source.fileno(), target.fileno(), min(COPY_CHUNK, size - offset), offset, offset)
+        if copied == 0:
+            break
+        offset += copied
+    return True
+
+
+def _sendfile(source, target, size):
+    if not hasattr(os, 'sendfile'):
+        return False
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(target.fileno(), source.fileno(), offset, min(COPY_CHUNK, size - offset))
+        if sent == 0:
+            break
+        offset += sent
+    return True
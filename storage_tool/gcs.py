@@ -1,8 +1,20 @@
+import base64
+import io
+import threading
 from gcloud import storage
+from gcloud.streaming.http_wrapper import Request
+from gcloud.streaming.transfer import Download
 from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
+import pyarrow as pa
+from storage_tool import metrics, tracing
+from storage_tool.compression import get_file_extension
 from storage_tool.base import BaseStorage
 from storage_tool.data_processor import DataProcessor
+from storage_tool.streams import DEFAULT_BLOCK_SIZE, DEFAULT_PART_SIZE, GCSResumableUpload, RangeReader, write_all
+from storage_tool.dataset import DatasetReader
+from storage_tool.transfer import DirectoryTransfer
+from storage_tool.writers import DataFrameWriter
 
 def erase_after_pattern(original_string, pattern):
     parts = original_string.split(pattern, 1)
@@ -49,7 +61,7 @@ class GCSAuthorization:
             return False
         return True
     
-class GCSStorage(BaseStorage, DataProcessor):
+class GCSStorage(BaseStorage, DataProcessor, DirectoryTransfer, DatasetReader):
     # Define permitted return types
     return_types = [str, dict, pd.DataFrame, list]
 
@@ -61,6 +73,8 @@ class GCSStorage(BaseStorage, DataProcessor):
             raise Exception('Invalid credentials')
 
         self.client = Authorization.client
+        # Clients of the transfer threads, the HTTP connection of a client is not thread-safe
+        self._threads = threading.local()
 
     def list_repositories(self):
         """
@@ -112,45 +126,165 @@ class GCSStorage(BaseStorage, DataProcessor):
         return "Success, {repository} created and defined".format(repository=repository)
 
 
-    def read(self, file_path, return_type=pd.DataFrame):
+    def read(self, file_path, return_type=None, **options):
         """
         Read file
         :param file_path: File path
+        :param options: Parsing options, see DataProcessor.process_data
         return: String File content
         """
         if not self.repository:
             raise Exception('Repository not set')
 
         try:
-            bucket = self.client.get_bucket(self.repository)
-            blob = bucket.blob(file_path)
+            file_extension = get_file_extension(file_path)
+            if self.random_access(file_extension):
+                # Arrow IPC blobs are read through range requests, only the footer and the needed columns are downloaded
+                data_bytes = self._range_reader(file_path)
+            else:
+                with tracing.span('fetch'):
+                    bucket = self.client.get_bucket(self.repository)
+                    blob = bucket.blob(file_path)
+                    data_bytes = blob.download_as_string()
 
-            file_extension = file_path.split('.')[-1].lower()
-            data = self.process_data(blob.download_as_string(), file_extension, return_type)
+            data = self.process_data(data_bytes, file_extension, return_type, file_path=file_path, **options)
             return data
 
         except Exception as e:
             raise Exception(f'Error while reading file: {e}')
 
 
-    def put(self, file_path, content):
+    def _range_reader(self, file_path):
+        # Seekable view of the blob, each read is a ranged download of the media link
+        blob = self.client.get_bucket(self.repository).get_blob(file_path)
+        if blob is None:
+            raise Exception(f'{file_path} not found')
+        http = self.client._connection.http
+
+        def fetch(start, end):
+            buffer = io.BytesIO()
+            download = Download.from_stream(buffer, auto_transfer=False, total_size=blob.size)
+            download.initialize_download(Request(blob.media_link, 'GET', {}), http)
+            download.get_range(start, end - 1, use_chunks=False)
+            return buffer.getvalue()
+        return RangeReader(blob.size, fetch)
+
+    def _iter_objects(self, prefix):
+        for blob in self.client.get_bucket(self.repository).list_blobs(prefix=prefix):
+            yield {
+                "object": blob.name,
+                "size": blob.size,
+                "modified_at": blob.updated,
+                "checksum": base64.b64decode(blob.md5_hash).hex() if blob.md5_hash else None
+            }
+
+    def _read_part(self, key, **options):
+        # The connection of self.client is not thread-safe, dataset files are downloaded with the client of the thread
+        with tracing.span('fetch'):
+            data_bytes = self._thread_bucket().blob(key).download_as_string()
+        return self.process_data(data_bytes, get_file_extension(key), pa.Table, file_path=key, **options)
+
+    def _thread_bucket(self):
+        client = getattr(self._threads, 'client', None)
+        if client is None:
+            client = self._threads.client = self._new_client()
+        return client.bucket(self.repository)
+
+    def _upload_bucket(self):
+        # Uploads streamed from a background thread get a client of their own, the caller keeps using self.client
+        return self._new_client().bucket(self.repository)
+
+    def _new_client(self):
+        return storage.Client(project=self.client.project, credentials=self.client._connection.credentials)
+
+    def _upload_file(self, path, key, checksum=None):
+        # Files over 5MB are sent as resumable uploads
+        self._thread_bucket().blob(key).upload_from_filename(path)
+
+    def _download_file(self, key, path):
+        with open(path, 'wb') as f:
+            self._thread_bucket().blob(key).download_to_file(f)
+
+    def put(self, file_path, content, **options):
         """
         Write file to GCS
-        :param file_path: File path
+        :param file_path: File path, a .gz, .bz2, .zst or .lz4 suffix compresses the content
         :param content: File content
+        :param options: Serialization options, see DataProcessor.write_to_stream
 
         """
         if not self.repository:
             raise Exception('Repository not set')
         try:
-            bucket = self.client.get_bucket(self.repository)
-            data = self.convert_to_bytes(content, file_path.split('.')[-1].lower())
-            bucket.blob(file_path).upload_from_string(data)
+            # Serialized into a resumable upload session, or a single upload when smaller than one part
+            with GCSResumableUpload(self._upload_bucket().blob(file_path)) as stream:
+                self.write_to_stream(content, get_file_extension(file_path), stream, **options)
             return "Success, file written"
 
         except Exception as e:
             raise Exception(f'Error while writing file: {e}')
     
+    def open_writer(self, file_path, part_size=DEFAULT_PART_SIZE):
+        """
+        Open a writer streaming DataFrame batches to GCS with a resumable upload
+        :param file_path: File path
+        :param part_size: Size of the uploaded chunks, a multiple of 256KB
+        return: DataFrameWriter
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        stream = GCSResumableUpload(self._upload_bucket().blob(file_path), part_size=part_size)
+        return DataFrameWriter(stream, get_file_extension(file_path))
+
+    def read_bytes(self, file_path):
+        """
+        Read the content of a file as it is stored, without parsing it
+        :param file_path: File path
+        return: bytes
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+
+        try:
+            with tracing.span('fetch'):
+                data = self.client.get_bucket(self.repository).blob(file_path).download_as_string()
+            metrics.record_bytes_in(len(data))
+            return data
+        except Exception as e:
+            raise Exception(f'Error while reading file: {e}')
+
+    def put_bytes(self, file_path, data):
+        """
+        Write content as it is, any extension, without serializing it
+        :param file_path: File path
+        :param data: bytes or a readable binary file object, sent in chunks with a resumable upload
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        try:
+            with self.open(file_path, 'wb') as stream:
+                write_all(data, stream)
+            return "Success, file written"
+        except Exception as e:
+            raise Exception(f'Error while writing file: {e}')
+
+    def open(self, file_path, mode='rb', part_size=DEFAULT_PART_SIZE):
+        """
+        Open a file as a binary file object
+        :param file_path: File path
+        :param mode: 'rb' reads through a buffer with ranged downloads, seek() moves without downloading.
+            'wb' streams a resumable upload, the blob appears on close() and an exception inside a with block discards it
+        :param part_size: Size of the uploaded chunks, a multiple of 256KB
+        return: io.BufferedReader or GCSResumableUpload
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        if mode == 'rb':
+            return io.BufferedReader(self._range_reader(file_path), buffer_size=DEFAULT_BLOCK_SIZE)
+        if mode == 'wb':
+            return GCSResumableUpload(self._upload_bucket().blob(file_path), part_size=part_size)
+        raise ValueError("mode must be 'rb' or 'wb'")
+
     def list(self, path=''):
         """
         List all files and foulders in repository
@@ -0,0 +1,45 @@
+import io
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Convert non-str keys like the standard library does, and accept numpy values
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+
+def loads(data):
+    """
+    Decode a JSON document from bytes or str, with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """
+    Encode obj as JSON bytes, with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=ORJSON_OPTIONS)
+    return json.dumps(obj).encode('utf-8')
+
+
+def dump(obj, stream):
+    """
+    Write obj as JSON into a binary stream
+    orjson encodes the whole document at once, it is several times faster than the standard library,
+    which is used otherwise and encodes piece by piece into the stream
+    """
+    if orjson is not None:
+        stream.write(orjson.dumps(obj, option=ORJSON_OPTIONS))
+        return
+    text = io.TextIOWrapper(stream, encoding='utf-8')
+    try:
+        json.dump(obj, text)
+        text.flush()
+    finally:
+        text.detach()
@@ -1,11 +1,21 @@
 import pandas as pd
+import pyarrow as pa
 import os
 import json
+import types
+import uuid
+from storage_tool import metrics, tracing
+from storage_tool.compression import get_file_extension
 from storage_tool.base import BaseStorage
 from storage_tool.data_processor import DataProcessor
+from storage_tool.files import copy_file, iter_files, move_file
+from storage_tool.streams import LocalFileUpload, write_all
+from storage_tool.dataset import DatasetReader
+from storage_tool.transfer import DirectoryTransfer, md5_file
+from storage_tool.writers import DataFrameWriter
 
 
-class LocalStorage(BaseStorage, DataProcessor):
+class LocalStorage(BaseStorage, DataProcessor, DirectoryTransfer, DatasetReader):
     def __init__(self) -> None:
         self.repository = None
     
@@ -36,16 +46,17 @@ class LocalStorage(BaseStorage, DataProcessor):
         self.repository = repository
         return "Success, {repository} defined".format(repository=repository)
         
-    def list_repositories(self):
+    def list_repositories(self, root=None):
         """
         List repositories 
+        :param root: Folder holding the repositories, the working directory by default
         """
         list_ = []
-        response = os.listdir()
-        for item in response:
-            if os.path.isdir(item):
-                #Verify item is different from file
-                list_.append({"repository": item, "created_at": None})
+        # The entry types come from the directory listing itself, no stat per entry
+        with os.scandir(root or '.') as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    list_.append({"repository": entry.name, "created_at": None})
 
         return list_
     
@@ -53,43 +64,147 @@ class LocalStorage(BaseStorage, DataProcessor):
         """
         List files in path
         """
-        response = os.listdir(os.path.join(self.repository, path))
         list_ = []
-        for item in response:
-            if os.path.isfile(os.path.join(self.repository, path, item)):
-                list_.append({"object": item, "type": "file"})
-            elif os.path.isdir(os.path.join(self.repository, path, item)):
-                list_.append({"object": f"{item}/", "type": "folder"})
+        with os.scandir(os.path.join(self.repository, path)) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    list_.append({"object": entry.name, "type": "file"})
+                elif entry.is_dir():
+                    list_.append({"object": f"{entry.name}/", "type": "folder"})
         
         return list_
-    
-    def read(self, file_path, return_type=None):
+
+    def iter_list(self, path='', recursive=True, workers=1):
         """
-        Read file
+        Iterate over the files under path with their size and modification time, without building the whole listing
+        :param path: Folder to list
+        :param recursive: Descend into the subfolders, symlinked folders are not followed
+        :param workers: Folders scanned concurrently, on network filesystems each scan waits on the server
+        return: Generator of {"object": path from the repository, "type": "file", "size": bytes, "modified_at": datetime}
         """
-        file_extension = file_path.split('.')[-1]
-        with open(os.path.join(self.repository, file_path), 'rb') as f:
-            data_bytes = f.read()
-        return self.process_data(data_bytes, file_extension, return_type)
+        return iter_files(self.repository, path, recursive, workers)
+
+    def _iter_objects(self, prefix):
+        if not os.path.isdir(os.path.join(self.repository, prefix)):
+            return
+        yield from iter_files(self.repository, prefix.rstrip('/'))
+
+    def _object_checksum(self, key):
+        return md5_file(os.path.join(self.repository, key))
+
+    def _upload_file(self, path, key, checksum=None):
+        os.makedirs(os.path.join(self.repository, os.path.dirname(key)), exist_ok=True)
+        copy_file(path, os.path.join(self.repository, key))
+
+    def _download_file(self, key, path):
+        copy_file(os.path.join(self.repository, key), path)
+
+    def read(self, file_path, return_type=None, **options):
+        """
+        Read file
+        :param options: Parsing options, see DataProcessor.process_data
+        """
+        file_extension = get_file_extension(file_path)
+        if self.streams_from(file_extension):
+            # Compressed and JSON Lines files are parsed while they are read, chunked reads keep the file
+            # open until their generator is exhausted
+            f = open(os.path.join(self.repository, file_path), 'rb')
+            try:
+                data = self.process_data(f, file_extension, return_type, file_path=file_path, **options)
+            except BaseException:
+                f.close()
+                raise
+            if not isinstance(data, types.GeneratorType):
+                f.close()
+            return data
+
+        # The file is memory-mapped instead of read into a bytes object, the parser reads the pages it needs
+        # and the page cache is shared by every process reading the same file. Arrow tables (Parquet columns,
+        # Arrow IPC files) can point into the mapping, it stays valid after close() as long as they reference it
+        with tracing.span('fetch'):
+            # Arrays memory-mapped with mmap_mode='r+' write through to the file
+            mode = 'r+' if options.get('mmap_mode') == 'r+' else 'r'
+            source = pa.memory_map(os.path.join(self.repository, file_path), mode)
+        try:
+            return self.process_data(source, file_extension, return_type, file_path=file_path, **options)
+        finally:
+            # Record batch readers read from the mapping as they are consumed
+            if return_type != pa.RecordBatchReader:
+                source.close()
     
-    def put(self, file_path, content):
+    def put(self, file_path, content, **options):
         """
         Put file
+        :param file_path: File path, a .gz, .bz2, .zst or .lz4 suffix compresses the content
+        :param options: Serialization options, see DataProcessor.write_to_stream
         """
         try:
-            file_extension = file_path.split('.')[-1]
-            data_bytes = self.convert_to_bytes(content, file_extension)
+            file_extension = get_file_extension(file_path)
 
             if not os.path.isdir(os.path.join(self.repository, os.path.dirname(file_path))):
                 os.makedirs(os.path.join(self.repository, os.path.dirname(file_path)))
 
-            with open(os.path.join(self.repository, file_path), 'wb') as f:
-                f.write(data_bytes)
+            # Serialize straight into a temporary file and swap it in, a failed write keeps the previous file
+            destination = os.path.join(self.repository, file_path)
+            temporary = f'{destination}.{uuid.uuid4().hex}.tmp'
+            try:
+                with open(temporary, 'wb') as f:
+                    self.write_to_stream(content, file_extension, f, **options)
+                os.replace(temporary, destination)
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                raise
             
             return "Success, {file_path} created".format(file_path=file_path)
         except Exception as e:
             raise Exception("Error, {file_path} not created".format(file_path=file_path)) from e
         
+    def open_writer(self, file_path):
+        """
+        Open a writer appending DataFrame batches to a file, see DataFrameWriter for the formats
+        :param file_path: File path, the file appears once the writer is closed
+        return: DataFrameWriter
+        """
+        file_extension = get_file_extension(file_path)
+        stream = LocalFileUpload(os.path.join(self.repository, file_path))
+        return DataFrameWriter(stream, file_extension)
+
+    def read_bytes(self, file_path):
+        """
+        Read the content of a file as it is stored, without parsing it
+        return: bytes
+        """
+        with open(os.path.join(self.repository, file_path), 'rb') as f:
+            with tracing.span('fetch'):
+                data = f.read()
+        metrics.record_bytes_in(len(data))
+        return data
+
+    def put_bytes(self, file_path, data):
+        """
+        Write content as it is, any extension, without serializing it
+        :param data: bytes or a readable binary file object, copied a chunk at a time
+        """
+        try:
+            with self.open(file_path, 'wb') as stream:
+                write_all(data, stream)
+            return "Success, {file_path} created".format(file_path=file_path)
+        except Exception as e:
+            raise Exception("Error, {file_path} not created".format(file_path=file_path)) from e
+
+    def open(self, file_path, mode='rb'):
+        """
+        Open a file as a binary file object
+        :param mode: 'rb' or 'wb', written files appear on close() and an exception inside a with block discards them
+        return: Binary file object or LocalFileUpload
+        """
+        if mode == 'rb':
+            return open(os.path.join(self.repository, file_path), 'rb')
+        if mode == 'wb':
+            return LocalFileUpload(os.path.join(self.repository, file_path))
+        raise ValueError("mode must be 'rb' or 'wb'")
+
     def delete(self, file_path):
         """
         Delete file
@@ -108,7 +223,7 @@ class LocalStorage(BaseStorage, DataProcessor):
             if not os.path.isdir(os.path.join(self.repository, os.path.dirname(dest_path))):
                 os.makedirs(os.path.join(self.repository, os.path.dirname(dest_path)))
 
-            os.rename(os.path.join(self.repository, src_path), os.path.join(self.repository, dest_path))
+            move_file(os.path.join(self.repository, src_path), os.path.join(self.repository, dest_path))
             return "Success, {src_path} moved to {dest_path}".format(src_path=src_path, dest_path=dest_path)
         except Exception as e:
             raise Exception("Error, {src_path} not moved to {dest_path}".format(src_path=src_path, dest_path=dest_path)) from e
@@ -120,9 +235,8 @@ class LocalStorage(BaseStorage, DataProcessor):
         try:
             os.makedirs(os.path.join(dest_repository, os.path.dirname(dest_path)), exist_ok=True)
 
-            self.copy_between_repositories(src_repository, src_path, dest_repository, dest_path)
-            
-            self.delete(src_path)
+            # Renamed when both repositories are on the same filesystem, copied then removed otherwise
+            move_file(os.path.join(src_repository, src_path), os.path.join(dest_repository, dest_path))
             return "Success, {src_path} moved to {dest_path}".format(src_path=src_path, dest_path=dest_path)
         except Exception as e:
             raise Exception("Error, {src_path} not moved to {dest_path}".format(src_path=src_path, dest_path=dest_path)) from e
@@ -133,10 +247,8 @@ class LocalStorage(BaseStorage, DataProcessor):
         """
         try:
             os.makedirs(os.path.join(self.repository, os.path.dirname(dest_path)), exist_ok=True)
-            with open(os.path.join(self.repository, src_path), 'rb') as f:
-                data_bytes = f.read()
-            with open(os.path.join(self.repository, dest_path), 'wb') as f:
-                f.write(data_bytes)
+            # Cloned or copied by the kernel, the content is never read into memory
+            copy_file(os.path.join(self.repository, src_path), os.path.join(self.repository, dest_path))
             return "Success, {src_path} copied to {dest_path}".format(src_path=src_path, dest_path=dest_path)
         except Exception as e:
             raise Exception("Error, {src_path} not copied to {dest_path}".format(src_path=src_path, dest_path=dest_path)) from e
@@ -147,10 +259,7 @@ class LocalStorage(BaseStorage, DataProcessor):
         """
         try:
             os.makedirs(os.path.join(dest_repository, os.path.dirname(dest_path)), exist_ok=True)
-            with open(os.path.join(src_repository, src_path), 'rb') as f:
-                data_bytes = f.read()
-            with open(os.path.join(dest_repository, dest_path), 'wb') as f:
-                f.write(data_bytes)
+            copy_file(os.path.join(src_repository, src_path), os.path.join(dest_repository, dest_path))
             return "Success, {src_path} copied to {dest_path}".format(src_path=src_path, dest_path=dest_path)
         except Exception as e:
             raise Exception("Error, {src_path} not copied to {dest_path}".format(src_path=src_path, dest_path=dest_path)) from e
@@ -0,0 +1,389 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Operations of BaseStorage wrapped by the instrumentation
+INSTRUMENTED_OPERATIONS = (
+    'create_repository',
+    'set_repository',
+    'set_or_create_repository',
+    'list_repositories',
+    'list',
+    'read',
+    'put',
+    'open_writer',
+    'read_bytes',
+    'put_bytes',
+    'open',
+    'put_directory',
+    'get_directory',
+    'read_dataset',
+    'delete',
+    'move',
+    'move_between_repositories',
+    'copy',
+    'copy_between_repositories',
+    'sync',
+    'sync_between_repositories',
+    'exists',
+    'get_metadata',
+    'get_file_url',
+)
+
+# Latency histogram upper bounds, in seconds
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_sink = None
+_current_call = ContextVar('storage_tool_metrics_call', default=None)
+_byte_trackers = ContextVar('storage_tool_byte_trackers', default=())
+
+
+class OperationEvent:
+    def __init__(self, backend, repository, operation, duration, bytes_in=0, bytes_out=0, retries=0, error=None):
+        """
+        Result of a single instrumented call
+        :param backend: Storage class name (LocalStorage, S3Storage, ...)
+        :param repository: Repository the call was made against
+        :param operation: Operation name (read, put, ...)
+        :param duration: Wall time of the call in seconds
+        :param bytes_in: Bytes received from the storage
+        :param bytes_out: Bytes sent to the storage
+        :param retries: Number of retries performed during the call
+        :param error: Exception class name when the call failed
+        """
+        self.backend = backend
+        self.repository = repository
+        self.operation = operation
+        self.duration = duration
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.retries = retries
+        self.error = error
+
+
+class _Call:
+    __slots__ = ('bytes_in', 'bytes_out', 'retries')
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.retries = 0
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Fixed bucket histogram
+        :param buckets: Sorted bucket upper bounds
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation inside the matching bucket
+        :param q: Quantile between 0 and 1
+        """
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            if not bucket_count or seen + bucket_count < rank:
+                seen += bucket_count
+                continue
+            lower = self.buckets[idx - 1] if idx > 0 else 0.0
+            upper = self.buckets[idx] if idx < len(self.buckets) else self.max
+            return lower + (upper - lower) * ((rank - seen) / bucket_count)
+        return self.max
+
+
+class OperationStats:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Aggregated counters of one backend/repository/operation
+        """
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = Histogram(buckets)
+
+    def add(self, event):
+        self.calls += 1
+        self.retries += event.retries
+        self.bytes_in += event.bytes_in
+        self.bytes_out += event.bytes_out
+        if event.error:
+            self.errors += 1
+        self.latency.observe(event.duration)
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "retries": self.retries,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "latency_sum": self.latency.sum,
+            "latency_max": self.latency.max,
+            "p50": self.latency.quantile(0.50),
+            "p95": self.latency.quantile(0.95),
+            "p99": self.latency.quantile(0.99),
+        }
+
+
+class MetricsSink:
+    def record(self, event):
+        """
+        Receive one OperationEvent
+        """
+        raise NotImplementedError
+
+
+class InMemorySink(MetricsSink):
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Aggregate events in memory, keyed by (backend, repository, operation)
+        :param buckets: Latency histogram upper bounds in seconds
+        """
+        self.buckets = buckets
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        key = (event.backend, event.repository, event.operation)
+        with self._lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = OperationStats(self.buckets)
+            stats.add(event)
+
+    def snapshot(self):
+        """
+        Return a list with the aggregated stats of every backend/repository/operation
+        """
+        with self._lock:
+            return [
+                {"backend": backend, "repository": repository, "operation": operation, **stats.to_dict()}
+                for (backend, repository, operation), stats in self.stats.items()
+            ]
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+
+
+class PrometheusSink(InMemorySink):
+    def __init__(self, buckets=DEFAULT_BUCKETS, namespace='storage_tool'):
+        """
+        In memory aggregation exposed in the Prometheus text format
+        :param buckets: Latency histogram upper bounds in seconds
+        :param namespace: Prefix of every metric name
+        """
+        super().__init__(buckets)
+        self.namespace = namespace
+
+    def expose(self):
+        """
+        Render the aggregated stats in the Prometheus text exposition format
+        """
+        ns = self.namespace
+        counters = (
+            ('operation_calls_total', 'Number of storage operations', 'calls'),
+            ('operation_errors_total', 'Number of failed storage operations', 'errors'),
+            ('operation_retries_total', 'Number of retries inside storage operations', 'retries'),
+            ('operation_bytes_in_total', 'Bytes received from the storage', 'bytes_in'),
+            ('operation_bytes_out_total', 'Bytes sent to the storage', 'bytes_out'),
+        )
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda item: tuple(str(k) for k in item[0]))
+            lines = []
+            for name, help_text, attr in counters:
+                lines.append(f'# HELP {ns}_{name} {help_text}')
+                lines.append(f'# TYPE {ns}_{name} counter')
+                for key, stats in items:
+                    lines.append(f'{ns}_{name}{{{_labels(key)}}} {getattr(stats, attr)}')
+
+            name = f'{ns}_operation_latency_seconds'
+            lines.append(f'# HELP {name} Latency of storage operations')
+            lines.append(f'# TYPE {name} histogram')
+            for key, stats in items:
+                labels = _labels(key)
+                cumulative = 0
+                for bound, bucket_count in zip(stats.latency.buckets, stats.latency.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {stats.latency.count}')
+                lines.append(f'{name}_sum{{{labels}}} {stats.latency.sum}')
+                lines.append(f'{name}_count{{{labels}}} {stats.latency.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class StatsdSink(MetricsSink):
+    def __init__(self, callback, prefix='storage_tool'):
+        """
+        Forward every event to a statsd style callback
+        :param callback: Callable receiving (name, value, metric_type, tags), metric_type is 'c' or 'ms'
+        :param prefix: Prefix of every metric name
+        """
+        self.callback = callback
+        self.prefix = prefix
+
+    def record(self, event):
+        tags = {"backend": event.backend, "repository": event.repository, "operation": event.operation}
+        self.callback(f'{self.prefix}.operation.calls', 1, 'c', tags)
+        self.callback(f'{self.prefix}.operation.latency', event.duration * 1000, 'ms', tags)
+        if event.bytes_in:
+            self.callback(f'{self.prefix}.operation.bytes_in', event.bytes_in, 'c', tags)
+        if event.bytes_out:
+            self.callback(f'{self.prefix}.operation.bytes_out', event.bytes_out, 'c', tags)
+        if event.retries:
+            self.callback(f'{self.prefix}.operation.retries', event.retries, 'c', tags)
+        if event.error:
+            self.callback(f'{self.prefix}.operation.errors', 1, 'c', {**tags, "error": event.error})
+
+
+def _labels(key):
+    backend, repository, operation = key
+    repository = '' if repository is None else str(repository).replace('\\', '\\\\').replace('"', '\\"')
+    return f'backend="{backend}",repository="{repository}",operation="{operation}"'
+
+
+def enable(sink=None):
+    """
+    Enable the instrumentation of every storage backend
+    :param sink: MetricsSink receiving the events, defaults to a new InMemorySink
+    return: The active sink
+    """
+    global _sink
+    _sink = sink if sink is not None else InMemorySink()
+    return _sink
+
+
+def disable():
+    """
+    Disable the instrumentation, instrumented methods fall back to a plain call
+    """
+    global _sink
+    _sink = None
+
+
+def get_sink():
+    return _sink
+
+
+def is_enabled():
+    return _sink is not None
+
+
+def record_bytes_in(size):
+    """
+    Add bytes received from the storage to the running operation
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.bytes_in += size
+    for tracker in _byte_trackers.get():
+        tracker.bytes_in += size
+
+
+def record_bytes_out(size):
+    """
+    Add bytes sent to the storage to the running operation
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.bytes_out += size
+    for tracker in _byte_trackers.get():
+        tracker.bytes_out += size
+
+
+@contextmanager
+def track_bytes():
+    """
+    Count the payload bytes of the storage calls made inside the block, whether metrics are enabled or not
+    """
+    tracker = _Call()
+    token = _byte_trackers.set(_byte_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _byte_trackers.reset(token)
+
+
+def record_retry(count=1):
+    """
+    Add retries to the running operation, reported by the botocore after-call event (S3) and the
+    RetryCounter retry policy (Azure). gcloud retries inside its transfers without a hook, GCS reports none
+    """
+    call = _current_call.get()
+    if call is not None:
+        call.retries += count
+
+
+def _repository_of(storage, operation, args, kwargs):
+    if operation.endswith('_between_repositories'):
+        return kwargs.get('src_repository', args[0] if args else None)
+    if operation in ('create_repository', 'set_repository', 'set_or_create_repository'):
+        return kwargs.get('repository', args[0] if args else None)
+    return getattr(storage, 'repository', None)
+
+
+def instrument(operation, func):
+    """
+    Wrap a storage method so every call is reported to the active sink
+    :param operation: Operation name reported in the events
+    :param func: Storage method
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        sink = _sink
+        if sink is None:
+            return func(self, *args, **kwargs)
+
+        call = _Call()
+        token = _current_call.set(call)
+        error = None
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _current_call.reset(token)
+            sink.record(OperationEvent(
+                backend=type(self).__name__,
+                repository=_repository_of(self, operation, args, kwargs),
+                operation=operation,
+                duration=duration,
+                bytes_in=call.bytes_in,
+                bytes_out=call.bytes_out,
+                retries=call.retries,
+                error=error,
+            ))
+
+    wrapper.__instrumented__ = True
+    return wrapper
@@ -1,8 +1,26 @@
+import io
 import pandas as pd
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import NoCredentialsError, ClientError
+from storage_tool import metrics, tracing
+from storage_tool.compression import get_file_extension
 from storage_tool.base import BaseStorage
 from storage_tool.data_processor import DataProcessor
+from storage_tool.streams import DEFAULT_BLOCK_SIZE, DEFAULT_PART_SIZE, RangeReader, S3MultipartUpload, write_all
+from storage_tool.dataset import DatasetReader
+from storage_tool.transfer import DirectoryTransfer, multipart_etag
+from storage_tool.writers import DataFrameWriter
+
+# Part size of the raw file transfers, multipart_etag gives the ETag of the files uploaded with it
+TRANSFER_CONFIG = TransferConfig(multipart_threshold=DEFAULT_PART_SIZE, multipart_chunksize=DEFAULT_PART_SIZE)
+
+
+def _record_retries(parsed=None, **kwargs):
+    # botocore retries inside the API call, the attempts are reported in the response metadata
+    attempts = (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts', 0)
+    if attempts:
+        metrics.record_retry(attempts)
 
 
 class S3Authorization:
@@ -55,15 +73,17 @@ class S3Authorization:
         """
         Create S3 client
         """
-        return boto3.client(
+        client = boto3.client(
             's3',
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key,
             region_name=self.region_name
         )
+        client.meta.events.register('after-call.s3', _record_retries)
+        return client
     
 
-class S3Storage(BaseStorage, DataProcessor):
+class S3Storage(BaseStorage, DataProcessor, DirectoryTransfer, DatasetReader):
     # Define permitted return types
     return_types = [dict, pd.DataFrame, list]
 
@@ -164,23 +184,32 @@ class S3Storage(BaseStorage, DataProcessor):
     
         return list_files
 
-    def read(self, file_path, return_type=pd.DataFrame):
+    def read(self, file_path, return_type=None, **options):
         """
         Read file from S3
         :param file_path: File path
-        :param return_type: Return type (dict, pd.DataFrame, list)
+        :param return_type: Return type (dict, pd.DataFrame, pa.Table or pa.RecordBatchReader), the default of the
+            format when None, see DataProcessor.process_data
+        :param options: Parsing options, see DataProcessor.process_data
         return: File content
         """
         if not self.repository:
             raise Exception('Repository not set')
 
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.repository,
-                Key=file_path
-            )
-            file_extension = file_path.split('.')[-1].lower()
-            data = self.process_data(response['Body'].read(), file_extension, return_type)
+            file_extension = get_file_extension(file_path)
+            if self.random_access(file_extension):
+                # Arrow IPC objects are read through range requests, only the footer and the needed columns are downloaded
+                data = self._range_reader(file_path)
+            else:
+                with tracing.span('fetch'):
+                    response = self.s3_client.get_object(
+                        Bucket=self.repository,
+                        Key=file_path
+                    )
+                    # Compressed and JSON Lines objects are parsed while they are downloaded
+                    data = response['Body'] if self.streams_from(file_extension) else response['Body'].read()
+            data = self.process_data(data, file_extension, return_type, file_path=file_path, **options)
             return data
 
         except ClientError as e:
@@ -188,22 +217,55 @@ class S3Storage(BaseStorage, DataProcessor):
         except Exception as e:
             raise Exception(f'Error while reading file: {e}')
     
-    def put(self, file_path, content):
+    def _range_reader(self, file_path):
+        # Seekable view of the object, each read is a ranged GET
+        size = self.s3_client.head_object(Bucket=self.repository, Key=file_path)['ContentLength']
+
+        def fetch(start, end):
+            response = self.s3_client.get_object(
+                Bucket=self.repository,
+                Key=file_path,
+                Range=f'bytes={start}-{end - 1}'
+            )
+            return response['Body'].read()
+        return RangeReader(size, fetch)
+
+    def _iter_objects(self, prefix):
+        # Paginated, list_objects_v2 returns at most 1000 keys per call
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.repository, Prefix=prefix):
+            for item in page.get('Contents', []):
+                yield {
+                    "object": item['Key'],
+                    "size": item['Size'],
+                    "modified_at": item['LastModified'],
+                    "checksum": item['ETag'].strip('"')
+                }
+
+    def _file_checksum(self, path):
+        return multipart_etag(path, DEFAULT_PART_SIZE)
+
+    def _upload_file(self, path, key, checksum=None):
+        # Files of DEFAULT_PART_SIZE or more are sent as multipart uploads
+        self.s3_client.upload_file(path, self.repository, key, Config=TRANSFER_CONFIG)
+
+    def _download_file(self, key, path):
+        self.s3_client.download_file(self.repository, key, path, Config=TRANSFER_CONFIG)
+
+    def put(self, file_path, content, **options):
         """
         Write file to S3
-        :param file_path: File path
+        :param file_path: File path, a .gz, .bz2, .zst or .lz4 suffix compresses the content
         :param content: File content
+        :param options: Serialization options, see DataProcessor.write_to_stream
 
         """
         if not self.repository:
             raise Exception('Repository not set')
         try:
-            data = self.convert_to_bytes(content, file_path.split('.')[-1].lower())
-            response = self.s3_client.put_object(
-                Bucket=self.repository,
-                Key=file_path,
-                Body=data
-            )
+            # Serialized into a multipart upload, objects smaller than one part are sent with a single put_object
+            with S3MultipartUpload(self.s3_client, self.repository, file_path) as stream:
+                self.write_to_stream(content, get_file_extension(file_path), stream, **options)
             return "Success, file written"
 
         except ClientError as e:
@@ -211,6 +273,71 @@ class S3Storage(BaseStorage, DataProcessor):
         except Exception as e:
             raise Exception(f'Error while writing file: {e}')
     
+    def open_writer(self, file_path, part_size=DEFAULT_PART_SIZE):
+        """
+        Open a writer streaming DataFrame batches to S3 with a multipart upload
+        :param file_path: File path
+        :param part_size: Size of the uploaded parts, at least 5MB
+        return: DataFrameWriter
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        stream = S3MultipartUpload(self.s3_client, self.repository, file_path, part_size=part_size)
+        return DataFrameWriter(stream, get_file_extension(file_path))
+
+    def read_bytes(self, file_path):
+        """
+        Read the content of a file as it is stored, without parsing it
+        :param file_path: File path
+        return: bytes
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+
+        try:
+            with tracing.span('fetch'):
+                response = self.s3_client.get_object(
+                    Bucket=self.repository,
+                    Key=file_path
+                )
+                data = response['Body'].read()
+            metrics.record_bytes_in(len(data))
+            return data
+        except Exception as e:
+            raise Exception(f'Error while reading file: {e}')
+
+    def put_bytes(self, file_path, data):
+        """
+        Write content as it is, any extension, without serializing it
+        :param file_path: File path
+        :param data: bytes or a readable binary file object, sent in parts with a multipart upload when large
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        try:
+            with self.open(file_path, 'wb') as stream:
+                write_all(data, stream)
+            return "Success, file written"
+        except Exception as e:
+            raise Exception(f'Error while writing file: {e}')
+
+    def open(self, file_path, mode='rb', part_size=DEFAULT_PART_SIZE):
+        """
+        Open a file as a binary file object
+        :param file_path: File path
+        :param mode: 'rb' reads through a buffer with ranged GETs, seek() moves without downloading.
+            'wb' streams a multipart upload, the object appears on close() and an exception inside a with block discards it
+        :param part_size: Size of the uploaded parts, at least 5MB
+        return: io.BufferedReader or S3MultipartUpload
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        if mode == 'rb':
+            return io.BufferedReader(self._range_reader(file_path), buffer_size=DEFAULT_BLOCK_SIZE)
+        if mode == 'wb':
+            return S3MultipartUpload(self.s3_client, self.repository, file_path, part_size=part_size)
+        raise ValueError("mode must be 'rb' or 'wb'")
+
     def delete(self,  file_path):
         """
         Delete file from S3
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+def infer_schema(data):
+    """
+    Schema of a parsed DataFrame as {column: dtype}
+    Integers and booleans are recorded as nullable dtypes, so a later file with missing values still parses
+    """
+    schema = {}
+    for column, dtype in data.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            schema[str(column)] = 'boolean'
+        elif pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+            # int64 -> Int64, uint8 -> UInt8
+            schema[str(column)] = str(dtype).replace('uint', 'UInt') if dtype.kind == 'u' else str(dtype).replace('int', 'Int')
+        else:
+            schema[str(column)] = str(dtype)
+    return schema
+
+
+def arrow_types(schema):
+    """
+    pyarrow types of the columns of a schema that the pyarrow csv parser converts to directly,
+    the other columns (object, category, ...) are left to its inference
+    :param schema: {column: dtype}, e.g. a schema given by infer_schema
+    return: {column: pa.DataType}
+    """
+    types = {}
+    for column, dtype in schema.items():
+        try:
+            dtype = pd.api.types.pandas_dtype(dtype)
+            if isinstance(dtype, pd.StringDtype):
+                types[column] = pa.string()
+            elif isinstance(dtype, np.dtype) and dtype != object:
+                types[column] = pa.from_numpy_dtype(dtype)
+            elif getattr(dtype, 'numpy_dtype', None) is not None:
+                # Nullable dtypes, Int64 -> int64, boolean -> bool
+                types[column] = pa.from_numpy_dtype(dtype.numpy_dtype)
+        except (TypeError, pa.ArrowNotImplementedError):
+            continue
+    return types
+
+
+class SchemaCache:
+    def __init__(self, prefix_depth=None):
+        """
+        Schemas inferred on the first read of a path, given as dtypes to the parser on the next reads.
+        A file the schema does not fit is inferred again and its schema replaces the cached one
+        :param prefix_depth: Share one schema between the files of the same folder, cut at this depth,
+            e.g. 1 for sales/2024-01-01.csv and sales/2024-01-02.csv. None keeps one schema per file
+        """
+        self.prefix_depth = prefix_depth
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def key(self, file_path):
+        """
+        Key of the schema used for file_path
+        """
+        if self.prefix_depth is None:
+            return file_path
+        folders = file_path.split('/')[:-1][:self.prefix_depth]
+        return ''.join(f'{folder}/' for folder in folders)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        schema = self._load(key)
+        if schema is not None:
+            with self._lock:
+                self._memory[key] = schema
+        return schema
+
+    def set(self, key, schema):
+        with self._lock:
+            self._memory[key] = schema
+        self._save(key, schema)
+
+    def invalidate(self, key):
+        """
+        Forget a schema, the next read infers it again
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+        self._delete(key)
+
+    def _load(self, key):
+        return None
+
+    def _save(self, key, schema):
+        pass
+
+    def _delete(self, key):
+        pass
+
+
+class LocalSchemaCache(SchemaCache):
+    def __init__(self, directory, prefix_depth=None):
+        """
+        Keep the schemas as JSON files in a local directory
+        :param directory: Cache directory, created if needed
+        """
+        super().__init__(prefix_depth)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _load(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)["columns"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save(self, key, schema):
+        path = self._path(key)
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({"key": key, "columns": schema}, f)
+        os.replace(temporary, path)
+
+    def _delete(self, key):
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+
+class SidecarSchemaCache(SchemaCache):
+    def __init__(self, storage, prefix_depth=None):
+        """
+        Keep the schemas as JSON objects next to the data, shared by every reader of the repository
+        Per file schemas are stored as <file>.schema.json and per folder schemas as <folder>/_schema.json
+        :param storage: Storage holding the data, e.g. S3Storage
+        """
+        super().__init__(prefix_depth)
+        self.storage = storage
+
+    def sidecar_path(self, key):
+        if key == '' or key.endswith('/'):
+            return f'{key}_schema.json'
+        return f'{key}.schema.json'
+
+    def _load(self, key):
+        try:
+            return self.storage.read(file_path=self.sidecar_path(key), return_type=dict)["columns"]
+        except Exception:
+            return None
+
+    def _save(self, key, schema):
+        self.storage.put(file_path=self.sidecar_path(key), content={"key": key, "columns": schema})
+
+    def _delete(self, key):
+        try:
+            self.storage.delete(file_path=self.sidecar_path(key))
+        except Exception:
+            pass
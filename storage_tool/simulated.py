@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+
+from storage_tool import metrics
+from storage_tool.base import BaseStorage
+
+
+class SimulatedStorageError(Exception):
+    pass
+
+
+class ThrottlingError(SimulatedStorageError):
+    """
+    Injected throttling response (S3 SlowDown, Azure ServerBusy, GCS 429)
+    """
+
+
+class TransientError(SimulatedStorageError):
+    """
+    Injected transient failure (connection reset, 500, timeout)
+    """
+
+
+# Operations moving an object payload, the bandwidth limit applies to them
+TRANSFER_OPERATIONS = ('read', 'put', 'read_bytes', 'put_bytes', 'put_directory', 'get_directory', 'read_dataset')
+
+
+def latency_sampler(spec):
+    """
+    Build a function drawing a latency in seconds from a random.Random
+    :param spec: None, seconds as a number, a callable(rng) or a tuple:
+        ('fixed', seconds), ('uniform', low, high), ('normal', mean, std),
+        ('lognormal', mu, sigma), ('exponential', mean) or ('pareto', scale, alpha)
+    """
+    if spec is None:
+        return lambda rng: 0.0
+    if callable(spec):
+        return spec
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+
+    kind, *params = spec
+    if kind == 'fixed':
+        return lambda rng: float(params[0])
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(params[0], params[1])
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1 / params[0])
+    if kind == 'pareto':
+        return lambda rng: params[0] * rng.paretovariate(params[1])
+    raise ValueError('latency must be fixed, uniform, normal, lognormal, exponential or pareto')
+
+
+class SimulatedStorage(BaseStorage):
+    def __init__(self, storage, latency=None, bandwidth=None, throttle_rate=0.0, failure_rate=0.0,
+                 max_ops_per_second=None, seed=None, sleep=time.sleep, clock=time.monotonic):
+        """
+        Wrap a storage and emulate network conditions on every operation
+        :param storage: Wrapped BaseStorage, usually a LocalStorage
+        :param latency: Latency spec for all operations, or a dict of operation to spec with an optional 'default' key
+        :param bandwidth: Bytes per second of read/put payloads, None for unlimited
+        :param throttle_rate: Probability of raising ThrottlingError on a call
+        :param failure_rate: Probability of raising TransientError on a call
+        :param max_ops_per_second: Calls above this rate raise ThrottlingError (token bucket)
+        :param seed: Seed of the random generator, the same seed and call order give the same faults and latencies
+        :param sleep: Function used to wait, replace it to simulate without sleeping
+        :param clock: Monotonic clock used by the rate limit
+        """
+        if not isinstance(storage, BaseStorage):
+            raise Exception('storage must be an instance of BaseStorage')
+
+        self.storage = storage
+        self.bandwidth = bandwidth
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.max_ops_per_second = max_ops_per_second
+        self.sleep = sleep
+        self.clock = clock
+        self.rng = random.Random(seed)
+        self.stats = {"calls": 0, "throttled": 0, "failed": 0, "simulated_seconds": 0.0}
+
+        latency = latency if isinstance(latency, dict) else {"default": latency}
+        self._default_latency = latency_sampler(latency.get('default'))
+        self._latency = {
+            operation: latency_sampler(spec)
+            for operation, spec in latency.items()
+            if operation != 'default'
+        }
+
+        self._lock = threading.Lock()
+        self._tokens = max_ops_per_second
+        self._last_refill = clock()
+
+    def __getattr__(self, name):
+        # Delegate repository, DataProcessor helpers and backend specific methods
+        if name == 'storage':
+            raise AttributeError(name)
+        return getattr(self.storage, name)
+
+    def _draw(self, operation):
+        with self._lock:
+            self.stats["calls"] += 1
+            delay = self._latency.get(operation, self._default_latency)(self.rng)
+            fault = self.rng.random()
+            throttled = self._rate_limited()
+
+        if throttled or fault < self.throttle_rate:
+            return delay, ThrottlingError
+        if fault < self.throttle_rate + self.failure_rate:
+            return delay, TransientError
+        return delay, None
+
+    def _rate_limited(self):
+        if not self.max_ops_per_second:
+            return False
+        now = self.clock()
+        self._tokens = min(self.max_ops_per_second, self._tokens + (now - self._last_refill) * self.max_ops_per_second)
+        self._last_refill = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def _wait(self, seconds):
+        if seconds > 0:
+            with self._lock:
+                self.stats["simulated_seconds"] += seconds
+            self.sleep(seconds)
+
+    def _call(self, operation, *args, **kwargs):
+        delay, fault = self._draw(operation)
+        self._wait(delay)
+
+        if fault is ThrottlingError:
+            with self._lock:
+                self.stats["throttled"] += 1
+            raise ThrottlingError(f'Simulated throttling on {operation}')
+        if fault is TransientError:
+            with self._lock:
+                self.stats["failed"] += 1
+            raise TransientError(f'Simulated transient failure on {operation}')
+
+        method = getattr(self.storage, operation)
+        if self.bandwidth is None or operation not in TRANSFER_OPERATIONS:
+            return method(*args, **kwargs)
+
+        with metrics.track_bytes() as transferred:
+            result = method(*args, **kwargs)
+        self._wait((transferred.bytes_in + transferred.bytes_out) / self.bandwidth)
+        return result
+
+    def create_repository(self, *args, **kwargs):
+        return self._call('create_repository', *args, **kwargs)
+
+    def set_repository(self, *args, **kwargs):
+        return self._call('set_repository', *args, **kwargs)
+
+    def set_or_create_repository(self, *args, **kwargs):
+        return self._call('set_or_create_repository', *args, **kwargs)
+
+    def list_repositories(self, *args, **kwargs):
+        return self._call('list_repositories', *args, **kwargs)
+
+    def list(self, *args, **kwargs):
+        return self._call('list', *args, **kwargs)
+
+    def read(self, *args, **kwargs):
+        return self._call('read', *args, **kwargs)
+
+    def put(self, *args, **kwargs):
+        return self._call('put', *args, **kwargs)
+
+    def open_writer(self, *args, **kwargs):
+        return self._call('open_writer', *args, **kwargs)
+
+    def read_bytes(self, *args, **kwargs):
+        return self._call('read_bytes', *args, **kwargs)
+
+    def put_bytes(self, *args, **kwargs):
+        return self._call('put_bytes', *args, **kwargs)
+
+    def open(self, *args, **kwargs):
+        return self._call('open', *args, **kwargs)
+
+    def put_directory(self, *args, **kwargs):
+        return self._call('put_directory', *args, **kwargs)
+
+    def get_directory(self, *args, **kwargs):
+        return self._call('get_directory', *args, **kwargs)
+
+    def read_dataset(self, *args, **kwargs):
+        return self._call('read_dataset', *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call('delete', *args, **kwargs)
+
+    def move(self, *args, **kwargs):
+        return self._call('move', *args, **kwargs)
+
+    def move_between_repositories(self, *args, **kwargs):
+        return self._call('move_between_repositories', *args, **kwargs)
+
+    def copy(self, *args, **kwargs):
+        return self._call('copy', *args, **kwargs)
+
+    def copy_between_repositories(self, *args, **kwargs):
+        return self._call('copy_between_repositories', *args, **kwargs)
+
+    def sync(self, *args, **kwargs):
+        return self._call('sync', *args, **kwargs)
+
+    def sync_between_repositories(self, *args, **kwargs):
+        return self._call('sync_between_repositories', *args, **kwargs)
+
+    def exists(self, *args, **kwargs):
+        return self._call('exists', *args, **kwargs)
+
+    def get_metadata(self, *args, **kwargs):
+        return self._call('get_metadata', *args, **kwargs)
+
+    def get_file_url(self, *args, **kwargs):
+        return self._call('get_file_url', *args, **kwargs)
@@ -0,0 +1,464 @@
+import base64
+import collections
+import io
+import os
+import queue
+import threading
+import uuid
+
+from storage_tool import metrics, tracing
+
+# Default size of the parts sent to the object stores (S3 needs at least 5MB, GCS multiples of 256KB)
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+# Smallest ranged download of a RangeReader
+DEFAULT_BLOCK_SIZE = 256 * 1024
+# Blocks kept by a RangeReader, readers of columnar formats interleave the streams of several columns
+DEFAULT_CACHE_BLOCKS = 16
+
+
+def write_all(data, stream, chunk_size=DEFAULT_PART_SIZE):
+    """
+    Write bytes, or the content of a readable binary file object, into a stream a chunk at a time,
+    an upload stream never buffers more than one part
+    return: Number of bytes written
+    """
+    size = 0
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        for start in range(0, len(view), chunk_size):
+            size += stream.write(view[start:start + chunk_size])
+        return size
+    for chunk in iter(lambda: data.read(chunk_size), b''):
+        size += stream.write(chunk)
+    return size
+
+
+class CountingReader(io.RawIOBase):
+    def __init__(self, stream):
+        """
+        Readable binary stream recording the bytes read from a storage response
+        :param stream: Readable binary file-like object, e.g. the body of a download
+        """
+        self.stream = stream
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.stream.read() if size is None or size < 0 else self.stream.read(size)
+        self.size += len(data)
+        metrics.record_bytes_in(len(data))
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class RangeReader(io.RawIOBase):
+    def __init__(self, size, fetch, block_size=DEFAULT_BLOCK_SIZE, cache_blocks=DEFAULT_CACHE_BLOCKS):
+        """
+        Seekable readable binary stream over a remote object, the reads are ranged downloads
+        :param size: Object size in bytes
+        :param fetch: Callable(start, end) returning the bytes of the object from start to end (exclusive)
+        :param block_size: Smaller reads download the aligned blocks around them and are answered from them,
+            e.g. footers, metadata and the interleaved column streams of ORC stripes
+        :param cache_blocks: Blocks kept, the least recently used one is dropped
+        """
+        self.size = size
+        self.fetch = fetch
+        self.block_size = block_size
+        self.cache_blocks = cache_blocks
+        self._position = 0
+        self._blocks = collections.OrderedDict()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('invalid whence')
+        if position < 0:
+            raise ValueError('negative seek position')
+        self._position = position
+        return position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._position
+        start = self._position
+        end = min(start + size, self.size)
+        if end <= start:
+            return b''
+        self._position = end
+        if end - start >= self.block_size:
+            return self._fetch(start, end)
+        # A small read spans one block, or two when it crosses a boundary
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        data = b''.join(self._block(index) for index in range(first, last + 1))
+        offset = first * self.block_size
+        return data[start - offset:end - offset]
+
+    def _block(self, index):
+        block = self._blocks.get(index)
+        if block is None:
+            start = index * self.block_size
+            block = self._fetch(start, min(start + self.block_size, self.size))
+            self._blocks[index] = block
+            if len(self._blocks) > self.cache_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(index)
+        return block
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def _fetch(self, start, end):
+        with tracing.span('fetch', size=end - start):
+            data = self.fetch(start, end)
+        metrics.record_bytes_in(len(data))
+        return data
+
+
+class UploadStream(io.RawIOBase):
+    def __init__(self, part_size=DEFAULT_PART_SIZE):
+        """
+        Writable binary stream sending its content to a storage in parts
+        :param part_size: Bytes buffered before a part is sent
+        """
+        self.part_size = part_size
+        self._buffer = bytearray()
+        self._position = 0
+        self._aborted = False
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('write to closed stream')
+        size = len(data)
+        self._buffer += data
+        self._position += size
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._send(part)
+        return size
+
+    def _send(self, part):
+        with tracing.span('upload', size=len(part)):
+            self._upload_part(part)
+        metrics.record_bytes_out(len(part))
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self._aborted:
+                part = bytes(self._buffer)
+                self._buffer = bytearray()
+                with tracing.span('upload', size=len(part)):
+                    self._complete(part)
+                metrics.record_bytes_out(len(part))
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            super().close()
+
+    def abort(self):
+        """
+        Discard the upload, nothing is written to the storage
+        """
+        if not self._aborted:
+            self._aborted = True
+            self._buffer = bytearray()
+            self._abort()
+        if not self.closed:
+            super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def __del__(self):
+        # IOBase.__del__ would close, and publish, a stream that was never closed explicitly
+        if not self.closed:
+            self.abort()
+
+    def _upload_part(self, part):
+        raise NotImplementedError
+
+    def _complete(self, last_part):
+        """
+        Send the last (possibly empty or short) part and finish the upload
+        """
+        raise NotImplementedError
+
+    def _abort(self):
+        raise NotImplementedError
+
+
+class LocalFileUpload(UploadStream):
+    def __init__(self, path):
+        """
+        Write to a temporary file next to path and swap it in on close
+        """
+        super().__init__(part_size=1024 * 1024)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+        self._file = open(self.temporary, 'wb')
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('write to closed stream')
+        # Files are written directly, no need to buffer parts
+        size = self._file.write(data)
+        self._position += size
+        return size
+
+    def _complete(self, last_part):
+        self._file.close()
+        os.replace(self.temporary, self.path)
+        metrics.record_bytes_out(self._position)
+
+    def _abort(self):
+        self._file.close()
+        if os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+
+class BufferedUpload(UploadStream):
+    def __init__(self, send):
+        """
+        Keep the content in memory and send it at once on close, for storages without partial uploads
+        :param send: Called with the whole content as bytes
+        """
+        super().__init__()
+        self.send = send
+        self._content = io.BytesIO()
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('write to closed stream')
+        size = self._content.write(data)
+        self._position += size
+        return size
+
+    def _complete(self, last_part):
+        self.send(self._content.getvalue())
+
+    def _abort(self):
+        self._content = io.BytesIO()
+
+
+class S3MultipartUpload(UploadStream):
+    def __init__(self, client, bucket, key, part_size=DEFAULT_PART_SIZE):
+        """
+        Stream to S3 with a multipart upload, objects smaller than one part use a single put_object
+        """
+        if part_size < 5 * 1024 * 1024:
+            raise ValueError('part_size must be at least 5MB for S3 multipart uploads')
+        super().__init__(part_size)
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.upload_id = None
+        self.parts = []
+
+    def _upload_part(self, part):
+        if self.upload_id is None:
+            response = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self.upload_id = response['UploadId']
+        number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=number,
+            Body=part
+        )
+        self.parts.append({"ETag": response['ETag'], "PartNumber": number})
+
+    def _complete(self, last_part):
+        if self.upload_id is None:
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=last_part)
+            return
+        if last_part:
+            self._upload_part(last_part)
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts}
+        )
+
+    def _abort(self):
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+class AzureBlockUpload(UploadStream):
+    def __init__(self, blob_client, part_size=DEFAULT_PART_SIZE):
+        """
+        Stream to Azure with staged blocks committed on close
+        """
+        super().__init__(part_size)
+        self.blob_client = blob_client
+        self.block_ids = []
+
+    def _upload_part(self, part):
+        block_id = base64.b64encode(f'{len(self.block_ids):08d}-{uuid.uuid4().hex}'.encode()).decode()
+        self.blob_client.stage_block(block_id=block_id, data=part, length=len(part))
+        self.block_ids.append(block_id)
+
+    def _complete(self, last_part):
+        if last_part or not self.block_ids:
+            if not self.block_ids:
+                self.blob_client.upload_blob(last_part, blob_type="BlockBlob", overwrite=True)
+                return
+            self._upload_part(last_part)
+        self.blob_client.commit_block_list(self.block_ids)
+
+    def _abort(self):
+        # Uncommitted blocks are garbage collected by Azure
+        self.block_ids = []
+
+
+class _PipeReader(io.RawIOBase):
+    def __init__(self, maxsize=2):
+        """
+        Blocking reader fed by another thread, used to stream into APIs that pull from a file
+        """
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pending = b''
+        self._position = 0
+        self._eof = False
+        self.broken = False
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def feed(self, data):
+        # Stop waiting for room once the consumer is gone
+        while not self.broken:
+            try:
+                self._queue.put(data, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def finish(self):
+        self.feed(None)
+
+    def read(self, size=-1):
+        chunks = [self._pending]
+        available = len(self._pending)
+        while not self._eof and (size < 0 or available < size):
+            try:
+                data = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self.broken:
+                    raise IOError('Stream aborted by the writer')
+                continue
+            if data is None:
+                self._eof = True
+                break
+            chunks.append(data)
+            available += len(data)
+
+        data = b''.join(chunks)
+        if size >= 0:
+            data, self._pending = data[:size], data[size:]
+        else:
+            self._pending = b''
+        self._position += len(data)
+        return data
+
+
+class GCSResumableUpload(UploadStream):
+    def __init__(self, blob, part_size=DEFAULT_PART_SIZE):
+        """
+        Stream to GCS with a resumable upload session fed from a background thread, objects smaller than one part
+        are sent with a single upload from the calling thread
+        :param blob: Blob of a client used by no other thread, the connection of a gcloud client is not thread-safe
+        """
+        if part_size % (256 * 1024):
+            raise ValueError('part_size must be a multiple of 256KB for GCS resumable uploads')
+        super().__init__(part_size)
+        self.blob = blob
+        self._reader = None
+        self._error = None
+        self._thread = None
+
+    def _start(self):
+        self.blob.chunk_size = self.part_size
+        self._reader = _PipeReader()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.blob.upload_from_file(self._reader, size=None)
+        except BaseException as e:
+            self._error = e
+            self._reader.broken = True
+
+    def _check(self):
+        if self._error is not None:
+            raise Exception(f'Error while uploading file: {self._error}') from self._error
+
+    def _upload_part(self, part):
+        if self._thread is None:
+            self._start()
+        self._check()
+        self._reader.feed(part)
+
+    def _complete(self, last_part):
+        if self._thread is None:
+            self.blob.upload_from_file(io.BytesIO(last_part), size=len(last_part))
+            return
+        self._check()
+        if last_part:
+            self._reader.feed(last_part)
+        self._reader.finish()
+        self._thread.join()
+        self._check()
+
+    def _abort(self):
+        # The session is never finalized, GCS discards incomplete resumable uploads
+        if self._reader is not None:
+            self._reader.broken = True
@@ -0,0 +1,251 @@
+import io
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+_tracer = None
+_current_span = ContextVar('storage_tool_current_span', default=None)
+_disabled = nullcontext()
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        """
+        Timed section of a storage call
+        :param name: Span name (read, fetch, parse, ...)
+        :param parent: Parent span, None for the root span of a call
+        :param attributes: Extra attributes (format, size, ...)
+        """
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes or {}
+        self.children = []
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    @property
+    def self_time(self):
+        return self.duration - sum(child.duration for child in self.children)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def walk(self, depth=0):
+        yield self, depth
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+
+class SpanExporter:
+    def export(self, root):
+        """
+        Receive the root span of a finished call
+        """
+        raise NotImplementedError
+
+
+class InMemoryExporter(SpanExporter):
+    def __init__(self, max_traces=1000):
+        """
+        Keep the latest finished calls in memory
+        :param max_traces: Number of calls kept, the oldest are discarded
+        """
+        self.traces = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def export(self, root):
+        with self._lock:
+            self.traces.append(root)
+
+    def clear(self):
+        with self._lock:
+            self.traces.clear()
+
+    def timeline(self, root=None):
+        """
+        Flat timeline of a call, the latest one by default
+        return: List of dicts with name, depth, offset_ms, duration_ms and attributes
+        """
+        if root is None:
+            if not self.traces:
+                return []
+            root = self.traces[-1]
+
+        return [
+            {
+                "name": span.name,
+                "depth": depth,
+                "offset_ms": (span.start - root.start) * 1000,
+                "duration_ms": span.duration * 1000,
+                "attributes": dict(span.attributes),
+                "error": span.error,
+            }
+            for span, depth in root.walk()
+        ]
+
+    def dump_timeline(self, root=None):
+        """
+        Render the timeline of a call as text
+        """
+        lines = []
+        for item in self.timeline(root):
+            attributes = ' '.join(f'{key}={value}' for key, value in item['attributes'].items())
+            lines.append('{indent}{name:<{width}} +{offset:9.3f}ms {duration:9.3f}ms {attributes}'.format(
+                indent='  ' * item['depth'],
+                name=item['name'],
+                width=max(1, 24 - 2 * item['depth']),
+                offset=item['offset_ms'],
+                duration=item['duration_ms'],
+                attributes=attributes,
+            ).rstrip())
+        return '\n'.join(lines)
+
+    def flame(self):
+        """
+        Aggregate the self time of every stack across all kept calls
+        return: Dict of 'read;fetch' style stacks to seconds
+        """
+        stacks = {}
+        with self._lock:
+            traces = list(self.traces)
+
+        for root in traces:
+            path = []
+            for span, depth in root.walk():
+                del path[depth:]
+                path.append(span.name)
+                stack = ';'.join(path)
+                stacks[stack] = stacks.get(stack, 0.0) + max(span.self_time, 0.0)
+        return stacks
+
+    def folded(self):
+        """
+        Flame data in the folded stack format (stack and microseconds per line)
+        """
+        return '\n'.join(
+            f'{stack} {int(seconds * 1_000_000)}'
+            for stack, seconds in sorted(self.flame().items())
+        )
+
+
+def enable(exporter=None):
+    """
+    Enable span tracing of every storage backend
+    :param exporter: SpanExporter receiving finished calls, defaults to a new InMemoryExporter
+    return: The active exporter
+    """
+    global _tracer
+    _tracer = exporter if exporter is not None else InMemoryExporter()
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def get_exporter():
+    return _tracer
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def span(name, **attributes):
+    """
+    Context manager timing a section of the running call
+    :param name: Span name (fetch, decompress, parse, serialize, upload, ...)
+    :param attributes: Extra attributes recorded in the span
+    """
+    if _tracer is None:
+        return _disabled
+    return _span(name, attributes)
+
+
+@contextmanager
+def _span(name, attributes):
+    exporter = _tracer
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    if parent is not None:
+        parent.children.append(current)
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        if parent is None and exporter is not None:
+            exporter.export(current)
+
+
+def timed_reads(stream, name, **attributes):
+    """
+    Record the time spent in the reads of a stream consumed piecemeal by other work, e.g. a decompressor
+    read by a parser, as one span of the running call. The span lasts the sum of the reads
+    :param stream: Readable binary file-like object
+    :param name: Span name
+    :param attributes: Extra attributes recorded in the span
+    return: The stream itself when tracing is disabled, a buffered reader over it otherwise
+    """
+    parent = _current_span.get()
+    if _tracer is None or parent is None:
+        return stream
+    return io.BufferedReader(_TimedReader(stream, Span(name, parent, attributes)))
+
+
+class _TimedReader(io.RawIOBase):
+    def __init__(self, stream, span):
+        self.stream = stream
+        self.span = span
+        span.end = span.start
+        span.parent.children.append(span)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        start = time.perf_counter()
+        try:
+            data = self.stream.read(len(buffer))
+        except BaseException as e:
+            self.span.error = type(e).__name__
+            raise
+        finally:
+            self.span.end += time.perf_counter() - start
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def traced(operation, func):
+    """
+    Wrap a storage method so every call opens a root span named after the operation
+    :param operation: Span name
+    :param func: Storage method
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if _tracer is None:
+            return func(self, *args, **kwargs)
+        with _span(operation, {"backend": type(self).__name__}):
+            return func(self, *args, **kwargs)
+
+    wrapper.__traced__ = True
+    return wrapper
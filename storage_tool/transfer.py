@@ -0,0 +1,260 @@
+import hashlib
+import os
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from storage_tool import metrics
+from storage_tool.files import iter_files
+
+# Files transferred concurrently by put_directory and get_directory
+DEFAULT_WORKERS = 8
+# Small files are grouped into one task of the pool until either limit is reached
+BATCH_FILES = 64
+BATCH_BYTES = 8 * 1024 * 1024
+COMPARE_MODES = (None, 'mtime', 'checksum')
+
+
+def md5_file(path, chunk_size=1024 * 1024):
+    """
+    Hex MD5 of a file, read in chunks
+    """
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def multipart_etag(path, part_size):
+    """
+    ETag S3 gives to a file uploaded in parts of part_size: the MD5 of the part MD5s followed by the number
+    of parts, or the MD5 of the file when it is sent in one request
+    """
+    if os.path.getsize(path) < part_size:
+        return md5_file(path)
+    digests = []
+    with open(path, 'rb') as f:
+        for part in iter(lambda: f.read(part_size), b''):
+            digests.append(hashlib.md5(part).digest())
+    return f'{hashlib.md5(b"".join(digests)).hexdigest()}-{len(digests)}'
+
+
+def batches(jobs, batch_files=BATCH_FILES, batch_bytes=BATCH_BYTES):
+    """
+    Group jobs (dicts with a size) into lists, a job of batch_bytes or more is a batch of its own
+    """
+    batch = []
+    size = 0
+    for job in jobs:
+        if job['size'] >= batch_bytes:
+            yield [job]
+            continue
+        batch.append(job)
+        size += job['size']
+        if len(batch) >= batch_files or size >= batch_bytes:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
+
+
+def run_batches(jobs, transfer, workers=DEFAULT_WORKERS):
+    """
+    Run transfer(job) for every job on a bounded thread pool, at most two batches per worker are queued
+    so that listings of millions of files are not held in memory
+    :param transfer: Callable(job) returning True when the file was transferred, False when it was skipped
+    return: (transferred jobs, skipped jobs)
+    """
+    transferred = []
+    skipped = []
+
+    def run(batch):
+        return [(job, transfer(job)) for job in batch]
+
+    def collect(done):
+        for future in done:
+            for job, sent in future.result():
+                (transferred if sent else skipped).append(job)
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    running = set()
+    try:
+        for batch in batches(jobs):
+            if len(running) >= workers * 2:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                collect(done)
+            running.add(executor.submit(run, batch))
+        done, running = wait(running)
+        collect(done)
+    finally:
+        # A failed transfer cancels the batches that did not start
+        executor.shutdown(wait=True, cancel_futures=True)
+    return transferred, skipped
+
+
+class DirectoryTransfer:
+    """
+    Raw directory upload and download shared by the backends, built on their _iter_objects,
+    _upload_file and _download_file. The files are copied as they are, DataProcessor is not involved
+    """
+
+    def put_directory(self, local_directory, prefix='', workers=DEFAULT_WORKERS, compare=None):
+        """
+        Upload the files of a local folder and its subfolders
+        :param local_directory: Local folder
+        :param prefix: Folder of the repository receiving the files, the relative paths are kept
+        :param workers: Files transferred concurrently, small files are sent in batches and large ones in parts
+        :param compare: None uploads every file. 'mtime' skips the files with the size of the stored object and
+            modified before it, 'checksum' the files with the size and the MD5 (S3 ETag) of the stored object
+        return: {"transferred": [relative paths], "skipped": [relative paths]}
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        stored = self._stored_objects(prefix, compare)
+
+        def jobs():
+            for item in iter_files(local_directory):
+                item['path'] = os.path.join(local_directory, *item['object'].split('/'))
+                item['key'] = _join(prefix, item['object'])
+                item['stored'] = stored.get(item['object'])
+                yield item
+
+        def upload(job):
+            # Computed for every file, Azure stores it as the Content-MD5 of the blob
+            checksum = self._file_checksum(job['path']) if compare == 'checksum' else None
+            if _unchanged(job, job['stored'], compare, lambda: (checksum, self._stored_checksum(job['stored'], job['key']))):
+                return False
+            self._upload_file(job['path'], job['key'], checksum)
+            return True
+
+        transferred, skipped = run_batches(jobs(), upload, workers)
+        # The byte counters are per call context, the pool threads do not share it, the totals are recorded
+        # in the put_directory call
+        metrics.record_bytes_out(sum(job['size'] for job in transferred))
+        return {
+            "transferred": [job['object'] for job in transferred],
+            "skipped": [job['object'] for job in skipped]
+        }
+
+    def get_directory(self, prefix, local_directory, workers=DEFAULT_WORKERS, compare=None):
+        """
+        Download the objects under a prefix into a local folder, keeping their relative paths
+        :param prefix: Folder of the repository
+        :param local_directory: Local folder, created if needed
+        :param workers: Files transferred concurrently
+        :param compare: None downloads every object. 'mtime' skips the local files with the size of the object
+            and modified after it, 'checksum' the local files with the size and the MD5 (S3 ETag) of the object
+        return: {"transferred": [relative paths], "skipped": [relative paths]}
+        """
+        if not self.repository:
+            raise Exception('Repository not set')
+        _check_compare(compare)
+
+        root = os.path.realpath(local_directory)
+
+        def jobs():
+            for item in self._iter_objects(_folder(prefix)):
+                if item['object'].endswith('/'):
+                    # Folder placeholder objects
+                    continue
+                item['key'] = item['object']
+                item['object'] = item['object'][len(_folder(prefix)):]
+                item['path'] = os.path.realpath(os.path.join(root, *item['object'].split('/')))
+                # Keys with .. segments, absolute segments or symlinked folders must not escape local_directory
+                if os.path.commonpath([root, item['path']]) != root:
+                    raise ValueError(f"{item['key']} resolves outside of {local_directory}")
+                yield item
+
+        def download(job):
+            local = _local_file(job['path']) if compare else None
+            if _unchanged(job, local, compare, lambda: (self._file_checksum(job['path']), self._stored_checksum(job, job['key']))):
+                return False
+            os.makedirs(os.path.dirname(job['path']), exist_ok=True)
+            temporary = f"{job['path']}.{uuid.uuid4().hex}.tmp"
+            try:
+                self._download_file(job['key'], temporary)
+                os.replace(temporary, job['path'])
+            except BaseException:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                raise
+            return True
+
+        transferred, skipped = run_batches(jobs(), download, workers)
+        metrics.record_bytes_in(sum(job['size'] for job in transferred))
+        return {
+            "transferred": [job['object'] for job in transferred],
+            "skipped": [job['object'] for job in skipped]
+        }
+
+    def _stored_objects(self, prefix, compare):
+        # Listing of the objects under prefix by relative path, only needed to skip unchanged files
+        _check_compare(compare)
+        if compare is None:
+            return {}
+        folder = _folder(prefix)
+        return {item['object'][len(folder):]: item for item in self._iter_objects(folder)}
+
+    def _stored_checksum(self, stored, key):
+        return stored.get('checksum') or self._object_checksum(key)
+
+    def _file_checksum(self, path):
+        """
+        Checksum of a local file in the format of the checksums returned by _iter_objects
+        """
+        return md5_file(path)
+
+    def _object_checksum(self, key):
+        """
+        Checksum of a stored object when the listing does not give it, None when unknown
+        """
+        return None
+
+    def _iter_objects(self, prefix):
+        """
+        Objects whose key starts with prefix
+        return: Generator of {"object": key, "size": bytes, "modified_at": datetime, "checksum": str or None}
+        """
+        raise NotImplementedError
+
+    def _upload_file(self, path, key, checksum=None):
+        raise NotImplementedError
+
+    def _download_file(self, key, path):
+        raise NotImplementedError
+
+
+def _unchanged(source, target, compare, checksums):
+    # source is the file being transferred and target its existing copy at the destination.
+    # checksums returns the ones of the local file and the stored object, only called when the sizes match
+    if target is None or compare is None or source['size'] != target['size']:
+        return False
+    if compare == 'mtime':
+        # To the second, the precision of the S3 and Azure timestamps
+        return target['modified_at'] >= source['modified_at'].replace(microsecond=0)
+    local, stored = checksums()
+    return local is not None and local == stored
+
+
+def _local_file(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return {"size": stat.st_size, "modified_at": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)}
+
+
+def _check_compare(compare):
+    if compare not in COMPARE_MODES:
+        raise ValueError('compare must be None, mtime or checksum')
+
+
+def _folder(prefix):
+    prefix = prefix.strip('/')
+    return f'{prefix}/' if prefix else ''
+
+
+def _join(prefix, relative):
+    return f'{_folder(prefix)}{relative}'
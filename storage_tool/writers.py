@@ -0,0 +1,104 @@
+import pandas as pd
+
+from storage_tool import tracing
+from storage_tool.codecs import batch_formats, find_codec
+from storage_tool.compression import open_compressor, split_extension
+
+
+class DataFrameWriter:
+    def __init__(self, stream, file_extension):
+        """
+        Write DataFrame batches to a stream, one after the other
+        :param stream: Writable binary stream, closed with the writer
+        :param file_extension: Extension of a codec writing batches, see Codec.open_batches, e.g. csv, txt, parquet,
+            jsonl or ndjson, with an optional compression suffix, e.g. csv.gz
+        """
+        self.stream = stream
+        self.file_extension = file_extension
+        self.columns = None
+        self.rows = 0
+        self.closed = False
+        self._batches = None
+        self._target = stream
+        file_format, compression = split_extension(file_extension)
+        codec = find_codec(file_format)
+        self.file_format = file_format
+        if compression:
+            self._target = open_compressor(stream, compression)
+        if codec is not None:
+            self._batches = codec.open_batches(self._target)
+        if self._batches is None:
+            self.abort()
+            names = batch_formats()
+            raise ValueError(f'file_extension must be {", ".join(names[:-1])} or {names[-1]}')
+
+    def write(self, data):
+        """
+        Append a batch
+        :param data: DataFrame, dict or list of dicts with the same columns as the first batch
+        """
+        if self.closed:
+            raise ValueError('write to closed writer')
+        if isinstance(data, (dict, list)):
+            data = pd.DataFrame(data)
+        if not isinstance(data, pd.DataFrame):
+            raise ValueError('data must be dict or pd.DataFrame')
+
+        if self.columns is None:
+            self.columns = list(data.columns)
+        elif list(data.columns) != self.columns:
+            raise ValueError('columns of the batch do not match the first batch')
+
+        with tracing.span('serialize', format=self.file_extension, rows=len(data)):
+            self._batches.write(data)
+        self.rows += len(data)
+
+    def close(self):
+        """
+        Flush the last batch and finish the upload
+        """
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._batches.close()
+            if self._target is not self.stream:
+                self._target.close()
+        except BaseException:
+            self.abort()
+            raise
+        # pyarrow leaves Python file objects open
+        self.stream.close()
+
+    def abort(self):
+        """
+        Discard everything written so far
+        """
+        self.closed = True
+        # Finish the batch writer and the compressor before the stream is discarded,
+        # otherwise they flush into the aborted stream when they are garbage collected
+        for resource in (self._batches, self._target if self._target is not self.stream else None):
+            if resource is not None:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+        self._batches = None
+        if hasattr(self.stream, 'abort'):
+            self.stream.abort()
+        else:
+            self.stream.close()
+
+    def __del__(self):
+        # A writer dropped without close() is discarded, never published truncated
+        if not getattr(self, 'closed', True):
+            self.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
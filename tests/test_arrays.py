@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage_tool import metrics
+from storage_tool.data_processor import DataProcessor
+from storage_tool.local import LocalStorage
+from storage_tool.streams import RangeReader
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def matrix():
+    return np.random.default_rng(0).random((100000, 16))
+
+
+@pytest.mark.parametrize('file_path', ['features.npy', 'features.npy.gz'])
+def test_npy_round_trip(storage, matrix, file_path):
+    storage.put(file_path=file_path, content=matrix)
+
+    array = storage.read(file_path)
+
+    assert type(array) is np.ndarray
+    assert array.flags.writeable
+    np.testing.assert_array_equal(array, matrix)
+    assert storage.read(file_path, return_type=pd.DataFrame).equals(pd.DataFrame(matrix))
+
+
+@pytest.mark.parametrize('rows', [slice(1000, 1010), slice(5, 50, 7), slice(-3, None), slice(10, 10)])
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_npy_rows(storage, matrix, rows, order):
+    storage.put(file_path='features.npy', content=np.asarray(matrix, order=order))
+
+    np.testing.assert_array_equal(storage.read('features.npy', rows=rows), matrix[rows])
+    np.testing.assert_array_equal(storage.read('features.npy', rows=rows, mmap_mode='r'), matrix[rows])
+
+
+def test_npy_mmap_modes(storage, matrix):
+    storage.put(file_path='features.npy', content=matrix)
+
+    mapped = storage.read('features.npy', mmap_mode='r')
+    copied = storage.read('features.npy', mmap_mode='c')
+    copied[0, 0] = -1
+    writable = storage.read('features.npy', mmap_mode='r+')
+    writable[1, 0] = -2
+    writable.flush()
+
+    assert isinstance(mapped, np.memmap) and not mapped.flags.writeable
+    assert storage.read('features.npy')[0, 0] == matrix[0, 0]
+    assert storage.read('features.npy')[1, 0] == -2
+
+
+def test_npy_mmap_needs_local_file(storage, matrix):
+    storage.put(file_path='features.npy.gz', content=matrix)
+
+    with pytest.raises(ValueError, match='mmap_mode needs an uncompressed local file'):
+        storage.read('features.npy.gz', mmap_mode='r')
+
+
+def test_npy_range_reads_only_selected_rows(matrix):
+    processor = DataProcessor()
+    data = processor.convert_to_bytes(matrix, 'npy')
+
+    with metrics.track_bytes() as transferred:
+        array = processor.process_data(RangeReader(len(data), lambda start, end: data[start:end]), 'npy',
+                                       np.ndarray, rows=slice(50000, 51000))
+
+    np.testing.assert_array_equal(array, matrix[50000:51000])
+    assert transferred.bytes_in < 1000 * 16 * 8 + 2 * 256 * 1024
+
+
+def test_npz_round_trip(storage, matrix):
+    arrays = {'features': matrix, 'labels': np.arange(len(matrix))}
+    storage.put(file_path='dataset.npz', content=arrays, compression='deflate')
+
+    data = storage.read('dataset.npz', return_type=dict, arrays=['labels'])
+
+    assert list(data) == ['labels']
+    np.testing.assert_array_equal(data['labels'], arrays['labels'])
+    np.testing.assert_array_equal(storage.read('dataset.npz', return_type=dict)['features'], matrix)
+
+
+def test_invalid_data(matrix):
+    processor = DataProcessor()
+
+    with pytest.raises(ValueError, match='data must be ndarray or DataFrame'):
+        processor.convert_to_bytes({'a': [1]}, 'npy')
+    with pytest.raises(ValueError, match='data must be dict, pd.DataFrame or pa.Table'):
+        processor.convert_to_bytes(matrix, 'csv')
+
+
+@pytest.fixture
+def s3_storage():
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('array-tests')
+        yield storage
+
+
+def test_s3_row_slices(s3_storage, matrix):
+    s3_storage.put(file_path='features.npy', content=matrix)
+
+    with metrics.track_bytes() as transferred:
+        array = s3_storage.read('features.npy', return_type=np.ndarray, rows=slice(-100, None))
+
+    np.testing.assert_array_equal(array, matrix[-100:])
+    assert transferred.bytes_in < matrix.nbytes / 10
+
+
+def test_s3_default_return_types(s3_storage, matrix):
+    s3_storage.put(file_path='features.npy', content=matrix[:10])
+    s3_storage.put(file_path='dataset.npz', content={'features': matrix[:10]})
+    s3_storage.put(file_path='table.csv', content=pd.DataFrame({'col1': [1, 2]}))
+
+    assert type(s3_storage.read('features.npy')) is np.ndarray
+    np.testing.assert_array_equal(s3_storage.read('dataset.npz')['features'], matrix[:10])
+    assert isinstance(s3_storage.read('table.csv'), pd.DataFrame)
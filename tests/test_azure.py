@@ -338,6 +338,27 @@ def test_copying(azure_credentials, get_storage):
         pytest.fail(f"Azure Storage connection test failed: {e}")
 
 
+def test_directory_transfer(azure_credentials, get_storage, tmp_path):
+    try:
+        storage = get_storage['storage']
+        storage.set_repository(repository=azure_credentials['default_container'])
+        prefix = datetime.now().strftime("%Y%m%d%H%M%S%f")[:-3]
+        (tmp_path / 'source' / 'nested').mkdir(parents=True)
+        (tmp_path / 'source' / 'model.bin').write_bytes(os.urandom(1024))
+        (tmp_path / 'source' / 'nested' / 'image.png').write_bytes(os.urandom(512))
+
+        storage.put_directory(str(tmp_path / 'source'), prefix, compare='checksum')
+        uploaded = storage.put_directory(str(tmp_path / 'source'), prefix, compare='checksum')
+        downloaded = storage.get_directory(prefix, str(tmp_path / 'copy'))
+
+        assert sorted(uploaded['skipped']) == ['model.bin', 'nested/image.png']
+        assert sorted(downloaded['transferred']) == ['model.bin', 'nested/image.png']
+        assert (tmp_path / 'copy' / 'model.bin').read_bytes() == (tmp_path / 'source' / 'model.bin').read_bytes()
+
+    except Exception as e:
+        pytest.fail(f"Azure Storage connection test failed: {e}")
+
+
 def test_copying_between_containers(azure_credentials, get_storage):
     try:
         storage = get_storage['storage']
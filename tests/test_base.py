@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+
+from storage_tool.base import BaseStorage
+from storage_tool.compression import get_file_extension
+from storage_tool.data_processor import DataProcessor
+
+
+class LegacyStorage(BaseStorage, DataProcessor):
+    # Only the operations every backend had to implement before the raw byte operations
+    def __init__(self):
+        self.repository = 'memory'
+        self.files = {}
+
+    def create_repository(self, repository):
+        pass
+
+    def set_repository(self, repository):
+        pass
+
+    def set_or_create_repository(self, repository):
+        pass
+
+    def list_repositories(self):
+        return [self.repository]
+
+    def list(self, path=''):
+        return sorted(self.files)
+
+    def read(self, file_path, return_type=None, **options):
+        return self.process_data(self.files[file_path], get_file_extension(file_path), return_type, **options)
+
+    def put(self, file_path, content, **options):
+        self.files[file_path] = self.convert_to_bytes(content, get_file_extension(file_path), **options)
+
+    def delete(self, file_path):
+        del self.files[file_path]
+
+    def move(self, src_path, dest_path):
+        self.files[dest_path] = self.files.pop(src_path)
+
+    def move_between_repositories(self, src_repository, src_path, dest_repository, dest_path):
+        raise NotImplementedError
+
+    def copy(self, src_path, dest_path):
+        self.files[dest_path] = self.files[src_path]
+
+    def sync(self, src_path, dest_path):
+        raise NotImplementedError
+
+    def sync_between_repositories(self, src_repository, src_path, dest_repository, dest_path):
+        raise NotImplementedError
+
+    def exists(self, file_path):
+        return file_path in self.files
+
+    def get_metadata(self, file_path):
+        return {'size': len(self.files[file_path])}
+
+    def get_file_url(self, file_path):
+        return f'memory://{file_path}'
+
+
+class BytesStorage(LegacyStorage):
+    def read_bytes(self, file_path):
+        return self.files[file_path]
+
+    def put_bytes(self, file_path, data):
+        self.files[file_path] = bytes(data)
+
+
+def test_raw_byte_operations_are_optional():
+    storage = LegacyStorage()
+    storage.put(file_path='file.csv', content=[{'col1': 1}])
+
+    assert storage.read('file.csv', return_type=pd.DataFrame).to_dict('records') == [{'col1': 1}]
+    with pytest.raises(NotImplementedError, match='LegacyStorage does not implement read_bytes'):
+        storage.open('file.csv')
+    with pytest.raises(NotImplementedError, match='put_bytes'):
+        with storage.open('other.csv', 'wb') as stream:
+            stream.write(b'col1\n1\n')
+    assert storage.list() == ['file.csv']
+
+
+def test_open_and_open_writer_built_on_raw_bytes():
+    storage = BytesStorage()
+
+    with storage.open('file.bin', 'wb') as stream:
+        stream.write(b'abc')
+        stream.write(b'def')
+    with storage.open_writer('file.csv.gz') as writer:
+        writer.write(pd.DataFrame({'col1': [1, 2]}))
+        writer.write(pd.DataFrame({'col1': [3]}))
+
+    assert storage.open('file.bin').read() == b'abcdef'
+    assert storage.read('file.csv.gz', return_type=pd.DataFrame)['col1'].tolist() == [1, 2, 3]
+
+
+def test_failed_default_writer_writes_nothing():
+    storage = BytesStorage()
+
+    with pytest.raises(ValueError):
+        with storage.open('file.bin', 'wb') as stream:
+            stream.write(b'abc')
+            raise ValueError('failed')
+
+    assert storage.list() == []
+    with pytest.raises(ValueError, match="mode must be 'rb' or 'wb'"):
+        storage.open('file.bin', 'ab')
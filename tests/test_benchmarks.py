@@ -0,0 +1,65 @@
+import json
+
+from benchmarks import compare, harness
+
+
+def test_parse_size():
+    assert harness.parse_size('1KB') == 1024
+    assert harness.parse_size('5GB') == 5 * 1024 ** 3
+    assert harness.parse_size('512') == 512
+
+
+def test_make_frame_is_reproducible():
+    frame_a = harness.make_frame(10 * 1024, seed=1)
+    frame_b = harness.make_frame(10 * 1024, seed=1)
+
+    assert frame_a.equals(frame_b)
+    assert abs(len(frame_a.to_csv(index=False)) - 10 * 1024) < 1024
+
+
+def test_local_run_writes_json_results(tmp_path):
+    report = harness.run(
+        backends=['local'],
+        formats=['csv'],
+        sizes=['1KB'],
+        operations=['put', 'read', 'copy'],
+        concurrency=[1, 2],
+        repeats=1,
+        log=lambda message: None,
+    )
+    output = tmp_path / 'results.json'
+    output.write_text(json.dumps(report))
+
+    results = json.loads(output.read_text())['results']
+    assert len(results) == 6
+    for result in results:
+        assert result['error'] is None
+        assert result['latency']['p50'] > 0
+        assert result['peak_tracemalloc_bytes'] > 0
+
+
+def test_unserializable_scenario_is_skipped():
+    # npy only writes arrays, not the benchmark DataFrame
+    report = harness.run(
+        backends=['local'],
+        formats=['npy'],
+        sizes=['1KB'],
+        operations=['put'],
+        concurrency=[1],
+        repeats=1,
+        log=lambda message: None,
+    )
+
+    assert report['results'] == []
+    assert report['meta']['skipped_scenarios']['local/npy/1KB'].startswith('ValueError')
+
+
+def test_compare_flags_regressions():
+    result = {'backend': 'local', 'format': 'csv', 'size': '1KB', 'operation': 'read', 'concurrency': 1}
+    baseline = {'results': [{**result, 'latency': {'p50': 1.0, 'p99': 2.0}}]}
+    candidate = {'results': [{**result, 'latency': {'p50': 1.5, 'p99': 2.0}}]}
+
+    rows = compare.compare(baseline, candidate, threshold=0.10)
+
+    regressions = [row['metric'] for row in rows if row['regression']]
+    assert regressions == ['latency.p50']
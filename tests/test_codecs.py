@@ -0,0 +1,111 @@
+import pandas as pd
+import pytest
+
+from storage_tool import codecs
+from storage_tool.codecs import Codec, register_codec
+from storage_tool.data_processor import DataProcessor
+from storage_tool.local import LocalStorage
+
+
+class LinesCodec(Codec):
+    # Plain text, one list item per line
+    extensions = ('lines',)
+    return_types = (list,)
+    read_options = ('strip',)
+    streaming = True
+
+    def decode(self, processor, source, return_type, strip=False, **options):
+        lines = source.read().decode('utf-8').splitlines()
+        return [line.strip() for line in lines] if strip else lines
+
+    def encode(self, processor, data, stream, **options):
+        stream.write(''.join(f'{line}\n' for line in data).encode('utf-8'))
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Codecs registered by a test do not leak into the others
+    monkeypatch.setattr(codecs, '_codecs', dict(codecs._codecs))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.mark.parametrize('file_path', ['notes.lines', 'notes.lines.gz', 'notes.lines.zst'])
+def test_custom_codec_round_trip(storage, file_path):
+    register_codec(LinesCodec())
+
+    storage.put(file_path=file_path, content=['first ', ' second'])
+
+    assert storage.read(file_path, return_type=list) == ['first ', ' second']
+    assert storage.read(file_path, return_type=list, strip=True) == ['first', 'second']
+
+
+def test_codec_flags_drive_the_read_path():
+    processor = DataProcessor()
+    register_codec(LinesCodec())
+
+    assert processor.streams_from('lines')
+    assert processor.random_access('feather')
+    assert not processor.random_access('feather.gz')
+    assert not processor.streams_from('unknown')
+
+
+def test_codec_validates_options_and_return_type():
+    processor = DataProcessor()
+    register_codec(LinesCodec())
+
+    with pytest.raises(ValueError, match='return_type must be one of list'):
+        processor.process_data(b'a\n', 'lines', pd.DataFrame)
+    with pytest.raises(ValueError, match='unexpected options: strip'):
+        processor.process_data(b'a,b\n1,2\n', 'csv', pd.DataFrame, strip=True)
+
+
+def test_register_replaces_builtin():
+    class UpperCsvCodec(codecs.CsvCodec):
+        def decode(self, processor, source, return_type, **options):
+            frame = super().decode(processor, source, return_type, **options)
+            return frame.rename(columns=str.upper)
+
+    register_codec(UpperCsvCodec())
+
+    assert list(DataProcessor().process_data(b'a,b\n1,2\n', 'csv', pd.DataFrame).columns) == ['A', 'B']
+
+
+def test_unknown_format_lists_registered_codecs():
+    register_codec(LinesCodec())
+
+    with pytest.raises(ValueError, match='file_extension must be json, .*, parquet, .* or lines$'):
+        DataProcessor().convert_to_bytes(['a'], 'yaml')
+
+
+def test_custom_codec_batches_drive_open_writer(storage):
+    class LineBatches:
+        def __init__(self, stream):
+            self.stream = stream
+
+        def write(self, data):
+            self.stream.write(''.join(f'{value}\n' for value in data.iloc[:, 0]).encode('utf-8'))
+
+        def close(self):
+            pass
+
+    class FrameLinesCodec(LinesCodec):
+        def open_batches(self, stream):
+            return LineBatches(stream)
+
+    with pytest.raises(ValueError, match='file_extension must be jsonl, ndjson, csv, parquet or txt$'):
+        storage.open_writer('notes.lines')
+    register_codec(FrameLinesCodec())
+
+    with storage.open_writer('notes.lines.gz') as writer:
+        writer.write(pd.DataFrame({'line': ['a', 'b']}))
+        writer.write(pd.DataFrame({'line': ['c']}))
+
+    assert storage.read('notes.lines.gz', return_type=list) == ['a', 'b', 'c']
+    with pytest.raises(ValueError, match='file_extension must be .* or lines$'):
+        storage.open_writer('notes.xlsx')
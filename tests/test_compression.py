@@ -0,0 +1,97 @@
+import gzip
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from storage_tool.compression import get_file_extension, split_extension
+from storage_tool.data_processor import DataProcessor
+from storage_tool.local import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({'id': range(500), 'name': ['repeated value'] * 500})
+
+
+@pytest.mark.parametrize('file_path,expected', [
+    ('data.csv', 'csv'),
+    ('folder.v2/data.CSV.GZ', 'csv.gz'),
+    ('data.json.zst', 'json.zst'),
+    ('archive.gz', 'gz'),
+    ('data.backup.csv', 'csv'),
+])
+def test_get_file_extension(file_path, expected):
+    assert get_file_extension(file_path) == expected
+
+
+def test_split_extension():
+    assert split_extension('csv.bz2') == ('csv', 'bz2')
+    assert split_extension('parquet') == ('parquet', None)
+    with pytest.raises(ValueError):
+        split_extension('csv.rar')
+
+
+@pytest.mark.parametrize('compression', ['gz', 'bz2', 'zst'])
+@pytest.mark.parametrize('file_format', ['csv', 'json', 'parquet', 'xlsx', 'txt'])
+def test_round_trip(storage, frame, file_format, compression):
+    if compression == 'zst':
+        pytest.importorskip('zstandard')
+    file_path = f'folder/data.{file_format}.{compression}'
+
+    storage.put(file_path=file_path, content=frame)
+    result = storage.read(file_path=file_path, return_type=pd.DataFrame)
+
+    assert result.reset_index(drop=True).equals(frame)
+
+
+def test_put_compresses_content(storage, frame):
+    storage.put(file_path='data.csv.gz', content=frame)
+
+    with open(f'{storage.repository}/data.csv.gz', 'rb') as f:
+        compressed = f.read()
+    assert gzip.decompress(compressed) == frame.to_csv(index=False).encode('utf-8')
+    assert len(compressed) < len(frame.to_csv(index=False)) / 5
+
+
+def test_parquet_codec_options(tmp_path, frame):
+    data = DataProcessor().convert_to_bytes(frame, 'parquet', compression='zstd', compression_level=5)
+    (tmp_path / 'data.parquet').write_bytes(data)
+
+    assert pq.ParquetFile(tmp_path / 'data.parquet').metadata.row_group(0).column(0).compression == 'ZSTD'
+
+
+def test_unexpected_option(frame):
+    with pytest.raises(ValueError):
+        DataProcessor().convert_to_bytes(frame, 'csv', delimiter=';')
+
+
+def test_writer_compression(storage, frame):
+    with storage.open_writer('data.txt.gz') as writer:
+        writer.write(frame)
+        writer.write(frame)
+
+    result = storage.read(file_path='data.txt.gz', return_type=pd.DataFrame)
+    assert result.equals(pd.concat([frame, frame], ignore_index=True))
+
+
+def test_s3_streams_compressed_body():
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('compression-tests')
+
+        storage.put(file_path='data.json.gz', content=[{'col1': 1}, {'col1': 2}])
+
+        assert storage.read(file_path='data.json.gz', return_type=dict) == [{'col1': 1}, {'col1': 2}]
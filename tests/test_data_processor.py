@@ -0,0 +1,123 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from storage_tool.data_processor import DataProcessor
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+@pytest.mark.parametrize('file_extension,sep', [('csv', ','), ('txt', '\t')])
+def test_records_match_dataframe_layout(processor, file_extension, sep):
+    data_fake = [{'col1': 1, 'col2': 'a,b'}, {'col1': 2, 'col2': None, 'col3': 'z'}]
+
+    data = processor.convert_to_bytes(data_fake, file_extension)
+
+    assert data == pd.DataFrame(data_fake).to_csv(index=False, sep=sep).encode('utf-8')
+
+
+@pytest.mark.parametrize('data_fake', [
+    [{'a': 1, 'b': float('nan')}, {'a': None, 'b': 2.5}],
+    [{'a': 1, 'b': 2}, {'a': 3}],
+    [{'a': 1, 'b': 0.5}, {'a': 10 ** 17, 'b': np.nan}],
+    [{'a': True, 'b': None}, {'a': None, 'b': None}],
+    [{'a': 1, 'b': 'x'}, {'a': 2.5, 'b': 3}],
+    [{'a': np.int64(1), 'b': np.float32(0.5)}, {'a': np.int64(2), 'b': None}],
+])
+def test_records_missing_values_match_dataframe_layout(processor, data_fake):
+    data = processor.convert_to_bytes(data_fake, 'csv')
+
+    assert data == pd.DataFrame(data_fake).to_csv(index=False).encode('utf-8')
+
+
+@pytest.mark.parametrize('file_extension', ['csv', 'json', 'parquet', 'xlsx', 'txt', 'feather', 'arrow'])
+def test_round_trip(processor, file_extension):
+    frame = pd.DataFrame({'col1': [1, 2], 'col2': ['x', 'y']})
+
+    data = processor.convert_to_bytes(frame, file_extension)
+    result = processor.process_data(data, file_extension, pd.DataFrame)
+
+    assert result.reset_index(drop=True).equals(frame)
+
+
+def test_write_to_stream_returns_size(processor):
+    stream = io.BytesIO()
+    stream.write(b'prefix')
+
+    size = processor.write_to_stream([{'col1': 1}], 'json', stream)
+
+    assert size == len(stream.getvalue()) - len(b'prefix')
+
+
+def test_invalid_extension(processor):
+    with pytest.raises(ValueError, match='file_extension must be'):
+        processor.convert_to_bytes([{'col1': 1}], 'xml')
+
+
+@pytest.mark.parametrize('file_extension', ['csv', 'json', 'parquet', 'xlsx', 'txt', 'feather', 'arrow'])
+def test_arrow_round_trip(processor, file_extension):
+    table = pa.table({'col1': [1, 2, 3], 'col2': ['x', 'y, z', None]})
+
+    data = processor.convert_to_bytes(table, file_extension)
+    result = processor.process_data(data, file_extension, pa.Table)
+    reader = processor.process_data(data, file_extension, pa.RecordBatchReader)
+
+    assert result.to_pylist() == table.to_pylist()
+    assert isinstance(reader, pa.RecordBatchReader)
+    assert reader.read_all().to_pylist() == table.to_pylist()
+
+
+def test_parquet_reader_streams_row_groups(processor):
+    table = pa.table({'col1': list(range(100))})
+    stream = io.BytesIO()
+    pq.write_table(table, stream, row_group_size=10)
+
+    reader = processor.process_data(stream.getvalue(), 'parquet', pa.RecordBatchReader)
+
+    assert len(list(reader)) == 10
+
+
+def test_invalid_return_type(processor):
+    with pytest.raises(ValueError):
+        processor.process_data(b'col1\n1\n', 'csv', list)
+
+
+@pytest.mark.parametrize('file_extension', ['csv', 'txt'])
+def test_pyarrow_engine(processor, file_extension):
+    frame = pd.DataFrame({'col1': range(1000), 'col2': ['x', None] * 500})
+    data = processor.convert_to_bytes(frame, file_extension)
+
+    result = processor.process_data(data, file_extension, pd.DataFrame, engine='pyarrow', block_size=4096, threads=1)
+
+    assert result.equals(processor.process_data(data, file_extension, pd.DataFrame))
+
+
+def test_pyarrow_threads_leave_cpu_pool(processor):
+    data = processor.convert_to_bytes(pd.DataFrame({'col1': range(1000)}), 'csv')
+    cpu_count = pa.cpu_count()
+
+    result = processor.process_data(data, 'csv', pd.DataFrame, engine='pyarrow', threads=cpu_count + 1)
+
+    assert len(result) == 1000
+    assert pa.cpu_count() == cpu_count
+
+
+def test_pyarrow_dtype_backend(processor):
+    data = processor.convert_to_bytes(pd.DataFrame({'col1': [1, 2], 'col2': ['x', 'y']}), 'csv')
+
+    result = processor.process_data(data, 'csv', pd.DataFrame, engine='pyarrow', dtype_backend='pyarrow')
+
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in result.dtypes)
+    assert result['col1'].tolist() == [1, 2]
+
+
+def test_unexpected_read_option(processor):
+    with pytest.raises(ValueError):
+        processor.process_data(b'col1\n1\n', 'csv', pd.DataFrame, sep=';')
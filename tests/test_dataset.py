@@ -0,0 +1,160 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from storage_tool import metrics
+from storage_tool.dataset import keep_partition, normalize_filters, parse_partitions, typed_filters
+from storage_tool.local import LocalStorage
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def s3_storage():
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('dataset-tests')
+        yield storage
+
+
+@pytest.fixture(params=['local_storage', 's3_storage'])
+def storage(request):
+    storage = request.getfixturevalue(request.param)
+    for date in ('2024-05-01', '2024-05-02', '2024-05-03'):
+        for hour in (0, 12):
+            frame = pd.DataFrame({'user': [f'{date}-{hour}-a', f'{date}-{hour}-b'], 'clicks': [hour, hour + 1]})
+            storage.put(file_path=f'events/date={date}/hour={hour}/part-0.parquet', content=frame)
+    storage.put(file_path='events/date=2024-05-03/hour=12/part-1.parquet.gz', content=pd.DataFrame({'user': ['late'], 'clicks': [7]}))
+    # A file of another format in the dataset folder
+    storage.put(file_path='events/date=2024-05-01/hour=0/export.csv', content=pd.DataFrame({'user': ['export'], 'clicks': [1]}))
+    storage.put_bytes('events/_SUCCESS', b'')
+    storage.put_bytes('events2/date=2024-05-01/part-0.parquet', b'not a dataset file')
+    return storage
+
+
+def test_read_whole_dataset(storage):
+    data = storage.read_dataset('events')
+
+    assert len(data) == 13
+    assert list(data.columns) == ['user', 'clicks', 'date', 'hour']
+    assert data['hour'].dtype == 'int64'
+    assert data.iloc[0].to_dict() == {'user': '2024-05-01-0-a', 'clicks': 0, 'date': '2024-05-01', 'hour': 0}
+    assert data['user'].iloc[-1] == 'late'
+    assert 'export' not in data['user'].tolist()
+
+
+def test_partitions_are_pruned_before_download(storage):
+    with metrics.track_bytes() as everything:
+        storage.read_dataset('events/', workers=2)
+    with metrics.track_bytes() as pruned:
+        data = storage.read_dataset('events/', filters=[('date', '>=', '2024-05-02'), ('hour', '=', 12)], workers=2)
+
+    assert sorted(data['user']) == ['2024-05-02-12-a', '2024-05-02-12-b', '2024-05-03-12-a', '2024-05-03-12-b', 'late']
+    assert 0 < pruned.bytes_in < everything.bytes_in / 2
+
+
+def test_row_filters_and_columns(storage):
+    data = storage.read_dataset(
+        'events',
+        filters=[[('date', '=', '2024-05-01'), ('clicks', '>', 0)], [('user', 'in', ['late'])]],
+        columns=['hour', 'user'],
+        return_type=pa.Table
+    )
+
+    assert data.column_names == ['hour', 'user']
+    assert sorted(data.column('user').to_pylist()) == ['2024-05-01-0-b', '2024-05-01-12-a', '2024-05-01-12-b', 'late']
+
+
+def test_file_format(storage):
+    data = storage.read_dataset('events', file_format='csv')
+
+    assert data.to_dict('records') == [{'user': 'export', 'clicks': 1, 'date': '2024-05-01', 'hour': 0}]
+
+
+def test_schema_sidecars_are_not_parts(local_storage):
+    from storage_tool.schema_cache import SidecarSchemaCache
+
+    local_storage.set_schema_cache(SidecarSchemaCache(local_storage))
+    for day in (1, 2):
+        local_storage.put(file_path=f'sales/day={day}/part-0.json', content=[{'id': day, 'amount': day * 1.5}])
+        local_storage.put(file_path=f'sales/day={day}/part-0.csv', content=pd.DataFrame({'id': [day]}))
+        # Writes part-0.csv.schema.json next to the csv file
+        local_storage.read(f'sales/day={day}/part-0.csv')
+    local_storage.set_schema_cache(SidecarSchemaCache(local_storage, prefix_depth=1))
+    local_storage.read('sales/day=1/part-0.csv')
+
+    assert local_storage.exists('sales/day=1/part-0.csv.schema.json')
+    assert local_storage.exists('sales/_schema.json')
+    data = local_storage.read_dataset('sales', file_format='json')
+    assert data.to_dict('records') == [{'id': 1, 'amount': 1.5, 'day': 1}, {'id': 2, 'amount': 3.0, 'day': 2}]
+    assert len(local_storage.read_dataset('sales', file_format='csv')) == 2
+
+
+def test_stream_batches(storage):
+    reader = storage.read_dataset('events', filters=[('date', '!=', '2024-05-03')], return_type=pa.RecordBatchReader)
+
+    assert reader.schema.names == ['user', 'clicks', 'date', 'hour']
+    assert reader.read_all().num_rows == 8
+
+
+def test_streamed_bytes_are_tracked_where_consumed(storage):
+    sink = metrics.enable()
+    try:
+        with metrics.track_bytes() as consumed:
+            reader = storage.read_dataset('events', return_type=pa.RecordBatchReader, workers=1)
+            reader.read_all()
+        event = next(item for item in sink.snapshot() if item['operation'] == 'read_dataset')
+    finally:
+        metrics.disable()
+
+    # The files fetched after read_dataset returned are outside of its event
+    assert 0 < event['bytes_in'] < consumed.bytes_in
+
+
+def test_empty_dataset(storage):
+    assert storage.read_dataset('missing').empty
+    assert storage.read_dataset('events', filters=[('date', 'in', [])], return_type=pa.Table).num_rows == 0
+
+
+def test_parse_partitions():
+    assert parse_partitions('date=2024-05-01/city=S%C3%A3o%20Paulo/part-0.csv') == {'date': '2024-05-01', 'city': 'São Paulo'}
+    assert parse_partitions('country=__HIVE_DEFAULT_PARTITION__/raw/part-0.csv') == {'country': None}
+
+
+def test_keep_partition():
+    filters = normalize_filters([('year', '>=', 2023), ('country', 'not in', ['BR'])])
+
+    assert keep_partition({'year': 2024, 'country': 'US'}, filters)
+    assert not keep_partition({'year': 2024, 'country': 'BR'}, filters)
+    assert not keep_partition({'year': None}, filters)
+    assert keep_partition({}, filters)
+
+
+def test_filter_values_take_the_partition_type(storage):
+    data = storage.read_dataset('events', filters=[('hour', 'in', ['12']), ('date', '<', '2024-05-02')], return_type=pa.Table)
+
+    assert sorted(data.column('user').to_pylist()) == ['2024-05-01-12-a', '2024-05-01-12-b']
+    assert typed_filters([[('hour', '>', '-1'), ('date', '=', 5)]], {'hour': pa.int64(), 'date': pa.string()}) == \
+        [[('hour', '>', -1), ('date', '=', '5')]]
+    with pytest.raises(ValueError, match='integer partition hour'):
+        storage.read_dataset('events', filters=[('hour', '=', 'noon')])
+
+
+def test_keep_partition_rejects_incomparable_values():
+    with pytest.raises(ValueError, match="filter value '2023' cannot be compared"):
+        keep_partition({'year': 2024}, normalize_filters([('year', '>=', '2023')]))
+
+
+def test_invalid_filters(local_storage):
+    with pytest.raises(ValueError, match='filter operator must be'):
+        local_storage.read_dataset('events', filters=[('date', 'like', '2024%')])
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from storage_tool.data_processor import DataProcessor
+from storage_tool.dtypes import apply_dtype_policy
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'id': range(1000),
+        'amount': [1.5] * 1000,
+        'country': ['BR', 'US'] * 500,
+        'name': [f'name-{i}' for i in range(1000)],
+    })
+
+
+def test_lean_policy(frame):
+    data = apply_dtype_policy(frame.copy(), 'lean')
+
+    assert data['id'].dtype == 'uint16'
+    assert data['amount'].dtype == 'float64'
+    assert isinstance(data['country'].dtype, pd.CategoricalDtype)
+    assert data['name'].dtype == 'string[pyarrow]'
+    assert data.memory_usage(deep=True).sum() < frame.memory_usage(deep=True).sum()
+
+
+def test_policy_overrides(frame):
+    data = apply_dtype_policy(frame.copy(), {'floats': True, 'category_threshold': 0, 'string_dtype': None})
+
+    assert data['amount'].dtype == 'float32'
+    assert not isinstance(data['country'].dtype, pd.CategoricalDtype)
+
+
+def test_invalid_policy(frame):
+    with pytest.raises(ValueError):
+        apply_dtype_policy(frame, 'smallest')
+    with pytest.raises(ValueError):
+        apply_dtype_policy(frame, {'downcast_everything': True})
+
+
+@pytest.mark.parametrize('file_extension', ['csv', 'txt', 'json', 'xlsx', 'parquet'])
+def test_read_options(frame, file_extension):
+    processor = DataProcessor()
+    data = processor.convert_to_bytes(frame, file_extension)
+
+    result = processor.process_data(
+        data,
+        file_extension,
+        pd.DataFrame,
+        usecols=['id', 'country', 'amount'],
+        dtype={'amount': 'float32'},
+        dtype_policy='lean',
+    )
+
+    assert sorted(result.columns) == ['amount', 'country', 'id']
+    assert result['amount'].dtype == 'float32'
+    assert result['id'].dtype == 'uint16'
+    assert isinstance(result['country'].dtype, pd.CategoricalDtype)
+
+
+def test_pyarrow_engine_usecols(frame):
+    processor = DataProcessor()
+    data = processor.convert_to_bytes(frame, 'csv')
+
+    result = processor.process_data(data, 'csv', pd.DataFrame, engine='pyarrow', usecols=['name'], dtype_policy='lean')
+
+    assert list(result.columns) == ['name']
+    assert result['name'].dtype == 'string[pyarrow]'
@@ -0,0 +1,87 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from storage_tool.data_processor import DataProcessor
+from storage_tool.excel import iter_rows, write_xlsx
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'id': range(50),
+        'value': [1.5, np.nan] * 25,
+        'name': ['a', None] * 25,
+    })
+
+
+def test_iter_rows_replaces_missing_values(frame):
+    rows = list(iter_rows(frame, chunksize=7))
+
+    assert rows[0] == ('id', 'value', 'name')
+    assert rows[2] == (1, None, None)
+    assert len(rows) == 51
+
+
+@pytest.mark.parametrize('engine', ['openpyxl', 'xlsxwriter'])
+def test_constant_memory_writers(frame, engine):
+    if engine == 'xlsxwriter':
+        pytest.importorskip('xlsxwriter')
+    stream = io.BytesIO()
+
+    write_xlsx(frame, stream, engine=engine, sheet_name='data')
+
+    stream.seek(0)
+    assert load_workbook(stream, read_only=True).sheetnames == ['data']
+    stream.seek(0)
+    assert pd.read_excel(stream).equals(frame)
+
+
+@pytest.mark.parametrize('engine', ['openpyxl', 'xlsxwriter'])
+def test_datetime_round_trip(engine):
+    if engine == 'xlsxwriter':
+        pytest.importorskip('xlsxwriter')
+    frame = pd.DataFrame({
+        'at': pd.to_datetime(['2024-05-01 10:30:00', None]),
+        'local': pd.to_datetime(['2024-05-01 10:30:00', '2024-05-02 00:00:00']).tz_localize('America/Sao_Paulo'),
+    })
+    stream = io.BytesIO()
+
+    write_xlsx(frame, stream, engine=engine)
+
+    stream.seek(0)
+    result = pd.read_excel(stream)
+    assert result['at'].tolist() == frame['at'].tolist()
+    # Excel has no time zones, the local time is written
+    assert result['local'].tolist() == frame['local'].dt.tz_localize(None).tolist()
+
+
+def test_read_passthrough(processor, frame):
+    data = processor.convert_to_bytes(frame, 'xlsx', sheet_name='report')
+
+    result = processor.process_data(data, 'xlsx', pd.DataFrame, sheet_name='report', usecols=['id', 'name'], nrows=10)
+
+    assert list(result.columns) == ['id', 'name']
+    assert len(result) == 10
+
+
+def test_read_all_sheets(processor, frame):
+    data = processor.convert_to_bytes(frame, 'xlsx', sheet_name='report')
+
+    result = processor.process_data(data, 'xlsx', pd.DataFrame, sheet_name=None)
+
+    assert list(result) == ['report']
+    assert result['report'].equals(frame)
+
+
+def test_invalid_engine(processor, frame):
+    with pytest.raises(ValueError):
+        processor.convert_to_bytes(frame, 'xlsx', engine='xlwt')
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from storage_tool.data_processor import DataProcessor
+from storage_tool.local import LocalStorage
+from storage_tool.streams import RangeReader
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({f'col{i}': np.arange(100000, dtype='int64') * i for i in range(4)})
+
+
+class FetchLog:
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+
+    def __call__(self, start, end):
+        self.ranges.append((start, end))
+        return self.data[start:end]
+
+    @property
+    def fetched(self):
+        return sum(end - start for start, end in self.ranges)
+
+
+@pytest.mark.parametrize('file_path', ['data.feather', 'data.arrow', 'data.feather.gz'])
+def test_round_trip(storage, frame, file_path):
+    storage.put(file_path=file_path, content=frame)
+
+    assert storage.read(file_path=file_path, return_type=pd.DataFrame).equals(frame)
+
+
+def test_local_read_is_memory_mapped(storage, frame):
+    storage.put(file_path='data.arrow', content=frame)
+    allocated = pa.total_allocated_bytes()
+
+    table = storage.read(file_path='data.arrow', return_type=pa.Table)
+
+    # The columns point into the mapping, nothing is copied into the Arrow memory pool
+    assert pa.total_allocated_bytes() == allocated
+    assert table.column('col3').to_pylist()[-1] == 99999 * 3
+
+
+def test_usecols_and_batches(storage, frame):
+    storage.put(file_path='data.feather', content=frame)
+
+    data = storage.read(file_path='data.feather', return_type=pd.DataFrame, usecols=['col2', 'col0'])
+    reader = storage.read(file_path='data.feather', return_type=pa.RecordBatchReader, usecols=['col2', 'col0'])
+
+    assert data.equals(frame[['col2', 'col0']])
+    assert reader.schema.names == ['col2', 'col0']
+    assert reader.read_all().to_pandas().equals(frame[['col2', 'col0']])
+
+
+@pytest.mark.parametrize('compression', ['lz4', 'zstd'])
+def test_compressed_buffers(frame, compression):
+    processor = DataProcessor()
+    data = processor.convert_to_bytes(frame, 'arrow', compression=compression)
+
+    assert len(data) < len(processor.convert_to_bytes(frame, 'arrow'))
+    assert processor.process_data(data, 'arrow', pd.DataFrame).equals(frame)
+
+
+def test_range_reader_downloads_only_selected_columns(frame):
+    processor = DataProcessor()
+    fetch = FetchLog(processor.convert_to_bytes(frame, 'arrow'))
+
+    data = processor.process_data(RangeReader(len(fetch.data), fetch), 'arrow', pd.DataFrame, usecols=['col1'])
+
+    assert data.equals(frame[['col1']])
+    assert fetch.fetched < len(fetch.data) / 2
+
+
+def test_range_reader_blocks():
+    fetch = FetchLog(bytes(range(256)) * 4)
+    reader = RangeReader(len(fetch.data), fetch, block_size=100)
+
+    reader.seek(-10, 2)
+    assert reader.read(4) == fetch.data[-10:-6]
+    assert reader.read() == fetch.data[-6:]
+    assert fetch.ranges == [(1000, 1024)]
+    reader.seek(190)
+    assert reader.read(20) == fetch.data[190:210]
+    assert fetch.ranges[1:] == [(100, 200), (200, 300)]
+    reader.seek(0)
+    assert reader.read(300) == fetch.data[:300]
+    assert fetch.ranges[-1] == (0, 300)
+
+
+def test_s3_range_reads(frame):
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('ipc-tests')
+
+        storage.put(file_path='data.feather', content=frame)
+
+        assert storage.read(file_path='data.feather', return_type=pd.DataFrame, usecols=['col3']).equals(frame[['col3']])
@@ -0,0 +1,69 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage_tool import json_codec
+from storage_tool.data_processor import DataProcessor
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def codec(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(json_codec, 'orjson', None)
+    return request.param
+
+
+def test_codec_round_trip(codec):
+    data = [{'id': 1, 'name': 'ação', 'tags': ['a', 'b'], 'meta': None}]
+
+    encoded = json_codec.dumps(data)
+    stream = io.BytesIO()
+    json_codec.dump(data, stream)
+
+    assert isinstance(encoded, bytes)
+    assert json_codec.loads(encoded) == data
+    assert json_codec.loads(stream.getvalue()) == data
+
+
+def test_orjson_accepts_numpy_and_int_keys():
+    pytest.importorskip('orjson')
+
+    assert json_codec.loads(json_codec.dumps({1: np.int64(2)})) == {'1': 2}
+
+
+def test_normalize_nested_records(processor, codec):
+    records = [{'id': 1, 'meta': {'page': 'home', 'geo': {'country': 'BR'}}}, {'id': 2, 'meta': {'page': 'cart'}}]
+    data = processor.convert_to_bytes(records, 'json')
+
+    flat = processor.process_data(data, 'json', pd.DataFrame, normalize=True)
+    one_level = processor.process_data(data, 'json', pd.DataFrame, normalize=True, max_level=0)
+
+    assert list(flat.columns) == ['id', 'meta.page', 'meta.geo.country']
+    assert list(one_level.columns) == ['id', 'meta']
+
+
+def test_normalize_json_lines(processor, codec):
+    data = processor.convert_to_bytes([{'id': 1, 'meta': {'page': 'home'}}], 'jsonl')
+
+    result = processor.process_data(data, 'jsonl', pd.DataFrame, normalize=True)
+
+    assert result.to_dict('records') == [{'id': 1, 'meta.page': 'home'}]
+
+
+@pytest.mark.parametrize('orient', ['records', 'split', 'columns', 'index', 'table'])
+def test_orient_round_trip(processor, orient):
+    frame = pd.DataFrame({'id': [1, 2], 'name': ['x', 'y']})
+
+    data = processor.convert_to_bytes(frame, 'json', orient=orient)
+    result = processor.process_data(data, 'json', pd.DataFrame, orient=orient)
+
+    assert result.reset_index(drop=True).equals(frame)
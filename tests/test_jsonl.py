@@ -0,0 +1,71 @@
+import types
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from storage_tool.local import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def records():
+    return [{'id': i, 'event': 'click' if i % 2 else 'view', 'meta': {'page': i}} for i in range(25)]
+
+
+@pytest.mark.parametrize('file_path', ['events.jsonl', 'events.ndjson', 'events.jsonl.gz'])
+def test_records_round_trip(storage, records, file_path):
+    storage.put(file_path=file_path, content=records)
+
+    assert storage.read(file_path=file_path, return_type=dict) == records
+
+
+def test_one_record_per_line(storage, records):
+    storage.put(file_path='events.jsonl', content=records)
+
+    with open(f'{storage.repository}/events.jsonl') as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 25
+
+
+def test_chunked_read(storage, records):
+    storage.put(file_path='events.jsonl.gz', content=records)
+
+    chunks = storage.read(file_path='events.jsonl.gz', return_type=pd.DataFrame, chunksize=10)
+
+    assert isinstance(chunks, types.GeneratorType)
+    chunks = list(chunks)
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert pd.concat(chunks, ignore_index=True)['id'].tolist() == list(range(25))
+
+
+def test_chunked_records(storage, records):
+    storage.put(file_path='events.jsonl', content=records)
+
+    chunks = list(storage.read(file_path='events.jsonl', return_type=dict, chunksize=20))
+
+    assert chunks == [records[:20], records[20:]]
+
+
+def test_dataframe_and_arrow(storage):
+    frame = pd.DataFrame({'id': [1, 2, 3], 'event': ['a', None, 'c']})
+    storage.put(file_path='events.jsonl', content=frame)
+
+    assert storage.read(file_path='events.jsonl', return_type=pd.DataFrame).equals(frame)
+    table = storage.read(file_path='events.jsonl', return_type=pa.Table)
+    assert table.to_pylist() == [{'id': 1, 'event': 'a'}, {'id': 2, 'event': None}, {'id': 3, 'event': 'c'}]
+
+
+def test_writer_appends_lines(storage, records):
+    with storage.open_writer('events.jsonl') as writer:
+        writer.write(pd.DataFrame(records[:10]).drop(columns='meta'))
+        writer.write(pd.DataFrame(records[10:]).drop(columns='meta'))
+
+    data = storage.read(file_path='events.jsonl', return_type=dict)
+    assert data == [{'id': record['id'], 'event': record['event']} for record in records]
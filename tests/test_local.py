@@ -0,0 +1,168 @@
+import errno
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from storage_tool import files
+from storage_tool.local import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({'id': range(1000), 'name': [f'row-{i}' for i in range(1000)]})
+
+
+@pytest.mark.parametrize('file_path', ['data.csv', 'data.txt', 'data.parquet', 'data.json', 'data.xlsx'])
+def test_memory_mapped_read(storage, frame, file_path):
+    storage.put(file_path=file_path, content=frame)
+
+    assert storage.read(file_path=file_path, return_type=pd.DataFrame).reset_index(drop=True).equals(frame)
+
+
+def test_file_can_be_replaced_after_read(storage, frame):
+    storage.put(file_path='data.parquet', content=frame)
+    table = storage.read(file_path='data.parquet', return_type=pa.Table)
+
+    storage.put(file_path='data.parquet', content=frame.head(10))
+
+    assert table.num_rows == 1000
+    assert len(storage.read(file_path='data.parquet', return_type=pd.DataFrame)) == 10
+
+
+def test_record_batch_reader_reads_the_mapping(storage, frame):
+    storage.put(file_path='data.csv', content=frame)
+
+    reader = storage.read(file_path='data.csv', return_type=pa.RecordBatchReader)
+
+    assert reader.read_all().to_pandas().equals(frame)
+
+
+def test_missing_file(storage):
+    with pytest.raises(FileNotFoundError):
+        storage.read(file_path='missing.csv', return_type=pd.DataFrame)
+
+
+@pytest.fixture
+def payload():
+    return os.urandom(3 * 1024 * 1024 + 17)
+
+
+def test_copy(storage, payload):
+    with open(f'{storage.repository}/blob.bin', 'wb') as f:
+        f.write(payload)
+
+    storage.copy('blob.bin', 'copies/blob.bin')
+
+    with open(f'{storage.repository}/copies/blob.bin', 'rb') as f:
+        assert f.read() == payload
+    assert os.listdir(f'{storage.repository}/copies') == ['blob.bin']
+
+
+@pytest.mark.parametrize('unavailable,method', [
+    (('_clone',), 'copy_file_range'),
+    (('_clone', '_copy_file_range'), 'sendfile'),
+    (('_clone', '_copy_file_range', '_sendfile'), 'stream'),
+])
+def test_copy_fallbacks(tmp_path, payload, monkeypatch, unavailable, method):
+    if method in ('copy_file_range', 'sendfile') and not hasattr(os, method):
+        pytest.skip(f'os.{method} not available')
+
+    def unsupported(source, target, size=None):
+        # The clone reports failure, the kernel copies raise like on a filesystem without support
+        if size is None:
+            return False
+        raise OSError(errno.EXDEV, 'cross-device')
+    for name in unavailable:
+        monkeypatch.setattr(files, name, unsupported)
+    (tmp_path / 'src').write_bytes(payload)
+
+    assert files.copy_file(str(tmp_path / 'src'), str(tmp_path / 'dst')) == method
+    assert (tmp_path / 'dst').read_bytes() == payload
+
+
+def test_move_between_repositories(tmp_path, storage):
+    other = LocalStorage()
+    other.set_or_create_repository(str(tmp_path / 'other'))
+    with open(f'{other.repository}/data.bin', 'wb') as f:
+        f.write(b'payload')
+    with open(f'{storage.repository}/data.bin', 'wb') as f:
+        f.write(b'not moved')
+
+    storage.move_between_repositories(other.repository, 'data.bin', storage.repository, 'moved/data.bin')
+
+    assert not other.exists('data.bin')
+    assert storage.exists('data.bin')
+    with open(f'{storage.repository}/moved/data.bin', 'rb') as f:
+        assert f.read() == b'payload'
+
+
+def test_move_across_filesystems(tmp_path, monkeypatch):
+    replace = os.replace
+
+    def cross_device(src, dst):
+        if os.path.basename(src) == 'src':
+            raise OSError(errno.EXDEV, 'cross-device')
+        return replace(src, dst)
+    monkeypatch.setattr(files.os, 'replace', cross_device)
+    (tmp_path / 'src').write_bytes(b'payload')
+
+    files.move_file(str(tmp_path / 'src'), str(tmp_path / 'dst'))
+
+    assert not (tmp_path / 'src').exists()
+    assert (tmp_path / 'dst').read_bytes() == b'payload'
+
+
+@pytest.fixture
+def tree(storage):
+    for relative in ['a.csv', 'b/c.csv', 'b/d/e.csv', 'b/d/f/g.csv', 'h/i.csv']:
+        path = os.path.join(storage.repository, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * len(relative))
+    return storage
+
+
+def test_list(tree):
+    listed = sorted(tree.list(), key=lambda item: item['object'])
+
+    assert listed == [
+        {"object": "a.csv", "type": "file"},
+        {"object": "b/", "type": "folder"},
+        {"object": "h/", "type": "folder"},
+    ]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_iter_list(tree, workers):
+    listed = list(tree.iter_list(workers=workers))
+
+    assert sorted(item['object'] for item in listed) == ['a.csv', 'b/c.csv', 'b/d/e.csv', 'b/d/f/g.csv', 'h/i.csv']
+    assert all(item['size'] == len(item['object']) for item in listed)
+    assert all(item['modified_at'].tzinfo is not None for item in listed)
+
+
+def test_iter_list_folder(tree):
+    assert sorted(item['object'] for item in tree.iter_list('b/d')) == ['b/d/e.csv', 'b/d/f/g.csv']
+    assert [item['object'] for item in tree.iter_list('b', recursive=False)] == ['b/c.csv']
+
+
+def test_iter_list_closed_early(tree):
+    listing = tree.iter_list(workers=4)
+
+    assert next(listing)['type'] == 'file'
+    listing.close()
+
+
+def test_list_repositories(tmp_path, storage):
+    (tmp_path / 'file.txt').write_bytes(b'')
+
+    assert storage.list_repositories(root=str(tmp_path)) == [{"repository": "repo", "created_at": None}]
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from benchmarks import memory
+from benchmarks.backends import open_backend
+from benchmarks.harness import make_frame, parse_size
+
+THRESHOLDS = memory.load_thresholds()
+# xlsx takes about a minute per backend under tracemalloc, run it with STORAGE_TOOL_SLOW_TESTS=1
+SLOW_FORMATS = ('xlsx',)
+CASES = [
+    pytest.param(
+        backend,
+        file_format,
+        marks=pytest.mark.skipif(
+            file_format in SLOW_FORMATS and not os.environ.get('STORAGE_TOOL_SLOW_TESTS'),
+            reason='slow, set STORAGE_TOOL_SLOW_TESTS=1'
+        )
+    )
+    for backend, formats in THRESHOLDS.items()
+    for file_format in formats
+]
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return make_frame(parse_size('4MB'), seed=0)
+
+
+@pytest.fixture(scope='module')
+def storages():
+    opened = {}
+    stacks = []
+    yield opened, stacks
+    for stack in stacks:
+        stack.close()
+
+
+def get_storage(storages, backend):
+    opened, stacks = storages
+    if backend not in opened:
+        if backend == 's3':
+            pytest.importorskip('moto')
+        storage, stack = open_backend(backend)
+        opened[backend] = storage
+        stacks.append(stack)
+    return opened[backend]
+
+
+@pytest.mark.parametrize('backend,file_format', CASES)
+def test_peak_memory_within_threshold(backend, file_format, frame, storages):
+    storage = get_storage(storages, backend)
+
+    result = memory.profile(storage, frame, file_format)
+
+    assert memory.check(backend, result, THRESHOLDS) == []
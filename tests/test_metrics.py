@@ -0,0 +1,189 @@
+import pytest
+import pandas as pd
+
+from storage_tool import metrics
+from storage_tool.local import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def sink():
+    sink = metrics.enable()
+    yield sink
+    metrics.disable()
+
+
+def find_stats(snapshot, operation):
+    return next(item for item in snapshot if item['operation'] == operation)
+
+
+def test_disabled_by_default(storage):
+    assert metrics.is_enabled() is False
+    storage.put(file_path='file.csv', content=[{'col1': 1, 'col2': 2}])
+    assert metrics.get_sink() is None
+
+
+def test_records_calls_latency_and_bytes(storage, sink):
+    data_fake = [{'col1': 1, 'col2': 2}, {'col1': 1, 'col2': 2}]
+
+    storage.put(file_path='file.csv', content=data_fake)
+    storage.read(file_path='file.csv', return_type=pd.DataFrame)
+    storage.read(file_path='file.csv', return_type=dict)
+
+    snapshot = sink.snapshot()
+    put_stats = find_stats(snapshot, 'put')
+    read_stats = find_stats(snapshot, 'read')
+
+    assert put_stats['backend'] == 'LocalStorage'
+    assert put_stats['repository'] == storage.repository
+    assert put_stats['calls'] == 1
+    assert put_stats['bytes_out'] > 0
+    assert read_stats['calls'] == 2
+    assert read_stats['bytes_in'] == 2 * put_stats['bytes_out']
+    assert read_stats['p50'] is not None
+    assert read_stats['p50'] <= read_stats['p99']
+
+
+def test_records_errors(storage, sink):
+    with pytest.raises(Exception):
+        storage.delete(file_path='missing.csv')
+
+    stats = find_stats(sink.snapshot(), 'delete')
+    assert stats['errors'] == 1
+    assert stats['error_rate'] == 1.0
+
+
+def test_prometheus_exposition(storage):
+    sink = metrics.enable(metrics.PrometheusSink())
+    try:
+        storage.exists(file_path='file.csv')
+    finally:
+        metrics.disable()
+
+    text = sink.expose()
+    assert 'storage_tool_operation_calls_total{backend="LocalStorage"' in text
+    assert 'operation="exists"} 1' in text
+    assert 'storage_tool_operation_latency_seconds_bucket' in text
+    assert 'le="+Inf"} 1' in text
+
+
+def test_statsd_callback(storage):
+    received = []
+    metrics.enable(metrics.StatsdSink(lambda *args: received.append(args)))
+    try:
+        storage.exists(file_path='file.csv')
+    finally:
+        metrics.disable()
+
+    names = [name for name, _, _, _ in received]
+    assert 'storage_tool.operation.calls' in names
+    assert 'storage_tool.operation.latency' in names
+
+
+def test_histogram_quantiles():
+    histogram = metrics.Histogram(buckets=(1, 2, 3, 4))
+    for value in (0.5, 1.5, 2.5, 3.5):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(1.0) == 4
+
+
+def test_s3_retries_are_recorded(sink):
+    moto = pytest.importorskip('moto')
+    from botocore.awsrequest import AWSResponse
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    class Raw:
+        def stream(self, **kwargs):
+            yield b''
+
+    failures = []
+
+    def fail_once(request, **kwargs):
+        # The first attempt of the put gets a 503, botocore retries it
+        if request.method == 'PUT' and not failures:
+            failures.append(request.url)
+            return AWSResponse(request.url, 503, {}, Raw())
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('metrics-tests')
+        storage.s3_client.meta.events.register('before-send.s3.PutObject', fail_once)
+
+        storage.put_bytes('file.bin', b'payload')
+
+    assert failures
+    assert find_stats(sink.snapshot(), 'put_bytes')['retries'] == 1
+
+
+def test_azure_retries_are_recorded(sink, monkeypatch):
+    pytest.importorskip('azure.storage.blob')
+    import io
+    import time
+    import requests
+    import urllib3
+    from azure.core.pipeline.transport import RequestsTransport
+    from storage_tool.azure import AzureAuthorization
+
+    class StatusAdapter(requests.adapters.BaseAdapter):
+        def __init__(self, statuses):
+            super().__init__()
+            self.statuses = list(statuses)
+
+        def send(self, request, **kwargs):
+            response = requests.Response()
+            response.status_code = self.statuses.pop(0)
+            response.raw = urllib3.HTTPResponse(body=io.BytesIO(b''), status=response.status_code, preload_content=False)
+            response.request = request
+            response.url = request.url
+            return response
+
+        def close(self):
+            pass
+
+    # No backoff between the attempts
+    monkeypatch.setattr(time, 'sleep', lambda seconds: None)
+    session = requests.Session()
+    session.mount('https://', StatusAdapter([503, 202]))
+    auth = AzureAuthorization()
+    auth.set_credentials('DefaultEndpointsProtocol=https;AccountName=account;AccountKey=a2V5;EndpointSuffix=core.windows.net')
+    client = auth.create_client(transport=RequestsTransport(session=session, session_owner=False))
+
+    # The first attempt of the delete gets a 503, the retry policy sends it again
+    call = metrics._Call()
+    token = metrics._current_call.set(call)
+    try:
+        client.delete_container('container')
+    finally:
+        metrics._current_call.reset(token)
+
+    assert call.retries == 1
+
+
+def test_mixin_and_stream_operations_are_instrumented(storage, sink, tmp_path):
+    (tmp_path / 'source').mkdir()
+    (tmp_path / 'source' / 'data.csv').write_bytes(b'a\n1\n')
+
+    storage.put_directory(str(tmp_path / 'source'), 'table')
+    storage.get_directory('table', str(tmp_path / 'copy'))
+    storage.read_dataset('table')
+    with storage.open_writer('out.csv') as writer:
+        writer.write(pd.DataFrame({'a': [1]}))
+    with storage.open('out.csv') as f:
+        f.read()
+
+    snapshot = sink.snapshot()
+    assert find_stats(snapshot, 'put_directory')['bytes_out'] == 4
+    assert find_stats(snapshot, 'get_directory')['bytes_in'] == 4
+    assert find_stats(snapshot, 'read_dataset')['bytes_in'] == 4
+    assert find_stats(snapshot, 'open_writer')['calls'] == 1
+    assert find_stats(snapshot, 'open')['calls'] == 1
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from storage_tool import metrics
+from storage_tool.data_processor import DataProcessor
+from storage_tool.local import LocalStorage
+from storage_tool.streams import RangeReader
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def frame():
+    # Random values, run-length encoding would shrink a range to a few bytes
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({f'col{i}': rng.random(200000) for i in range(4)})
+
+
+class FetchLog:
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+
+    def __call__(self, start, end):
+        self.ranges.append((start, end))
+        return self.data[start:end]
+
+    @property
+    def fetched(self):
+        return sum(end - start for start, end in self.ranges)
+
+
+@pytest.mark.parametrize('file_path', ['data.orc', 'data.orc.gz'])
+def test_round_trip(storage, frame, file_path):
+    storage.put(file_path=file_path, content=frame)
+
+    assert storage.read(file_path=file_path, return_type=pd.DataFrame).equals(frame)
+    assert storage.read(file_path=file_path, return_type=pa.Table).to_pandas().equals(frame)
+
+
+def test_usecols_and_stripes(frame):
+    processor = DataProcessor()
+    data = processor.convert_to_bytes(frame, 'orc', stripe_size=1024 * 1024)
+    stripes = processor.process_data(data, 'orc', pa.RecordBatchReader)
+    lengths = [len(batch) for batch in stripes]
+
+    selected = processor.process_data(data, 'orc', pd.DataFrame, usecols=['col2', 'col0'], stripes=[1, 2])
+
+    assert len(lengths) > 2
+    assert list(selected.columns) == ['col2', 'col0']
+    expected = frame[['col2', 'col0']].iloc[lengths[0]:sum(lengths[:3])].reset_index(drop=True)
+    assert selected.equals(expected)
+
+
+def test_record_batch_reader_yields_stripes(storage, frame):
+    storage.put(file_path='data.orc', content=frame, stripe_size=1024 * 1024)
+
+    reader = storage.read(file_path='data.orc', return_type=pa.RecordBatchReader, usecols=['col3'])
+
+    assert reader.schema.names == ['col3']
+    assert reader.read_all().to_pandas().equals(frame[['col3']])
+
+
+def test_range_reader_downloads_only_selected_streams(frame):
+    processor = DataProcessor()
+    fetch = FetchLog(processor.convert_to_bytes(frame, 'orc', compression='uncompressed'))
+
+    data = processor.process_data(RangeReader(len(fetch.data), fetch), 'orc', pd.DataFrame, usecols=['col1'])
+
+    assert data.equals(frame[['col1']])
+    assert fetch.fetched < len(fetch.data) / 2
+
+
+def test_range_reader_downloads_only_selected_stripes(frame):
+    processor = DataProcessor()
+    fetch = FetchLog(processor.convert_to_bytes(frame, 'orc', compression='uncompressed', stripe_size=2 * 1024 * 1024))
+
+    data = processor.process_data(RangeReader(len(fetch.data), fetch), 'orc', pd.DataFrame, stripes=[0])
+
+    assert data.equals(frame.iloc[:len(data)])
+    assert fetch.fetched < len(fetch.data) / 2
+
+
+def test_s3_range_reads(frame):
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('orc-tests')
+        storage.put(file_path='data.orc', content=frame, compression='uncompressed')
+        size = len(DataProcessor().convert_to_bytes(frame, 'orc', compression='uncompressed'))
+
+        with metrics.track_bytes() as transferred:
+            data = storage.read(file_path='data.orc', return_type=pd.DataFrame, usecols=['col3'])
+
+        assert data.equals(frame[['col3']])
+        assert transferred.bytes_in < size / 2
@@ -0,0 +1,88 @@
+import io
+import os
+
+import pytest
+
+from storage_tool import metrics
+from storage_tool.local import LocalStorage
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def s3_storage():
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('raw-tests')
+        yield storage
+
+
+@pytest.fixture(params=['local_storage', 's3_storage'])
+def storage(request):
+    return request.getfixturevalue(request.param)
+
+
+@pytest.fixture
+def payload():
+    return os.urandom(3 * 1024 * 1024)
+
+
+def test_bytes_round_trip(storage, payload):
+    storage.put_bytes('models/weights.bin', payload)
+
+    assert storage.read_bytes('models/weights.bin') == payload
+
+
+def test_put_file_object(storage, payload):
+    storage.put_bytes('archive.tar', io.BytesIO(payload))
+
+    assert storage.read_bytes('archive.tar') == payload
+
+
+def test_open_read_seeks(storage, payload):
+    storage.put_bytes('image.png', payload)
+
+    with metrics.track_bytes() as transferred:
+        with storage.open('image.png') as f:
+            f.seek(-100, io.SEEK_END)
+            tail = f.read()
+            f.seek(10)
+            head = f.read(5)
+
+    assert tail == payload[-100:]
+    assert head == payload[10:15]
+    if not isinstance(storage, LocalStorage):
+        # Only the blocks around the two positions are downloaded
+        assert transferred.bytes_in < len(payload) / 4
+
+
+def test_open_write_streams(storage, payload):
+    with storage.open('video.mp4', 'wb') as f:
+        for start in range(0, len(payload), 1000000):
+            f.write(payload[start:start + 1000000])
+
+    assert storage.read_bytes('video.mp4') == payload
+
+
+def test_failed_write_is_discarded(storage):
+    with pytest.raises(RuntimeError):
+        with storage.open('partial.bin', 'wb') as f:
+            f.write(b'partial')
+            raise RuntimeError('interrupted')
+
+    assert not storage.exists('partial.bin')
+
+
+def test_invalid_mode(storage):
+    with pytest.raises(ValueError, match='mode must be'):
+        storage.open('file.bin', 'r+')
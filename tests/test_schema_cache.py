@@ -0,0 +1,85 @@
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from storage_tool.local import LocalStorage
+from storage_tool.schema_cache import LocalSchemaCache, SchemaCache, SidecarSchemaCache, arrow_types, infer_schema
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+def test_infer_schema_uses_nullable_integers():
+    data = pd.DataFrame({'id': [1, 2], 'small': pd.Series([1, 2], dtype='uint8'), 'flag': [True, False], 'value': [0.5, 1.5]})
+
+    assert infer_schema(data) == {'id': 'Int64', 'small': 'UInt8', 'flag': 'boolean', 'value': 'float64'}
+
+
+def test_prefix_key():
+    assert SchemaCache().key('sales/2024/01.csv') == 'sales/2024/01.csv'
+    assert SchemaCache(prefix_depth=1).key('sales/2024/01.csv') == 'sales/'
+    assert SchemaCache(prefix_depth=1).key('01.csv') == ''
+
+
+def test_schema_is_reused_across_partitions(storage, tmp_path):
+    cache = LocalSchemaCache(str(tmp_path / 'schemas'), prefix_depth=1)
+    storage.set_schema_cache(cache)
+    storage.put(file_path='sales/day1.csv', content=pd.DataFrame({'id': [1, 2], 'code': ['01', '02']}))
+    storage.put(file_path='sales/day2.csv', content=pd.DataFrame({'id': [3, None], 'code': ['03', '04']}))
+
+    day1 = storage.read(file_path='sales/day1.csv', return_type=pd.DataFrame)
+    day2 = storage.read(file_path='sales/day2.csv', return_type=pd.DataFrame)
+
+    assert cache.get('sales/') == {'id': 'Int64', 'code': 'Int64'}
+    assert list(day2.dtypes) == list(day1.dtypes)
+    assert day2['id'].isna().tolist() == [False, True]
+    # The schema survives the process through the cache directory
+    assert LocalSchemaCache(str(tmp_path / 'schemas'), prefix_depth=1).get('sales/') == cache.get('sales/')
+
+
+def test_arrow_types():
+    schema = {'id': 'Int64', 'flag': 'boolean', 'value': 'float64', 'name': 'str', 'other': 'object', 'kind': 'category'}
+
+    assert arrow_types(schema) == {'id': pa.int64(), 'flag': pa.bool_(), 'value': pa.float64(), 'name': pa.string()}
+
+
+@pytest.mark.parametrize('engine', [None, 'pyarrow'])
+@pytest.mark.parametrize('file_extension', ['csv', 'csv.gz'])
+def test_partition_not_fitting_schema_is_inferred_again(storage, engine, file_extension):
+    cache = SchemaCache(prefix_depth=1)
+    storage.set_schema_cache(cache)
+    storage.put(file_path=f'sales/day1.{file_extension}', content=pd.DataFrame({'id': [1, 2], 'code': ['01', '02']}))
+    storage.put(file_path=f'sales/day2.{file_extension}', content=pd.DataFrame({'id': [3, 4], 'code': ['03', 'A4']}))
+
+    storage.read(file_path=f'sales/day1.{file_extension}', return_type=pd.DataFrame, engine=engine)
+    day2 = storage.read(file_path=f'sales/day2.{file_extension}', return_type=pd.DataFrame, engine=engine)
+
+    assert day2['code'].tolist() == ['03', 'A4']
+    assert day2['id'].dtype == 'Int64'
+    assert cache.get('sales/')['code'] != 'Int64'
+
+
+def test_explicit_dtype_wins(storage, tmp_path):
+    storage.set_schema_cache(SchemaCache())
+    storage.put(file_path='file.csv', content=pd.DataFrame({'code': ['01', '02']}))
+
+    storage.read(file_path='file.csv', return_type=pd.DataFrame)
+    data = storage.read(file_path='file.csv', return_type=pd.DataFrame, dtype={'code': str})
+
+    assert data['code'].tolist() == ['01', '02']
+
+
+def test_sidecar_cache(storage):
+    cache = SidecarSchemaCache(storage)
+    storage.set_schema_cache(cache)
+    storage.put(file_path='data/file.csv', content=pd.DataFrame({'id': [1, 2]}))
+
+    storage.read(file_path='data/file.csv', return_type=pd.DataFrame)
+
+    assert storage.read(file_path='data/file.csv.schema.json', return_type=dict)['columns'] == {'id': 'Int64'}
+    cache.invalidate('data/file.csv')
+    assert storage.exists(file_path='data/file.csv.schema.json') is False
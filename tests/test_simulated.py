@@ -0,0 +1,86 @@
+import pytest
+
+from storage_tool.local import LocalStorage
+from storage_tool.simulated import SimulatedStorage, ThrottlingError, TransientError
+
+
+@pytest.fixture
+def local(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+def make_simulated(local, **kwargs):
+    delays = []
+    storage = SimulatedStorage(local, sleep=delays.append, **kwargs)
+    return storage, delays
+
+
+def test_delegates_to_wrapped_storage(local):
+    storage, delays = make_simulated(local)
+    data_fake = [{'col1': 1, 'col2': 2}]
+
+    storage.put(file_path='file.json', content=data_fake)
+
+    assert storage.exists(file_path='file.json') is True
+    assert storage.read(file_path='file.json', return_type=dict) == data_fake
+    assert storage.repository == local.repository
+    assert delays == []
+
+
+def test_latency_per_operation(local):
+    storage, delays = make_simulated(local, latency={'default': 0.01, 'exists': ('fixed', 0.5)})
+
+    storage.exists(file_path='file.json')
+    storage.list()
+
+    assert delays == [0.5, 0.01]
+
+
+def test_bandwidth_limit_applies_to_payload(local):
+    storage, delays = make_simulated(local, bandwidth=1000)
+
+    storage.put(file_path='file.json', content=[{'col1': 'x' * 1000}])
+    size = len(local.convert_to_bytes([{'col1': 'x' * 1000}], 'json'))
+
+    assert delays == [pytest.approx(size / 1000)]
+
+
+def test_faults_are_deterministic_under_seed(local):
+    def run(seed):
+        storage, delays = make_simulated(local, latency=('lognormal', -4, 1), throttle_rate=0.2, failure_rate=0.2, seed=seed)
+        outcomes = []
+        for _ in range(50):
+            try:
+                storage.exists(file_path='file.json')
+                outcomes.append('ok')
+            except ThrottlingError:
+                outcomes.append('throttled')
+            except TransientError:
+                outcomes.append('failed')
+        return outcomes, delays, storage.stats
+
+    outcomes, delays, stats = run(seed=7)
+
+    assert (outcomes, delays) == run(seed=7)[:2]
+    assert {'ok', 'throttled', 'failed'} == set(outcomes)
+    assert stats['throttled'] == outcomes.count('throttled')
+
+
+def test_rate_limit_throttles(local):
+    now = [0.0]
+    storage = SimulatedStorage(local, max_ops_per_second=2, sleep=lambda seconds: None, clock=lambda: now[0])
+
+    storage.exists(file_path='file.json')
+    storage.exists(file_path='file.json')
+    with pytest.raises(ThrottlingError):
+        storage.exists(file_path='file.json')
+
+    now[0] += 1.0
+    storage.exists(file_path='file.json')
+
+
+def test_invalid_latency_spec(local):
+    with pytest.raises(ValueError):
+        SimulatedStorage(local, latency=('gamma', 1, 2))
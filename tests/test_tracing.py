@@ -0,0 +1,75 @@
+import pytest
+import pandas as pd
+
+from storage_tool import tracing
+from storage_tool.local import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def exporter():
+    exporter = tracing.enable()
+    yield exporter
+    tracing.disable()
+
+
+def test_span_is_noop_when_disabled():
+    with tracing.span('parse') as current:
+        assert current is None
+    assert tracing.current_span() is None
+
+
+def test_read_timeline(storage, exporter):
+    data_fake = [{'col1': 1, 'col2': 2}, {'col1': 1, 'col2': 2}]
+    storage.put(file_path='file.csv', content=data_fake)
+    storage.read(file_path='file.csv', return_type=pd.DataFrame)
+
+    put_trace, read_trace = exporter.traces
+    # LocalStorage serializes straight into the destination file
+    assert [span.name for span, _ in put_trace.walk()] == ['put', 'serialize']
+    assert [span.name for span, _ in read_trace.walk()] == ['read', 'fetch', 'parse']
+
+    timeline = exporter.timeline()
+    assert timeline[0]['name'] == 'read'
+    assert timeline[0]['attributes']['backend'] == 'LocalStorage'
+    assert timeline[2]['depth'] == 1
+    assert timeline[2]['attributes']['format'] == 'csv'
+    assert 'fetch' in exporter.dump_timeline()
+
+
+@pytest.mark.parametrize('file_path', ['file.csv.gz', 'file.xlsx.gz'])
+def test_decompress_span(storage, exporter, file_path):
+    storage.put(file_path=file_path, content=pd.DataFrame({'col1': range(1000)}))
+    data = storage.read(file_path=file_path, return_type=pd.DataFrame)
+
+    assert data['col1'].tolist() == list(range(1000))
+    read_trace = exporter.traces[-1]
+    # Compressed local files are streamed to the parser, the reads of the file are part of the decompression
+    assert [span.name for span, _ in read_trace.walk()] == ['read', 'parse', 'decompress']
+    parse = read_trace.children[-1]
+    assert parse.children[0].attributes == {'compression': 'gz'}
+    assert 0 < parse.children[0].duration <= parse.duration
+
+
+def test_flame_data(storage, exporter):
+    storage.put(file_path='file.json', content=[{'col1': 1}])
+    storage.read(file_path='file.json', return_type=dict)
+    storage.read(file_path='file.json', return_type=dict)
+
+    flame = exporter.flame()
+    assert set(flame) >= {'read', 'read;fetch', 'read;parse', 'put;serialize'}
+    assert 'read;parse ' in exporter.folded()
+
+
+def test_span_records_error(exporter):
+    with pytest.raises(ValueError):
+        with tracing.span('parse'):
+            raise ValueError('boom')
+
+    assert exporter.traces[-1].error == 'ValueError'
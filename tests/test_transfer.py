@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from storage_tool.local import LocalStorage
+from storage_tool.transfer import batches, multipart_etag
+
+FILES = {
+    'model.bin': os.urandom(2048),
+    'images/a.png': b'\x89PNG' + os.urandom(100),
+    'images/nested/b.png': b'\x89PNG' + os.urandom(200),
+    'empty.dat': b'',
+}
+
+
+@pytest.fixture
+def source(tmp_path):
+    for relative, content in FILES.items():
+        path = tmp_path / 'source' / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return tmp_path / 'source'
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def s3_storage():
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('transfer-tests')
+        yield storage
+
+
+def read_tree(root):
+    return {
+        os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/'): open(os.path.join(folder, name), 'rb').read()
+        for folder, _, names in os.walk(root)
+        for name in names
+    }
+
+
+@pytest.mark.parametrize('backend', ['storage', 's3_storage'])
+def test_round_trip(request, backend, source, tmp_path):
+    storage = request.getfixturevalue(backend)
+
+    uploaded = storage.put_directory(str(source), 'build/out', workers=3)
+    downloaded = storage.get_directory('build/out', str(tmp_path / 'copy'), workers=3)
+
+    assert sorted(uploaded['transferred']) == sorted(FILES)
+    assert sorted(downloaded['transferred']) == sorted(FILES)
+    assert read_tree(tmp_path / 'copy') == FILES
+
+
+@pytest.mark.parametrize('backend', ['storage', 's3_storage'])
+@pytest.mark.parametrize('compare', ['mtime', 'checksum'])
+def test_unchanged_files_are_skipped(request, backend, compare, source, tmp_path):
+    storage = request.getfixturevalue(backend)
+    storage.put_directory(str(source), 'out')
+    (source / 'model.bin').write_bytes(b'changed')
+
+    uploaded = storage.put_directory(str(source), 'out', compare=compare)
+    storage.get_directory('out', str(tmp_path / 'copy'))
+    downloaded = storage.get_directory('out', str(tmp_path / 'copy'), compare=compare)
+
+    assert uploaded['transferred'] == ['model.bin']
+    assert sorted(uploaded['skipped']) == sorted(set(FILES) - {'model.bin'})
+    assert downloaded['transferred'] == []
+    assert read_tree(tmp_path / 'copy') == dict(FILES, **{'model.bin': b'changed'})
+
+
+def test_multipart_checksum(s3_storage, tmp_path):
+    (tmp_path / 'large').mkdir()
+    (tmp_path / 'large' / 'blob.bin').write_bytes(os.urandom(9 * 1024 * 1024))
+
+    s3_storage.put_directory(str(tmp_path / 'large'))
+    result = s3_storage.put_directory(str(tmp_path / 'large'), compare='checksum')
+
+    assert multipart_etag(str(tmp_path / 'large' / 'blob.bin'), 8 * 1024 * 1024).endswith('-2')
+    assert result['skipped'] == ['blob.bin']
+
+
+def test_batches():
+    jobs = [{'size': size} for size in (10, 10, 100, 10, 10, 10)]
+
+    assert [len(batch) for batch in batches(jobs, batch_files=2, batch_bytes=50)] == [2, 1, 2, 1]
+
+
+def test_invalid_compare(storage, source):
+    with pytest.raises(ValueError, match='compare must be'):
+        storage.put_directory(str(source), compare='size')
+
+
+@pytest.mark.parametrize('key', ['out/../../escaped.txt', 'out/a/../../../escaped.txt'])
+def test_keys_outside_local_directory_are_rejected(s3_storage, tmp_path, key):
+    s3_storage.put_bytes(key, b'payload')
+
+    with pytest.raises(ValueError, match='resolves outside of'):
+        s3_storage.get_directory('out', str(tmp_path / 'copy'))
+
+    assert not (tmp_path / 'escaped.txt').exists()
+    assert not os.path.exists(os.path.join(str(tmp_path), '..', 'escaped.txt'))
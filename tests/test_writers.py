@@ -0,0 +1,172 @@
+import os
+import threading
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from storage_tool.local import LocalStorage
+from storage_tool.streams import GCSResumableUpload, S3MultipartUpload
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage()
+    storage.set_or_create_repository(str(tmp_path / 'repo'))
+    return storage
+
+
+@pytest.fixture
+def s3_storage():
+    moto = pytest.importorskip('moto')
+    from storage_tool.s3 import S3Authorization, S3Storage
+
+    with moto.mock_aws():
+        auth = S3Authorization()
+        auth.set_credentials('testing', 'testing', 'us-east-1')
+        storage = S3Storage(auth)
+        storage.set_or_create_repository('writer-tests')
+        yield storage
+
+
+def batches(count=3, rows=4):
+    return [
+        pd.DataFrame({'id': range(i * rows, (i + 1) * rows), 'name': [f'row-{i}'] * rows})
+        for i in range(count)
+    ]
+
+
+def test_csv_header_written_once(storage):
+    with storage.open_writer('out/file.csv') as writer:
+        for batch in batches():
+            writer.write(batch)
+
+    data = storage.read(file_path='out/file.csv', return_type=pd.DataFrame)
+    assert data.equals(pd.concat(batches(), ignore_index=True))
+    assert writer.rows == 12
+
+
+def test_parquet_row_group_per_batch(storage):
+    with storage.open_writer('file.parquet') as writer:
+        for batch in batches():
+            writer.write(batch)
+
+    assert pq.ParquetFile(os.path.join(storage.repository, 'file.parquet')).num_row_groups == 3
+    data = storage.read(file_path='file.parquet', return_type=pd.DataFrame)
+    assert data.equals(pd.concat(batches(), ignore_index=True))
+
+
+def test_failed_writer_leaves_no_file(storage):
+    with pytest.raises(ValueError):
+        with storage.open_writer('file.csv') as writer:
+            writer.write(batches()[0])
+            writer.write(pd.DataFrame({'other': [1]}))
+
+    assert storage.list() == []
+
+
+def test_unsupported_format(storage):
+    with pytest.raises(ValueError):
+        storage.open_writer('file.xlsx')
+
+
+def test_s3_multipart_upload(s3_storage):
+    frame = pd.DataFrame({'id': range(400_000), 'text': ['x' * 20] * 400_000})
+    with s3_storage.open_writer('file.csv', part_size=5 * 1024 * 1024) as writer:
+        for start in range(0, len(frame), 100_000):
+            writer.write(frame.iloc[start:start + 100_000])
+
+    assert len(writer.stream.parts) > 1
+    data = s3_storage.read(file_path='file.csv', return_type=pd.DataFrame)
+    assert data.equals(frame)
+
+
+def test_s3_small_object_uses_single_put(s3_storage):
+    with s3_storage.open_writer('file.parquet') as writer:
+        writer.write(batches()[0])
+
+    assert writer.stream.upload_id is None
+    assert s3_storage.read(file_path='file.parquet', return_type=pd.DataFrame).equals(batches()[0])
+
+
+def test_s3_put_streams_multipart_upload(s3_storage):
+    frame = pd.DataFrame({'id': range(400_000), 'text': ['x' * 20] * 400_000})
+    s3_storage.put(file_path='file.csv', content=frame)
+
+    # The ETag of a multipart upload ends with the number of parts
+    assert s3_storage.s3_client.head_object(Bucket=s3_storage.repository, Key='file.csv')['ETag'].endswith('-2"')
+    assert s3_storage.read(file_path='file.csv', return_type=pd.DataFrame).equals(frame)
+
+
+@pytest.mark.parametrize('file_path', ['file.xlsx', 'file.xlsx.gz'])
+def test_s3_put_seekable_output(s3_storage, file_path):
+    s3_storage.put(file_path=file_path, content=batches()[0])
+
+    assert s3_storage.read(file_path=file_path, return_type=pd.DataFrame).equals(batches()[0])
+
+
+def test_s3_abort_discards_upload(s3_storage):
+    stream = S3MultipartUpload(s3_storage.s3_client, s3_storage.repository, 'file.csv', part_size=5 * 1024 * 1024)
+    stream.write(b'x' * (6 * 1024 * 1024))
+    stream.abort()
+
+    assert s3_storage.s3_client.list_multipart_uploads(Bucket=s3_storage.repository).get('Uploads', []) == []
+    assert s3_storage.exists(file_path='file.csv') is False
+
+
+def test_empty_first_batch_writes_header_once(storage):
+    with storage.open_writer('file.csv') as writer:
+        writer.write(pd.DataFrame({'a': pd.Series([], dtype='int64')}))
+        writer.write(pd.DataFrame({'a': [1, 2]}))
+
+    with open(os.path.join(storage.repository, 'file.csv'), 'rb') as f:
+        assert f.read().splitlines() == [b'a', b'1', b'2']
+
+
+@pytest.mark.parametrize('file_path', ['dropped.csv', 'dropped.csv.gz', 'dropped.parquet'])
+def test_dropped_writer_is_discarded(storage, file_path):
+    writer = storage.open_writer(file_path)
+    writer.write(batches()[0])
+    del writer
+
+    assert not storage.exists(file_path)
+    assert storage.list() == []
+
+
+def test_dropped_s3_writer_is_discarded(s3_storage):
+    writer = s3_storage.open_writer('dropped.csv')
+    writer.write(batches()[0])
+    del writer
+
+    assert not s3_storage.exists('dropped.csv')
+
+
+class RecordingBlob:
+    """
+    Stands for a gcloud Blob, keeps the uploads and the thread that made them
+    """
+
+    def __init__(self):
+        self.chunk_size = None
+        self.uploads = []
+
+    def upload_from_file(self, file_obj, size=None):
+        self.uploads.append((threading.current_thread(), self.chunk_size, size, file_obj.read()))
+
+
+def test_gcs_small_object_uses_single_upload():
+    blob = RecordingBlob()
+    with GCSResumableUpload(blob, part_size=256 * 1024) as stream:
+        stream.write(b'x' * 1000)
+
+    assert blob.uploads == [(threading.current_thread(), None, 1000, b'x' * 1000)]
+
+
+def test_gcs_large_object_streams_resumable_upload():
+    blob = RecordingBlob()
+    with GCSResumableUpload(blob, part_size=256 * 1024) as stream:
+        stream.write(b'x' * (600 * 1024))
+
+    (thread, chunk_size, size, data), = blob.uploads
+    assert thread is not threading.current_thread()
+    assert (chunk_size, size, data) == (256 * 1024, None, b'x' * (600 * 1024))